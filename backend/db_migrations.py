@@ -439,6 +439,21 @@ def run_migrations():
                     logger.error(f"[MIGRATION] Failed to backfill conversations: {str(e)}")
                     conn.rollback()
             
+            # Migration 10: Add heartbeat_at / retired_at to vector_generations (if table exists)
+            for column in ("heartbeat_at", "retired_at"):
+                if table_exists(conn, 'vector_generations') and not column_exists(conn, 'vector_generations', column):
+                    try:
+                        conn.execute(text(f"""
+                            ALTER TABLE vector_generations 
+                            ADD COLUMN {column} TIMESTAMP WITH TIME ZONE
+                        """))
+                        conn.commit()
+                        migrations_applied.append(f"Added {column} to vector_generations")
+                        logger.info(f"[MIGRATION] Added {column} column to vector_generations table")
+                    except Exception as e:
+                        logger.error(f"[MIGRATION] Failed to add {column} to vector_generations: {str(e)}")
+                        conn.rollback()
+            
             if migrations_applied:
                 logger.info(f"[MIGRATION] Applied {len(migrations_applied)} migration(s): {', '.join(migrations_applied)}")
                 return True
@@ -0,0 +1,4 @@
+"""
+Offline stand-ins for Gemini and Pinecone, for load and soak testing the backend
+without spending real quota. See LOAD_TESTING.md.
+"""
@@ -0,0 +1,233 @@
+"""
+Gemini Stub Server
+Offline stand-in for the Gemini `generateContent` and `streamGenerateContent`
+(alt=sse) endpoints. Point the backend at it with GEMINI_BASE_URL.
+
+Responses are deterministic: the same request body always gets the same text.
+Knowledge-base router prompts get a JSON answer in the router schema; other
+prompts get HTML filler of about GEMINI_STUB_OUTPUT_TOKENS tokens, cut at the
+request's maxOutputTokens (finishReason MAX_TOKENS) and stopSequences. Rules in
+GEMINI_STUB_RESPONSES_FILE (a JSON list of {"match": "...", "response": "..."})
+override the built-in text when `match` occurs in the prompt.
+
+Run from the backend directory:
+    python -m loadtest.gemini_stub            # port GEMINI_STUB_PORT (8200)
+"""
+import os
+import json
+import random
+import asyncio
+import hashlib
+from typing import List, Dict, Any
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from .stub_common import LatencyModel, FaultInjector, StubStats, apply_config, sleep_for
+
+CHARS_PER_TOKEN = 4
+WORDS = (
+    "sprint backlog task story estimate velocity review risk scope milestone team "
+    "deliverable dependency acceptance criteria release stakeholder capacity plan "
+    "integration testing deployment documentation quality budget schedule"
+).split()
+
+app = FastAPI(title="Gemini Stub")
+
+latency = LatencyModel(os.getenv("GEMINI_STUB_LATENCY", "lognormal:800:4000"))
+faults = FaultInjector(
+    error_rate=float(os.getenv("GEMINI_STUB_ERROR_RATE", "0")),
+    rate_limit_rate=float(os.getenv("GEMINI_STUB_RATE_LIMIT_RATE", "0")),
+    retry_after_seconds=int(os.getenv("GEMINI_STUB_RETRY_AFTER_SECONDS", "5")),
+    key_rpm=int(os.getenv("GEMINI_STUB_KEY_RPM", "0"))
+)
+output_tokens = int(os.getenv("GEMINI_STUB_OUTPUT_TOKENS", "400"))
+chunk_chars = int(os.getenv("GEMINI_STUB_STREAM_CHUNK_CHARS", "80"))
+chunk_delay_seconds = float(os.getenv("GEMINI_STUB_CHUNK_DELAY_MS", "20")) / 1000.0
+stats = StubStats()
+
+
+def _load_rules() -> List[Dict[str, str]]:
+    path = os.getenv("GEMINI_STUB_RESPONSES_FILE")
+    if not path:
+        return []
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+rules = _load_rules()
+
+
+def _prompt_text(body: Dict[str, Any]) -> Dict[str, str]:
+    system = " ".join(part.get("text", "") for part in body.get("systemInstruction", {}).get("parts", []))
+    turns = " ".join(
+        part.get("text", "")
+        for content in body.get("contents", [])
+        for part in content.get("parts", [])
+    )
+    return {"system": system, "turns": turns}
+
+
+def _filler(seed: int, tokens: int) -> str:
+    """Deterministic HTML of roughly `tokens` tokens"""
+    generator = random.Random(seed)
+    paragraphs, size = [], 0
+    while size < tokens * CHARS_PER_TOKEN:
+        sentence = " ".join(generator.choice(WORDS) for _ in range(12)).capitalize() + "."
+        paragraphs.append(f"<p>{sentence}</p>")
+        size += len(paragraphs[-1])
+    return "<h3>Stub response</h3>\n" + "\n".join(paragraphs)
+
+
+def _canned_response(body: Dict[str, Any]) -> str:
+    prompt = _prompt_text(body)
+    full_prompt = f"{prompt['system']} {prompt['turns']}"
+    for rule in rules:
+        if rule.get("match") and rule["match"] in full_prompt:
+            return rule["response"]
+
+    digest = hashlib.sha256(json.dumps(body, sort_keys=True).encode("utf-8")).hexdigest()
+    if "Output JSON schema" in full_prompt:
+        # Knowledge-base router: answer in the schema the backend parses
+        return json.dumps({
+            "status": "OK",
+            "selected_files": [],
+            "routing_detail": {"top_file": None, "top_score": 0.0, "file_scores": []},
+            "answer": f"Stub answer {digest[:8]}. " + _filler(int(digest[:8], 16), 60),
+            "sources": [],
+            "confidence_explanation": "Offline stub response",
+            "raw_used_chunks": []
+        })
+    return _filler(int(digest[:8], 16), output_tokens)
+
+
+def _generate(body: Dict[str, Any]) -> Dict[str, Any]:
+    """Canned text with output cap, stop sequences and token usage applied"""
+    config = body.get("generationConfig", {})
+    text = _canned_response(body)
+    finish_reason = "STOP"
+
+    for stop in config.get("stopSequences", []) or []:
+        position = text.find(stop)
+        if position >= 0:
+            text = text[:position]
+
+    max_output_tokens = config.get("maxOutputTokens")
+    if max_output_tokens and len(text) > max_output_tokens * CHARS_PER_TOKEN:
+        text = text[:max_output_tokens * CHARS_PER_TOKEN]
+        finish_reason = "MAX_TOKENS"
+
+    prompt = _prompt_text(body)
+    prompt_tokens = (len(prompt["system"]) + len(prompt["turns"])) // CHARS_PER_TOKEN
+    candidate_tokens = len(text) // CHARS_PER_TOKEN
+    return {
+        "text": text,
+        "finish_reason": finish_reason,
+        "usage": {
+            "promptTokenCount": prompt_tokens,
+            "candidatesTokenCount": candidate_tokens,
+            "totalTokenCount": prompt_tokens + candidate_tokens
+        }
+    }
+
+
+def _error_response(status_code: int) -> JSONResponse:
+    if status_code == 429:
+        return JSONResponse(
+            status_code=429,
+            headers={"Retry-After": str(faults.retry_after_seconds)},
+            content={"error": {
+                "code": 429,
+                "message": "Resource has been exhausted (e.g. check quota).",
+                "status": "RESOURCE_EXHAUSTED",
+                "details": [{
+                    "@type": "type.googleapis.com/google.rpc.RetryInfo",
+                    "retryDelay": f"{faults.retry_after_seconds}s"
+                }]
+            }}
+        )
+    return JSONResponse(
+        status_code=status_code,
+        content={"error": {"code": status_code, "message": "The model is overloaded. Please try again later.", "status": "UNAVAILABLE"}}
+    )
+
+
+@app.post("/v1beta/models/{target}")
+async def generate(target: str, request: Request):
+    """`{model}:generateContent` and `{model}:streamGenerateContent?alt=sse`"""
+    model, _, method = target.partition(":")
+    if method not in ("generateContent", "streamGenerateContent"):
+        return JSONResponse(status_code=404, content={"error": {"code": 404, "message": f"Unknown method {method}", "status": "NOT_FOUND"}})
+
+    api_key = request.headers.get("x-goog-api-key") or request.query_params.get("key")
+    body = await request.json()
+    stats.count(f"{method}_requests")
+    stats.enter()
+    try:
+        await sleep_for(latency)
+        fault = faults.draw(api_key)
+        if fault:
+            stats.count(f"{fault[1]}_{fault[0]}")
+            return _error_response(fault[0])
+        result = _generate(body)
+        stats.count("output_tokens", result["usage"]["candidatesTokenCount"])
+    finally:
+        stats.leave()
+
+    if method == "streamGenerateContent":
+        return StreamingResponse(_stream(model, result), media_type="text/event-stream")
+    return {
+        "candidates": [{
+            "content": {"parts": [{"text": result["text"]}], "role": "model"},
+            "finishReason": result["finish_reason"],
+            "index": 0
+        }],
+        "usageMetadata": result["usage"],
+        "modelVersion": model
+    }
+
+
+async def _stream(model: str, result: Dict[str, Any]):
+    """SSE frames of `chunk_chars` characters; the last carries finishReason and usage"""
+    stats.enter()
+    try:
+        text = result["text"]
+        pieces = [text[i:i + chunk_chars] for i in range(0, len(text), chunk_chars)] or [""]
+        for i, piece in enumerate(pieces):
+            chunk = {
+                "candidates": [{"content": {"parts": [{"text": piece}], "role": "model"}, "index": 0}],
+                "modelVersion": model
+            }
+            if i == len(pieces) - 1:
+                chunk["candidates"][0]["finishReason"] = result["finish_reason"]
+                chunk["usageMetadata"] = result["usage"]
+            yield f"data: {json.dumps(chunk)}\r\n\r\n"
+            if i < len(pieces) - 1:
+                await asyncio.sleep(chunk_delay_seconds)
+    finally:
+        stats.leave()
+
+
+@app.get("/stub/stats")
+async def get_stats():
+    """Requests served, injected faults, tokens and peak concurrency"""
+    return {"latency": latency.spec, **stats.snapshot()}
+
+
+@app.post("/stub/config")
+async def update_config(changes: Dict[str, Any]):
+    """Change latency / error_rate / rate_limit_rate / retry_after_seconds / key_rpm while running"""
+    global latency
+    latency = apply_config(latency, faults, changes)
+    return {
+        "latency": latency.spec,
+        "error_rate": faults.error_rate,
+        "rate_limit_rate": faults.rate_limit_rate,
+        "retry_after_seconds": faults.retry_after_seconds,
+        "key_rpm": faults.key_rpm
+    }
+
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run(app, host="0.0.0.0", port=int(os.getenv("GEMINI_STUB_PORT", "8200")))
@@ -0,0 +1,296 @@
+"""
+Pinecone Stub Server
+Offline, in-memory stand-in for the Pinecone control plane (list / create /
+describe / delete indexes) and data plane (upsert, query, fetch, delete,
+describe_index_stats). Point the backend at it with PINECONE_BASE_URL.
+
+Every index's data-plane host is `{PINECONE_STUB_PUBLIC_URL}/data/{index}`, so
+one server answers for all indexes; PINECONE_STUB_PUBLIC_URL must be the URL the
+backend reaches this server on. Queries are exact cosine / dot-product /
+euclidean scores over the stored vectors, so results are deterministic.
+
+Run from the backend directory:
+    python -m loadtest.pinecone_stub          # port PINECONE_STUB_PORT (8300)
+"""
+import os
+from typing import List, Dict, Any, Optional
+
+import numpy as np
+from fastapi import FastAPI, Query
+from fastapi.responses import JSONResponse, Response
+
+from .stub_common import LatencyModel, FaultInjector, StubStats, apply_config, sleep_for
+
+app = FastAPI(title="Pinecone Stub")
+
+port = int(os.getenv("PINECONE_STUB_PORT", "8300"))
+public_url = os.getenv("PINECONE_STUB_PUBLIC_URL", f"http://127.0.0.1:{port}").rstrip("/")
+latency = LatencyModel(os.getenv("PINECONE_STUB_LATENCY", "lognormal:30:200"))
+faults = FaultInjector(
+    error_rate=float(os.getenv("PINECONE_STUB_ERROR_RATE", "0")),
+    rate_limit_rate=float(os.getenv("PINECONE_STUB_RATE_LIMIT_RATE", "0")),
+    retry_after_seconds=int(os.getenv("PINECONE_STUB_RETRY_AFTER_SECONDS", "1"))
+)
+stats = StubStats()
+
+# index name -> {"model": IndexModel dict, "namespaces": {namespace: {id: {"values", "metadata"}}}}
+indexes: Dict[str, Dict[str, Any]] = {}
+
+
+def _error(status_code: int, code: str, message: str) -> JSONResponse:
+    return JSONResponse(status_code=status_code, content={"error": {"code": code, "message": message}, "status": status_code})
+
+
+async def _simulate(operation: str) -> Optional[JSONResponse]:
+    """Latency and injected faults for one request; returns the error response, if any"""
+    stats.count(f"{operation}_requests")
+    stats.enter()
+    try:
+        await sleep_for(latency)
+    finally:
+        stats.leave()
+    fault = faults.draw()
+    if not fault:
+        return None
+    stats.count(f"{fault[1]}_{fault[0]}")
+    if fault[0] == 429:
+        return JSONResponse(
+            status_code=429,
+            headers={"Retry-After": str(faults.retry_after_seconds)},
+            content={"code": 8, "message": "Request rate limit exceeded", "details": []}
+        )
+    return JSONResponse(status_code=fault[0], content={"code": 14, "message": "Service unavailable", "details": []})
+
+
+def _index_model(name: str, dimension: int, metric: str, spec: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "name": name,
+        "dimension": dimension,
+        "metric": metric,
+        "host": f"{public_url}/data/{name}",
+        "spec": spec or {"serverless": {"cloud": "aws", "region": "us-east-1"}},
+        "status": {"ready": True, "state": "Ready"},
+        "deletion_protection": "disabled",
+        "vector_type": "dense"
+    }
+
+
+# ---------------------------------------------------------------------------
+# Control plane
+# ---------------------------------------------------------------------------
+
+@app.get("/indexes")
+async def list_indexes():
+    error = await _simulate("list_indexes")
+    if error:
+        return error
+    return {"indexes": [entry["model"] for entry in indexes.values()]}
+
+
+@app.post("/indexes")
+async def create_index(body: Dict[str, Any]):
+    error = await _simulate("create_index")
+    if error:
+        return error
+    name = body.get("name")
+    if not name or not body.get("dimension"):
+        return _error(400, "INVALID_ARGUMENT", "name and dimension are required")
+    if name in indexes:
+        return _error(409, "ALREADY_EXISTS", f"Resource {name} already exists")
+    model = _index_model(name, int(body["dimension"]), body.get("metric", "cosine"), body.get("spec"))
+    indexes[name] = {"model": model, "namespaces": {}}
+    return JSONResponse(status_code=201, content=model)
+
+
+@app.get("/indexes/{name}")
+async def describe_index(name: str):
+    error = await _simulate("describe_index")
+    if error:
+        return error
+    if name not in indexes:
+        return _error(404, "NOT_FOUND", f"Resource {name} not found")
+    return indexes[name]["model"]
+
+
+@app.delete("/indexes/{name}")
+async def delete_index(name: str):
+    error = await _simulate("delete_index")
+    if error:
+        return error
+    if indexes.pop(name, None) is None:
+        return _error(404, "NOT_FOUND", f"Resource {name} not found")
+    return Response(status_code=202)
+
+
+# ---------------------------------------------------------------------------
+# Data plane (one host per index: /data/{index})
+# ---------------------------------------------------------------------------
+
+def _namespace(index: str, namespace: str) -> Optional[Dict[str, Any]]:
+    entry = indexes.get(index)
+    if entry is None:
+        return None
+    return entry["namespaces"].setdefault(namespace or "", {})
+
+
+def _scores(metric: str, matrix: np.ndarray, vector: np.ndarray) -> np.ndarray:
+    if metric == "dotproduct":
+        return matrix @ vector
+    if metric == "euclidean":
+        return -np.linalg.norm(matrix - vector, axis=1)
+    norms = np.linalg.norm(matrix, axis=1) * (np.linalg.norm(vector) or 1.0)
+    return (matrix @ vector) / np.where(norms == 0, 1.0, norms)
+
+
+def _matches_filter(metadata: Dict[str, Any], metadata_filter: Optional[Dict[str, Any]]) -> bool:
+    """Equality / $eq / $in filters, which is all the backend uses"""
+    for field, condition in (metadata_filter or {}).items():
+        value = metadata.get(field)
+        if isinstance(condition, dict):
+            if "$eq" in condition and value != condition["$eq"]:
+                return False
+            if "$in" in condition and value not in condition["$in"]:
+                return False
+        elif value != condition:
+            return False
+    return True
+
+
+@app.post("/data/{index}/vectors/upsert")
+async def upsert(index: str, body: Dict[str, Any]):
+    error = await _simulate("upsert")
+    if error:
+        return error
+    vectors = _namespace(index, body.get("namespace"))
+    if vectors is None:
+        return _error(404, "NOT_FOUND", f"Index {index} not found")
+    dimension = indexes[index]["model"]["dimension"]
+    for vector in body.get("vectors", []):
+        if len(vector.get("values", [])) != dimension:
+            return _error(400, "INVALID_ARGUMENT", f"Vector dimension {len(vector.get('values', []))} does not match the dimension of the index {dimension}")
+        vectors[vector["id"]] = {"values": vector["values"], "metadata": vector.get("metadata") or {}}
+    stats.count("vectors_upserted", len(body.get("vectors", [])))
+    return {"upsertedCount": len(body.get("vectors", []))}
+
+
+@app.post("/data/{index}/query")
+async def query(index: str, body: Dict[str, Any]):
+    error = await _simulate("query")
+    if error:
+        return error
+    vectors = _namespace(index, body.get("namespace"))
+    if vectors is None:
+        return _error(404, "NOT_FOUND", f"Index {index} not found")
+    if body.get("vector") is None:
+        return _error(400, "INVALID_ARGUMENT", "Query by vector is the only mode the stub supports")
+
+    candidates = [
+        (vector_id, vector) for vector_id, vector in vectors.items()
+        if _matches_filter(vector["metadata"], body.get("filter"))
+    ]
+    matches = []
+    if candidates:
+        matrix = np.array([vector["values"] for _, vector in candidates], dtype=np.float32)
+        scores = _scores(indexes[index]["model"]["metric"], matrix, np.array(body["vector"], dtype=np.float32))
+        # Ties break by id so results are stable
+        order = sorted(range(len(candidates)), key=lambda i: (-float(scores[i]), candidates[i][0]))
+        for i in order[:int(body.get("topK", 10))]:
+            vector_id, vector = candidates[i]
+            match = {"id": vector_id, "score": float(scores[i]), "values": vector["values"] if body.get("includeValues") else []}
+            if body.get("includeMetadata"):
+                match["metadata"] = vector["metadata"]
+            matches.append(match)
+    return {"matches": matches, "namespace": body.get("namespace", ""), "usage": {"readUnits": 5}}
+
+
+@app.get("/data/{index}/vectors/fetch")
+async def fetch(index: str, ids: List[str] = Query(default=[]), namespace: str = ""):
+    error = await _simulate("fetch")
+    if error:
+        return error
+    vectors = _namespace(index, namespace)
+    if vectors is None:
+        return _error(404, "NOT_FOUND", f"Index {index} not found")
+    return {
+        "vectors": {
+            vector_id: {"id": vector_id, **vectors[vector_id]}
+            for vector_id in ids if vector_id in vectors
+        },
+        "namespace": namespace,
+        "usage": {"readUnits": 1}
+    }
+
+
+@app.post("/data/{index}/vectors/delete")
+async def delete_vectors(index: str, body: Dict[str, Any]):
+    error = await _simulate("delete")
+    if error:
+        return error
+    vectors = _namespace(index, body.get("namespace"))
+    if vectors is None:
+        return _error(404, "NOT_FOUND", f"Index {index} not found")
+    if body.get("deleteAll"):
+        vectors.clear()
+    for vector_id in body.get("ids", []) or []:
+        vectors.pop(vector_id, None)
+    return {}
+
+
+@app.api_route("/data/{index}/describe_index_stats", methods=["GET", "POST"])
+async def describe_index_stats(index: str):
+    error = await _simulate("describe_index_stats")
+    if error:
+        return error
+    entry = indexes.get(index)
+    if entry is None:
+        return _error(404, "NOT_FOUND", f"Index {index} not found")
+    namespaces = {name: {"vectorCount": len(vectors)} for name, vectors in entry["namespaces"].items() if vectors}
+    return {
+        "namespaces": namespaces,
+        "dimension": entry["model"]["dimension"],
+        "indexFullness": 0.0,
+        "totalVectorCount": sum(ns["vectorCount"] for ns in namespaces.values())
+    }
+
+
+# ---------------------------------------------------------------------------
+# Stub controls
+# ---------------------------------------------------------------------------
+
+@app.get("/stub/stats")
+async def get_stats():
+    """Requests served, injected faults, indexes and vector counts"""
+    return {
+        "latency": latency.spec,
+        **stats.snapshot(),
+        "indexes": {
+            name: sum(len(vectors) for vectors in entry["namespaces"].values())
+            for name, entry in indexes.items()
+        }
+    }
+
+
+@app.post("/stub/config")
+async def update_config(changes: Dict[str, Any]):
+    """Change latency / error_rate / rate_limit_rate / retry_after_seconds while running"""
+    global latency
+    latency = apply_config(latency, faults, changes)
+    return {
+        "latency": latency.spec,
+        "error_rate": faults.error_rate,
+        "rate_limit_rate": faults.rate_limit_rate,
+        "retry_after_seconds": faults.retry_after_seconds
+    }
+
+
+@app.delete("/stub/indexes")
+async def reset_indexes():
+    """Drop every index (between test runs)"""
+    removed = len(indexes)
+    indexes.clear()
+    return {"removed": removed}
+
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run(app, host="0.0.0.0", port=port)
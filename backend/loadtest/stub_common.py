@@ -0,0 +1,140 @@
+"""
+Stub Common
+Latency distributions and fault injection shared by the Gemini and Pinecone
+stand-in servers.
+
+Latency specs (milliseconds):
+    fixed:200            always 200 ms
+    uniform:100:500      uniformly between 100 and 500 ms
+    lognormal:800:4000   median 800 ms, p99 4000 ms (long tail, like real LLM calls)
+
+All random draws come from one generator seeded with STUB_SEED, so a run with
+the same seed and request order injects the same latencies and faults.
+"""
+import os
+import math
+import time
+import random
+import asyncio
+from collections import deque
+from typing import Dict, Any, Optional, Tuple
+
+# z-score of the 99th percentile of a standard normal distribution
+Z_P99 = 2.3263
+
+rng = random.Random(int(os.getenv("STUB_SEED", "42")))
+
+
+class LatencyModel:
+    """Samples a delay from a `kind:params` spec"""
+
+    def __init__(self, spec: str):
+        self.spec = spec
+        kind, *params = spec.split(":")
+        values = [float(p) for p in params]
+        if kind == "fixed" and len(values) == 1:
+            self._sample = lambda: values[0]
+        elif kind == "uniform" and len(values) == 2:
+            low, high = values
+            self._sample = lambda: rng.uniform(low, high)
+        elif kind == "lognormal" and len(values) == 2:
+            median, p99 = values
+            mu = math.log(max(median, 0.001))
+            sigma = max(0.0, math.log(max(p99, median) / max(median, 0.001)) / Z_P99)
+            self._sample = lambda: rng.lognormvariate(mu, sigma)
+        else:
+            raise ValueError(f"Invalid latency spec '{spec}' (use fixed:MS, uniform:MIN:MAX or lognormal:MEDIAN:P99)")
+
+    def sample_seconds(self) -> float:
+        return max(0.0, self._sample()) / 1000.0
+
+
+class FaultInjector:
+    """Random 5xx / 429 responses plus an optional per-key requests-per-minute quota"""
+
+    def __init__(self, error_rate: float, rate_limit_rate: float, retry_after_seconds: int, key_rpm: int = 0):
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after_seconds = retry_after_seconds
+        self.key_rpm = key_rpm
+        self._key_requests: Dict[str, deque] = {}
+
+    def _over_quota(self, key: Optional[str]) -> bool:
+        if self.key_rpm <= 0 or not key:
+            return False
+        now = time.monotonic()
+        window = self._key_requests.setdefault(key, deque())
+        while window and now - window[0] >= 60:
+            window.popleft()
+        if len(window) >= self.key_rpm:
+            return True
+        window.append(now)
+        return False
+
+    def draw(self, key: Optional[str] = None) -> Optional[Tuple[int, str]]:
+        """
+        Decide whether this request fails.
+
+        Returns:
+            (status_code, reason) for an injected failure, or None to serve normally
+        """
+        if self._over_quota(key):
+            return 429, "quota"
+        roll = rng.random()
+        if roll < self.rate_limit_rate:
+            return 429, "injected"
+        if roll < self.rate_limit_rate + self.error_rate:
+            return 503, "injected"
+        return None
+
+
+class StubStats:
+    """Request counters exposed at /stub/stats"""
+
+    def __init__(self):
+        self.started_at = time.time()
+        self.counters: Dict[str, int] = {}
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def count(self, name: str, amount: int = 1) -> None:
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def enter(self) -> None:
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+    def leave(self) -> None:
+        self.in_flight -= 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "uptime_seconds": round(time.time() - self.started_at),
+            "in_flight": self.in_flight,
+            "max_in_flight": self.max_in_flight,
+            **self.counters
+        }
+
+
+def apply_config(latency: LatencyModel, faults: FaultInjector, changes: Dict[str, Any]) -> LatencyModel:
+    """
+    Update fault settings in place from a /stub/config body.
+
+    Returns:
+        The latency model to use from now on (replaced when `latency` is given)
+    """
+    if "error_rate" in changes:
+        faults.error_rate = float(changes["error_rate"])
+    if "rate_limit_rate" in changes:
+        faults.rate_limit_rate = float(changes["rate_limit_rate"])
+    if "retry_after_seconds" in changes:
+        faults.retry_after_seconds = int(changes["retry_after_seconds"])
+    if "key_rpm" in changes:
+        faults.key_rpm = int(changes["key_rpm"])
+    if changes.get("latency"):
+        return LatencyModel(changes["latency"])
+    return latency
+
+
+async def sleep_for(latency: LatencyModel) -> None:
+    await asyncio.sleep(latency.sample_seconds())
@@ -1,5 +1,5 @@
 from fastapi import FastAPI, Depends, UploadFile, File, Form, BackgroundTasks, Request
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy.orm import Session
 from sqlalchemy import text, func, or_
@@ -212,6 +212,11 @@ async def get_mandatory_files(db: Session = Depends(get_db), include_content: bo
     except Exception as e:
         return {"success": False, "error": f"Error fetching mandatory files: {str(e)}"}
 
+def _invalidate_kb_registry():
+    """Mark the in-memory knowledge-base registry stale after files change"""
+    from services.kb_registry_service import kb_registry_service
+    kb_registry_service.invalidate()
+
 @app.post("/api/mandatory-files/upload")
 async def upload_mandatory_file(
     file: UploadFile = File(...),
@@ -301,6 +306,7 @@ async def upload_mandatory_file(
         db.refresh(mandatory_file)
         
         print(f"💾 [MANDATORY-UPLOAD] Saved file '{file.filename}' (ID: {mandatory_file.id}) to DATABASE - Size: {file_size} bytes, User: {user_email}")
+        _invalidate_kb_registry()
         
         return {
             "success": True,
@@ -335,6 +341,16 @@ async def delete_mandatory_file(file_id: int, db: Session = Depends(get_db)):
         # Hard delete - permanently remove from database (file content is in DB, no file system cleanup needed)
         db.delete(mandatory_file)
         db.commit()
+        _invalidate_kb_registry()
+        
+        # Drop the file's Pinecone index so it does not linger as an orphan
+        try:
+            from services.indexing_service import indexing_service
+            delete_result = indexing_service.remove_file(db, file_id=file_id, file_name=file_name)
+            if not delete_result.get("success"):
+                print(f"⚠️ [PINECONE] Failed to delete index: {delete_result.get('error')}")
+        except Exception as e:
+            print(f"⚠️ [PINECONE] Error deleting index: {str(e)}")
         
         return {
             "success": True,
@@ -389,15 +405,14 @@ async def add_project_knowledge_base_file(
             db.add(knowledge_base_file)
             db.commit()
             db.refresh(knowledge_base_file)
+            _invalidate_kb_registry()
             should_index = True
         
         # Index file to Pinecone (separate index per file)
         # This runs whether file is new or existing to ensure Pinecone is synced
         if should_index:
             try:
-                from services.pinecone_service import pinecone_service
-                from services.chunking_service import chunking_service
-                from services.embedding_service import embedding_service
+                from services.indexing_service import indexing_service
                 
                 print(f"🌲 [PINECONE] Indexing mandatory file {file_id} ({mandatory_file.file_name}) to Pinecone...")
                 
@@ -405,46 +420,19 @@ async def add_project_knowledge_base_file(
                 if not mandatory_file.extracted_text:
                     print(f"⚠️ [PINECONE] File {file_id} has no extracted_text, skipping Pinecone indexing")
                 else:
-                    # Create index for this file
-                    index_result = pinecone_service.create_index_for_file(
+                    # Create index, chunk (400 chars, 100 overlap), embed and upsert
+                    index_file_result = indexing_service.index_file(
+                        db,
                         file_id=file_id,
-                        file_name=mandatory_file.file_name
+                        file_name=mandatory_file.file_name,
+                        text=mandatory_file.extracted_text,
+                        metadata={"file_type": mandatory_file.file_type or "unknown"}
                     )
                     
-                    if not index_result.get("success"):
-                        print(f"⚠️ [PINECONE] Failed to create index: {index_result.get('error')}")
+                    if index_file_result.get("success"):
+                        print(f"✅ [PINECONE] Successfully indexed {index_file_result.get('chunks_indexed', 0)} chunks for file {file_id}")
                     else:
-                        # Chunk text (400 chars, 100 overlap)
-                        chunks = chunking_service.chunk_text_by_characters(
-                            text=mandatory_file.extracted_text,
-                            chunk_size=400,
-                            chunk_overlap=100,
-                            metadata={
-                                "file_id": file_id,
-                                "file_name": mandatory_file.file_name,
-                                "file_type": mandatory_file.file_type or "unknown"
-                            }
-                        )
-                        
-                        if chunks:
-                            # Generate embeddings
-                            chunk_texts = [chunk["text"] for chunk in chunks]
-                            embeddings = embedding_service.embed(chunk_texts)
-                            
-                            # Index to Pinecone
-                            index_chunks_result = pinecone_service.index_file_chunks(
-                                file_id=file_id,
-                                file_name=mandatory_file.file_name,
-                                chunks=chunks,
-                                embeddings=embeddings
-                            )
-                            
-                            if index_chunks_result.get("success"):
-                                print(f"✅ [PINECONE] Successfully indexed {index_chunks_result.get('chunks_indexed', 0)} chunks for file {file_id}")
-                            else:
-                                print(f"⚠️ [PINECONE] Failed to index chunks: {index_chunks_result.get('error')}")
-                        else:
-                            print(f"⚠️ [PINECONE] No chunks created for file {file_id}")
+                        print(f"⚠️ [PINECONE] Failed to index file {file_id}: {index_file_result.get('error')}")
             except Exception as e:
                 print(f"⚠️ [PINECONE] Error during Pinecone indexing: {str(e)}")
                 import traceback
@@ -490,12 +478,17 @@ async def remove_project_knowledge_base_file(
         
         db.delete(knowledge_base_file)
         db.commit()
+        _invalidate_kb_registry()
         
-        # Delete Pinecone index for this file
-        if mandatory_file:
+        # Delete Pinecone index for this file, unless another user's knowledge base still uses it
+        still_referenced = db.query(ProjectKnowledgeBaseFile).filter(
+            ProjectKnowledgeBaseFile.mandatory_file_id == file_id
+        ).first() is not None
+        if mandatory_file and not still_referenced:
             try:
-                from services.pinecone_service import pinecone_service
-                delete_result = pinecone_service.delete_index(
+                from services.indexing_service import indexing_service
+                delete_result = indexing_service.remove_file(
+                    db,
                     file_id=file_id,
                     file_name=mandatory_file.file_name
                 )
@@ -564,9 +557,7 @@ async def reindex_all_knowledge_base_files(db: Session = Depends(get_db)):
     Useful for indexing files that were added before Pinecone integration.
     """
     try:
-        from services.pinecone_service import pinecone_service
-        from services.chunking_service import chunking_service
-        from services.embedding_service import embedding_service
+        from services.indexing_service import indexing_service
         
         # Get all knowledge base files
         knowledge_base_files = db.query(ProjectKnowledgeBaseFile).all()
@@ -596,73 +587,31 @@ async def reindex_all_knowledge_base_files(db: Session = Depends(get_db)):
             try:
                 print(f"🌲 [REINDEX] Indexing file {mandatory_file.id} ({mandatory_file.file_name})...")
                 
-                # Create index
-                index_result = pinecone_service.create_index_for_file(
-                    file_id=mandatory_file.id,
-                    file_name=mandatory_file.file_name
-                )
-                
-                if not index_result.get("success"):
-                    error_count += 1
-                    results.append({
-                        "file_id": mandatory_file.id,
-                        "file_name": mandatory_file.file_name,
-                        "success": False,
-                        "error": index_result.get("error", "Failed to create index")
-                    })
-                    continue
-                
-                # Chunk text
-                chunks = chunking_service.chunk_text_by_characters(
-                    text=mandatory_file.extracted_text,
-                    chunk_size=400,
-                    chunk_overlap=100,
-                    metadata={
-                        "file_id": mandatory_file.id,
-                        "file_name": mandatory_file.file_name,
-                        "file_type": mandatory_file.file_type or "unknown"
-                    }
-                )
-                
-                if not chunks:
-                    error_count += 1
-                    results.append({
-                        "file_id": mandatory_file.id,
-                        "file_name": mandatory_file.file_name,
-                        "success": False,
-                        "error": "No chunks created"
-                    })
-                    continue
-                
-                # Generate embeddings
-                chunk_texts = [chunk["text"] for chunk in chunks]
-                embeddings = embedding_service.embed(chunk_texts)
-                
-                # Index to Pinecone
-                index_chunks_result = pinecone_service.index_file_chunks(
+                index_file_result = indexing_service.index_file(
+                    db,
                     file_id=mandatory_file.id,
                     file_name=mandatory_file.file_name,
-                    chunks=chunks,
-                    embeddings=embeddings
+                    text=mandatory_file.extracted_text,
+                    metadata={"file_type": mandatory_file.file_type or "unknown"}
                 )
                 
-                if index_chunks_result.get("success"):
+                if index_file_result.get("success"):
                     success_count += 1
                     results.append({
                         "file_id": mandatory_file.id,
                         "file_name": mandatory_file.file_name,
                         "success": True,
-                        "chunks_indexed": index_chunks_result.get("chunks_indexed", 0),
-                        "index_name": index_result.get("index_name")
+                        "chunks_indexed": index_file_result.get("chunks_indexed", 0),
+                        "index_name": index_file_result.get("index_name")
                     })
-                    print(f"✅ [REINDEX] Successfully indexed {index_chunks_result.get('chunks_indexed', 0)} chunks for file {mandatory_file.id}")
+                    print(f"✅ [REINDEX] Successfully indexed {index_file_result.get('chunks_indexed', 0)} chunks for file {mandatory_file.id}")
                 else:
                     error_count += 1
                     results.append({
                         "file_id": mandatory_file.id,
                         "file_name": mandatory_file.file_name,
                         "success": False,
-                        "error": index_chunks_result.get("error", "Failed to index chunks")
+                        "error": index_file_result.get("error", "Failed to index file")
                     })
                     
             except Exception as e:
@@ -692,6 +641,283 @@ async def reindex_all_knowledge_base_files(db: Session = Depends(get_db)):
             "error": f"Error reindexing files: {str(e)}"
         }
 
+@app.post("/api/admin/reconcile-indexes")
+async def reconcile_vector_indexes(dry_run: bool = True, rebuild_missing: bool = True, db: Session = Depends(get_db)):
+    """
+    Reconcile Pinecone indexes against the database.
+    Deletes orphaned kb-file-* indexes (files that no longer exist or are no longer
+    in any knowledge base) and rebuilds indexes that are missing.
+    Defaults to a dry run that only reports counts.
+    """
+    try:
+        from services.indexing_service import indexing_service
+        
+        report = indexing_service.reconcile(db, dry_run=dry_run, rebuild_missing=rebuild_missing)
+        print(f"🧹 [RECONCILE] orphaned={report['orphaned_count']} missing={report['missing_count']} deleted={report['deleted_count']} rebuilt={report['rebuilt_count']} dry_run={dry_run}")
+        return report
+        
+    except Exception as e:
+        import traceback
+        print(f"❌ [RECONCILE] Error: {str(e)}")
+        print(traceback.format_exc())
+        return {
+            "success": False,
+            "error": f"Error reconciling indexes: {str(e)}"
+        }
+
+def _run_periodic_reconcile(interval_seconds: int):
+    """Background loop that reconciles vector indexes every interval_seconds"""
+    import time
+    from database import SessionLocal
+    from services.indexing_service import indexing_service
+    
+    while True:
+        time.sleep(interval_seconds)
+        db = SessionLocal()
+        try:
+            report = indexing_service.reconcile(db, dry_run=False, rebuild_missing=True)
+            print(f"🧹 [RECONCILE] Periodic run: deleted={report['deleted_count']} rebuilt={report['rebuilt_count']} errors={len(report['errors'])}")
+        except Exception as e:
+            print(f"⚠️ [RECONCILE] Periodic run failed: {str(e)}")
+        finally:
+            db.close()
+
+@app.on_event("startup")
+def start_index_reconciler():
+    """Start the periodic index reconciler if INDEX_RECONCILE_INTERVAL_SECONDS is set"""
+    interval_seconds = int(os.getenv("INDEX_RECONCILE_INTERVAL_SECONDS", "0"))
+    if interval_seconds > 0:
+        import threading
+        threading.Thread(target=_run_periodic_reconcile, args=(interval_seconds,), daemon=True).start()
+        print(f"🧹 [RECONCILE] Periodic index reconciliation every {interval_seconds}s")
+
+def _flush_llm_usage():
+    """Persist pending LLM token / cost aggregates"""
+    from database import SessionLocal
+    from services.llm_usage_service import llm_usage_service
+    
+    db = SessionLocal()
+    try:
+        llm_usage_service.flush(db)
+    finally:
+        db.close()
+
+def _run_periodic_usage_flush(interval_seconds: int):
+    """Background loop that writes LLM usage aggregates every interval_seconds"""
+    import time
+    
+    while True:
+        time.sleep(interval_seconds)
+        try:
+            _flush_llm_usage()
+        except Exception as e:
+            print(f"⚠️ [LLM-USAGE] Periodic flush failed: {str(e)}")
+
+@app.on_event("startup")
+def start_llm_usage_flusher():
+    """Start writing per-call-site LLM usage to the llm_usage table every LLM_USAGE_FLUSH_SECONDS"""
+    interval_seconds = int(os.getenv("LLM_USAGE_FLUSH_SECONDS", "60"))
+    if interval_seconds > 0:
+        import threading
+        threading.Thread(target=_run_periodic_usage_flush, args=(interval_seconds,), daemon=True).start()
+
+@app.on_event("startup")
+async def start_job_workers():
+    """Start the background job worker pool (sprint plan generation)"""
+    from services.job_service import job_service
+    
+    job_service.start()
+    print(f"🧵 [JOBS] {job_service.worker_count} job workers started")
+
+@app.on_event("shutdown")
+async def stop_job_workers():
+    """Cancel running background jobs; their heartbeat goes stale and pollers see them fail"""
+    from services.job_service import job_service
+    
+    await job_service.stop()
+
+@app.on_event("shutdown")
+async def close_gemini_client():
+    """Close the pooled Gemini HTTP connections"""
+    await gemini_service.aclose()
+
+@app.on_event("shutdown")
+def flush_llm_usage_on_shutdown():
+    """Write the last LLM usage aggregates before exiting"""
+    try:
+        _flush_llm_usage()
+    except Exception as e:
+        print(f"⚠️ [LLM-USAGE] Final flush failed: {str(e)}")
+
+@app.on_event("startup")
+def initialize_vector_generations():
+    """Point queries at the active vector generation (records generation 1 on first run)"""
+    from database import SessionLocal
+    from services.vector_generation_service import vector_generation_service
+
+    db = SessionLocal()
+    try:
+        active = vector_generation_service.initialize(db)
+        if active:
+            print(f"🧬 [GENERATIONS] Active generation {active['id']}: {active['provider']}/{active['model_name']} ({active['dimension']}d)")
+    except Exception as e:
+        print(f"⚠️ [GENERATIONS] Could not initialize vector generations: {str(e)}")
+    finally:
+        db.close()
+
+def _run_generation_sweeper():
+    """Background loop that garbage-collects retired vector generations once their grace period is over"""
+    import time
+    from database import SessionLocal
+    from services.vector_generation_service import vector_generation_service
+    
+    while True:
+        time.sleep(vector_generation_service.refresh_seconds)
+        db = SessionLocal()
+        try:
+            result = vector_generation_service.collect_retired(db)
+            if result["collected"]:
+                print(f"🧬 [GENERATIONS] Garbage-collected retired generation(s) {result['collected']}")
+        except Exception as e:
+            print(f"⚠️ [GENERATIONS] Sweep failed: {str(e)}")
+        finally:
+            db.close()
+
+@app.on_event("startup")
+def start_generation_sweeper():
+    """Collect retired vector generations in the background, never while queries may still use them"""
+    import threading
+    threading.Thread(target=_run_generation_sweeper, daemon=True).start()
+
+@app.get("/api/admin/vector-generations")
+async def get_vector_generations(db: Session = Depends(get_db)):
+    """List vector generations (embedding model, dimension, build progress, status)"""
+    try:
+        from services.vector_generation_service import vector_generation_service
+
+        return {
+            "success": True,
+            "configured": vector_generation_service.configured_signature(),
+            "generations": vector_generation_service.list_generations(db)
+        }
+    except Exception as e:
+        print(f"❌ [GENERATIONS] Error: {str(e)}")
+        return {
+            "success": False,
+            "error": f"Error listing vector generations: {str(e)}"
+        }
+
+@app.post("/api/admin/vector-generations/reembed")
+async def reembed_vector_generation(provider: str = None, model_name: str = None, db: Session = Depends(get_db)):
+    """
+    Blue/green re-embedding: build a new vector generation with another embedding
+    model in the background (defaults to EMBEDDING_PROVIDER / EMBEDDING_MODEL_NAME).
+    Queries keep using the active generation until every file is re-embedded, then
+    the new generation is activated atomically; the old indexes are deleted by a
+    later sweep, once every worker has switched.
+    """
+    try:
+        from services.vector_generation_service import vector_generation_service
+
+        result = vector_generation_service.start_reembed(db, provider=provider, model_name=model_name)
+        if result.get("success"):
+            generation = result["generation"]
+            print(f"🧬 [GENERATIONS] Building generation {generation['id']}: {generation['provider']}/{generation['model_name']}")
+        return result
+    except Exception as e:
+        import traceback
+        print(f"❌ [GENERATIONS] Error: {str(e)}")
+        print(traceback.format_exc())
+        return {
+            "success": False,
+            "error": f"Error starting re-embedding: {str(e)}"
+        }
+
+@app.get("/api/admin/vector-snapshots")
+async def list_vector_snapshots():
+    """List vector snapshot files in VECTOR_SNAPSHOT_DIR"""
+    from services.vector_snapshot_service import vector_snapshot_service
+
+    return {
+        "success": True,
+        "snapshots": vector_snapshot_service.list_snapshots()
+    }
+
+@app.post("/api/admin/vector-snapshots/export")
+async def export_vector_snapshot(file_name: str = None, db: Session = Depends(get_db)):
+    """
+    Dump vectors, ids and chunk metadata of the active generation to a compact
+    snapshot file (float16/float32 arrays plus a JSON manifest).
+    """
+    try:
+        from services.vector_snapshot_service import vector_snapshot_service
+
+        result = vector_snapshot_service.export_snapshot(db, file_name=file_name)
+        if result.get("success"):
+            print(f"📦 [SNAPSHOT] Exported {result['vector_count']} vectors from {result['index_count']} indexes to {result['path']}")
+        return result
+    except Exception as e:
+        import traceback
+        print(f"❌ [SNAPSHOT] Error: {str(e)}")
+        print(traceback.format_exc())
+        return {
+            "success": False,
+            "error": f"Error exporting vector snapshot: {str(e)}"
+        }
+
+@app.post("/api/admin/vector-snapshots/import")
+async def import_vector_snapshot(file_name: str, skip_existing: bool = True, db: Session = Depends(get_db)):
+    """
+    Restore a snapshot with bulk upserts instead of re-extracting and re-embedding
+    every file (fast cold start / disaster recovery).
+    """
+    try:
+        from services.vector_snapshot_service import vector_snapshot_service
+
+        result = vector_snapshot_service.import_snapshot(db, file_name=file_name, skip_existing=skip_existing)
+        print(f"📦 [SNAPSHOT] Import {file_name}: restored={result.get('restored_count', 0)} skipped={result.get('skipped_count', 0)} success={result.get('success')}")
+        return result
+    except Exception as e:
+        import traceback
+        print(f"❌ [SNAPSHOT] Error: {str(e)}")
+        print(traceback.format_exc())
+        return {
+            "success": False,
+            "error": f"Error importing vector snapshot: {str(e)}"
+        }
+
+@app.get("/api/admin/local-vector-store")
+async def get_local_vector_store_stats():
+    """Size of the local quantized vector store (search codes vs. full-precision re-scoring copy)"""
+    from services.local_vector_store_service import local_vector_store_service
+
+    return {
+        "success": True,
+        "stats": local_vector_store_service.get_stats()
+    }
+
+@app.get("/api/admin/local-vector-store/recall")
+async def get_local_vector_store_recall(k: int = 10, num_queries: int = 100):
+    """
+    Recall@k of int8 / float16 search (with and without full-precision re-scoring)
+    against exact float32 search, using chunks of our own corpus as queries.
+    """
+    try:
+        from services.local_vector_store_service import local_vector_store_service
+
+        report = local_vector_store_service.recall_report(k=k, num_queries=num_queries)
+        if report.get("success"):
+            print(f"📏 [VECTOR-STORE] Recall@{report['k']} over {report['vectors']} vectors: {report['modes']}")
+        return report
+    except Exception as e:
+        import traceback
+        print(f"❌ [VECTOR-STORE] Error: {str(e)}")
+        print(traceback.format_exc())
+        return {
+            "success": False,
+            "error": f"Error computing recall report: {str(e)}"
+        }
+
 # Authentication endpoints
 @app.get("/api/auth/google/url")
 async def get_google_auth_url(prompt: str = None):
@@ -893,9 +1119,9 @@ async def upload_docx_file(file: UploadFile = File(...), feature_type: str = "sp
         
         # Use appropriate service based on feature type
         if feature_type == "risk-assessment":
-            result = risk_docx_service.parse_docx_file(file_content)
+            result = await risk_docx_service.parse_docx_file(file_content)
         else:
-            result = docx_service.parse_docx_file(file_content)
+            result = await docx_service.parse_docx_file(file_content)
         
         if result['success']:
             print(f"🔍 [MAIN] Sending data to frontend: {result['data']}")
@@ -1181,7 +1407,7 @@ async def finish_sprint_custom(request: CustomSprintFinishRequest, db: Session =
             {"role": "user", "content": full_prompt}
         ]
         
-        result = gemini_service.chat(messages, max_tokens=3000)
+        result = await gemini_service.chat(messages, max_tokens=3000, call_site="sprint_finish")
         
         if result["success"]:
             # Convert Q&A list to user_inputs format for CSV and database
@@ -1243,6 +1469,7 @@ class GeneratePlanRequest(BaseModel):
     sow_content: str | None = None
     current_plan_content: str | None = None  # Include current plan for regeneration
     regenerate_with_current_plan: bool = False  # Flag to indicate regeneration
+    bypass_cache: bool = False  # Force a fresh Gemini call even if these exact inputs were generated before
     user_email: str  # Add user email to track who created the plan
     workspace_id: int | None = None  # Add workspace_id to track workspace
 
@@ -1302,7 +1529,10 @@ Please validate the sprint plan against the SOW and provide:
         ]
         
         print("🔍 [GEMINI CALL] Calling Gemini service for validation...")
-        gemini_response = gemini_service.chat(messages, max_tokens=2000)
+        gemini_response = await gemini_service.chat(
+            messages, max_tokens=2000, temperature=0.2, cache=True, bypass_cache=bool(request.get("bypass_cache")),
+            call_site="plan_sow_validate"
+        )
         
         if not gemini_response or not gemini_response.get('success', False):
             error_msg = gemini_response.get('response', 'Unknown error from Gemini service') if gemini_response else 'No response from Gemini'
@@ -1378,7 +1608,10 @@ Please validate the risk assessment against the SOW and provide:
             {"role": "user", "content": validation_data}
         ]
         
-        gemini_response = gemini_service.chat(messages, max_tokens=2000)
+        gemini_response = await gemini_service.chat(
+            messages, max_tokens=2000, temperature=0.2, cache=True, bypass_cache=bool(request.get("bypass_cache")),
+            call_site="risk_sow_validate"
+        )
         
         if not gemini_response or not gemini_response.get('success', False):
             error_msg = gemini_response.get('response', 'Unknown error from Gemini service') if gemini_response else 'No response from Gemini'
@@ -1434,7 +1667,44 @@ async def update_sow_content(request: dict, db: Session = Depends(get_db)):
 
 @app.post("/api/sprint/generate-plan")
 async def generate_sprint_plan(request: GeneratePlanRequest, db: Session = Depends(get_db)):
-    """Generate sprint plan with new structure"""
+    """
+    Start sprint plan generation as a background job and return its id immediately.
+    Poll GET /api/jobs/{job_id} or subscribe to GET /api/jobs/{job_id}/events for
+    stage progress; the finished job's `result` is the generated plan payload.
+    """
+    from services.job_service import job_service
+    
+    try:
+        job = job_service.submit(
+            db, "sprint_plan",
+            lambda job_db, report: _run_sprint_plan_generation(request, job_db, report),
+            user_email=request.user_email
+        )
+        print(f"🚀 [GENERATE SPRINT PLAN] Queued job {job['job_id']} for {request.user_email}")
+        return {
+            "success": True,
+            "message": "Sprint plan generation started",
+            "job_id": job["job_id"],
+            "status": job["status"],
+            "status_url": f"/api/jobs/{job['job_id']}",
+            "events_url": f"/api/jobs/{job['job_id']}/events"
+        }
+    except Exception as e:
+        print(f"❌ [GENERATE PLAN] Error queueing job: {str(e)}")
+        return {"success": False, "message": f"Error starting sprint plan generation: {str(e)}"}
+
+async def _run_sprint_plan_generation(request: GeneratePlanRequest, db: Session, report) -> Dict[str, Any]:
+    """
+    Sprint plan pipeline run by the job workers: generate, validate, save.
+    
+    Args:
+        request: The generate-plan request
+        db: The job's database session
+        report: report(stage, progress) callback for job progress
+    
+    Returns:
+        Dict with success, message, response (plan HTML) and plan_id
+    """
     try:
         import json
         
@@ -1656,7 +1926,19 @@ IMPORTANT INSTRUCTIONS:
             print(str(payload_preview))
         print("===== END LLM PAYLOAD (PREVIEW) =====")
         
-        gemini_response = gemini_service.chat(messages, max_tokens=4000)
+        report("generating", 10)
+        if gemini_service.plan_generation_mode == "sectioned" and not is_regeneration:
+            # Independent sections as concurrent smaller calls, assembled locally
+            print("🧩 [GEMINI CALL] Sectioned generation mode")
+            gemini_response = await gemini_service.generate_sprint_plan_sectioned(
+                stored_prompt=stored_prompt,
+                user_inputs=user_inputs_text,
+                backlog_items=user_inputs['product_backlog'].get('BacklogItems', []),
+                title=f"Sprint Plan - Sprint {user_inputs['sprint_overview'].get('SprintNumber', 'N/A')}",
+                bypass_cache=request.bypass_cache
+            )
+        else:
+            gemini_response = await gemini_service.chat(messages, max_tokens=4000, cache=True, bypass_cache=request.bypass_cache, call_site="plan_generate")
         
         print("🔍 [GEMINI CALL] Gemini service response received:")
         print(f"   - Response object: {gemini_response}")
@@ -1687,30 +1969,16 @@ IMPORTANT INSTRUCTIONS:
             # STEP 2: VALIDATION AND FINE-TUNING FOR PB COMPLETENESS
             print("🔍 [STEP 2] Starting PB completeness validation and fine-tuning...")
             
-            # Pre-validation check for missing sections
+            # Sections and PB counts are checked locally first; Gemini only re-validates an incomplete plan
             original_plan = gemini_response.get("response", "")
-            missing_sections = []
-            
-            if "Detailed Task Breakdown" not in original_plan:
-                missing_sections.append("Detailed Task Breakdown")
-            if "Committed Sprint Backlog" not in original_plan:
-                missing_sections.append("Committed Sprint Backlog")
-            if "Sprint Overview" not in original_plan:
-                missing_sections.append("Sprint Overview")
-            if "Team Capacity" not in original_plan:
-                missing_sections.append("Team Capacity")
-            
-            if missing_sections:
-                print(f"❌ [PRE-VALIDATION] Missing critical sections: {missing_sections}")
-                print("🔄 [PRE-VALIDATION] Plan will be regenerated to include missing sections")
-            else:
-                print("✅ [PRE-VALIDATION] All critical sections present")
             
-            validation_result = gemini_service.validate_and_finetune_sprint_plan(
+            report("validating", 55)
+            validation_result = await gemini_service.validate_and_finetune_sprint_plan(
                 original_plan=original_plan,
                 user_inputs=user_inputs_text,
                 stored_prompt=stored_prompt,
-                expected_pb_count=expected_pb_count
+                expected_pb_count=expected_pb_count,
+                backlog_items=[item.get('userStorySummary', '') for item in user_inputs['product_backlog'].get('BacklogItems', [])]
             )
             
             if validation_result.get("success"):
@@ -1796,25 +2064,7 @@ IMPORTANT INSTRUCTIONS:
                 print("❌ [GENERATED PLAN ANALYSIS] Generated plan is empty!")
             
             
-            # Add delay to ensure generated_plan is fully populated
-            import time
-            print("⏳ [PDF GENERATION] Waiting 3 seconds for data to settle...")
-            time.sleep(3)
-            
-            # Double-check the generated_plan content before PDF generation
-            final_generated_plan = plan_data.get('generated_plan', '')
-            print(f"🔍 [PDF GENERATION] Final check - Generated plan length: {len(final_generated_plan)}")
-            print(f"🔍 [PDF GENERATION] Final check - Generated plan preview: {final_generated_plan[:300]}...")
-            
-            if not final_generated_plan or len(final_generated_plan.strip()) < 100:
-                print("❌ [PDF GENERATION] Generated plan is still empty or too short!")
-                print("❌ [PDF GENERATION] Waiting additional 5 seconds...")
-                time.sleep(5)
-                final_generated_plan = plan_data.get('generated_plan', '')
-                print(f"🔍 [PDF GENERATION] After additional wait - Length: {len(final_generated_plan)}")
-            
-            # Update plan_data with final content
-            plan_data['generated_plan'] = final_generated_plan
+            report("saving", 85)
             
             # CRITICAL: Ensure generated_plan is not lost
             print(f"🔍 [PDF GENERATION] CRITICAL CHECK - Before PDF generation:")
@@ -1873,6 +2123,61 @@ IMPORTANT INSTRUCTIONS:
         print(f"❌ [GENERATE PLAN] Error: {str(e)}")
         return {"success": False, "message": f"Error generating sprint plan: {str(e)}"}
 
+@app.get("/api/jobs/{job_id}")
+async def get_job(job_id: str, db: Session = Depends(get_db)):
+    """Status, stage and progress of a background job; includes `result` once finished"""
+    from services.job_service import job_service
+    
+    job = job_service.get(db, job_id)
+    if job is None:
+        return {"success": False, "error": "Job not found"}
+    return {"success": True, **job}
+
+@app.get("/api/jobs/{job_id}/events")
+async def stream_job_events(job_id: str):
+    """
+    Server-sent events for a background job: `stage` whenever the stage changes,
+    then `done` with the full job (including `result`).
+    """
+    import json
+    import asyncio
+    from services.job_service import job_service, FINISHED_STATUSES
+    
+    poll_seconds = float(os.getenv("JOB_EVENTS_POLL_SECONDS", "1"))
+    
+    def sse(event: str, data: Dict[str, Any]) -> str:
+        return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+    
+    async def event_stream():
+        last_stage = None
+        while True:
+            # Sync DB read in a worker thread, like the job state writes
+            job = await asyncio.to_thread(job_service.fetch, job_id)
+            
+            if job is None:
+                yield sse("done", {"success": False, "error": "Job not found"})
+                return
+            if job["status"] in FINISHED_STATUSES:
+                yield sse("done", {"success": True, **job})
+                return
+            if job["stage"] != last_stage:
+                last_stage = job["stage"]
+                yield sse("stage", {"job_id": job_id, "status": job["status"], "stage": job["stage"], "progress": job["progress"]})
+            await asyncio.sleep(poll_seconds)
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.get("/api/admin/jobs")
+async def get_job_stats():
+    """This worker's background job pool: workers, queued and running jobs"""
+    from services.job_service import job_service
+    
+    return {"success": True, **job_service.get_stats()}
+
 # LLM and Gemini endpoints
 @app.post("/api/llm/chat", response_model=LLMChatResponse)
 async def llm_chat(request: LLMChatRequest):
@@ -1895,7 +2200,72 @@ async def gemini_chat(request: dict):
         # If a system message exists, combine ours ahead of it
         messages = [{"role": "system", "content": system_prompt}] + messages
 
-    return gemini_service.chat(messages, request.get("max_tokens", 3000))
+    return await gemini_service.chat(
+        messages,
+        request.get("max_tokens", 3000),
+        temperature=request.get("temperature"),
+        stop_sequences=request.get("stop_sequences"),
+        call_site="gemini_chat"
+    )
+
+@app.get("/api/admin/gemini-keys")
+async def get_gemini_key_stats():
+    """Per-key Gemini usage: requests, throttles, remaining RPM/TPM and cooldowns"""
+    from services.gemini_service import gemini_service
+    
+    return {"success": True, "keys": gemini_service.get_key_stats()}
+
+@app.get("/api/admin/gemini-resilience")
+async def get_gemini_resilience_stats():
+    """Gemini circuit breaker state and retry / deadline counters"""
+    from services.gemini_service import gemini_service
+    
+    return {"success": True, **gemini_service.get_resilience_stats()}
+
+@app.get("/api/admin/llm-dispatch")
+async def get_llm_dispatch_stats():
+    """Interactive / bulk LLM lanes: limits, running calls, queue depth and wait times"""
+    from services.llm_dispatcher import llm_dispatcher
+    
+    return {"success": True, **llm_dispatcher.get_stats()}
+
+@app.get("/api/admin/plan-validation")
+async def get_plan_validation_stats():
+    """Local sprint plan / risk assessment checks and how many skipped the Gemini validation pass"""
+    from services.plan_validator_service import plan_validator_service
+    
+    return {"success": True, **plan_validator_service.get_stats()}
+
+@app.get("/api/admin/llm-cache")
+async def get_llm_cache_stats():
+    """Hit rate and size of the Gemini response cache"""
+    from services.llm_cache_service import llm_cache_service
+    
+    return {"success": True, **llm_cache_service.get_stats()}
+
+@app.delete("/api/admin/llm-cache")
+async def clear_llm_cache():
+    """Drop all cached Gemini responses"""
+    from services.llm_cache_service import llm_cache_service
+    
+    removed = llm_cache_service.clear()
+    print(f"⚡ [LLM-CACHE] Cleared {removed} entries")
+    return {"success": True, "removed": removed}
+
+@app.get("/api/admin/llm-usage")
+async def get_llm_usage(hours: int = 24, db: Session = Depends(get_db)):
+    """Gemini tokens, latency and cost per call site over the last `hours` (most expensive first)"""
+    from services.llm_usage_service import llm_usage_service
+    
+    try:
+        return {
+            "success": True,
+            **llm_usage_service.breakdown(db, max(1, hours)),
+            "this_worker_since_start": llm_usage_service.get_stats()
+        }
+    except Exception as e:
+        print(f"❌ [LLM-USAGE] Error building usage report: {str(e)}")
+        return {"success": False, "error": f"Error building usage report: {str(e)}"}
 
 # Background task for indexing files in Pinecone
 def index_file_background(file_id: int, text: str, source_filename: str, file_type: str, uploaded_by: str, uploaded_at):
@@ -1904,9 +2274,7 @@ def index_file_background(file_id: int, text: str, source_filename: str, file_ty
     This runs asynchronously and doesn't block the upload response.
     """
     try:
-        from services.pinecone_service import pinecone_service
-        from services.chunking_service import chunking_service
-        from services.embedding_service import embedding_service
+        from services.indexing_service import indexing_service
         from database import SessionLocal
         from datetime import datetime
         import traceback
@@ -1953,61 +2321,29 @@ def index_file_background(file_id: int, text: str, source_filename: str, file_ty
             
             print(f"📋 [BACKGROUND INDEX] Starting indexing for file {file_id} ({source_filename}), text length: {len(text_to_index)}")
             
-            # Create Pinecone index for this file
-            pinecone_index_result = pinecone_service.create_index_for_file(
+            # Create index, chunk (400 chars, 100 overlap), embed and upsert
+            index_file_result = indexing_service.index_file(
+                db,
                 file_id=file_id,
-                file_name=source_filename
-            )
-            
-            if not pinecone_index_result.get("success"):
-                error_msg = pinecone_index_result.get("error", "Unknown error creating Pinecone index")
-                uploaded_file.indexing_status = "error"
-                db.commit()
-                print(f"⚠️ [BACKGROUND INDEX] File {file_id} indexing failed: {error_msg}")
-                return
-            
-            # Chunk text for Pinecone (400 chars, 100 overlap)
-            chunks = chunking_service.chunk_text_by_characters(
+                file_name=source_filename,
                 text=text_to_index,
-                chunk_size=400,
-                chunk_overlap=100,
                 metadata={
-                    "file_id": file_id,
-                    "file_name": source_filename,
                     "file_type": file_type,
                     "uploaded_by": uploaded_by,
                     "uploaded_at": upload_datetime.isoformat() if upload_datetime else None
                 }
             )
             
-            if not chunks:
-                uploaded_file.indexing_status = "error"
-                db.commit()
-                print(f"⚠️ [BACKGROUND INDEX] File {file_id}: No chunks generated for Pinecone indexing")
-                return
-            
-            # Generate embeddings for chunks
-            chunk_texts = [chunk["text"] for chunk in chunks]
-            embeddings = embedding_service.embed(chunk_texts)
-            
-            # Index chunks in Pinecone
-            index_chunks_result = pinecone_service.index_file_chunks(
-                file_id=file_id,
-                file_name=source_filename,
-                chunks=chunks,
-                embeddings=embeddings
-            )
-            
-            if index_chunks_result.get("success"):
+            if index_file_result.get("success"):
                 uploaded_file.indexing_status = "indexed"
                 db.commit()
-                print(f"✅ [BACKGROUND INDEX] File {file_id} indexed successfully in Pinecone: {index_chunks_result.get('chunks_indexed', 0)} chunks")
+                _invalidate_kb_registry()
+                print(f"✅ [BACKGROUND INDEX] File {file_id} indexed successfully in Pinecone: {index_file_result.get('chunks_indexed', 0)} chunks")
             else:
-                error_msg = index_chunks_result.get('error', 'Unknown error during Pinecone indexing')
+                error_msg = index_file_result.get('error', 'Unknown error during Pinecone indexing')
                 uploaded_file.indexing_status = "error"
                 db.commit()
                 print(f"⚠️ [BACKGROUND INDEX] File {file_id} indexing failed: {error_msg}")
-                print(f"⚠️ [BACKGROUND INDEX] File {file_id} error details: {traceback.format_exc()}")
             
         except Exception as e:
             # Update status to error if indexing fails
@@ -2498,18 +2834,25 @@ def _save_chat_message(
 def _search_across_all_files_and_route(
     question: str,
     top_k: int = 10,
-    db: Session = None
+    db: Session = None,
+    user_email: str = None,
+    query_embedding: List[float] = None
 ) -> Dict[str, Any]:
     """
     Search across all indexed files, group by file, calculate file scores,
     and prepare data for ROUTER + ANSWERER system.
+    With KB_SCOPE=user only the user's uploads and knowledge-base selection are searched.
     
     Returns:
         Dict with file_scores and context_chunks ready for LLM routing
     """
     from services.pinecone_service import pinecone_service
     from services.embedding_service import embedding_service
-    from models import UploadedFile, MandatoryFile, ProjectKnowledgeBaseFile
+    from services.chunk_store_service import chunk_store_service
+    from services.file_centroid_service import file_centroid_service
+    from services.hybrid_search_service import hybrid_search_service
+    from services.context_packer_service import context_packer_service
+    from services.kb_registry_service import kb_registry_service
     
     print(f"🔍 [ROUTER] Searching across all Pinecone indexes with top_k={top_k}")
     
@@ -2517,61 +2860,47 @@ def _search_across_all_files_and_route(
         print(f"⚠️ [ROUTER] Database session not provided")
         return {"file_scores": [], "context_chunks": []}
     
-    # Gather indexed uploaded files
-    uploaded_files = db.query(UploadedFile).filter(UploadedFile.indexing_status == "indexed").all()
-    
-    # Also include knowledge base mandatory files that are indexed
-    kb_file_ids = [
-        kb_file.mandatory_file_id
-        for kb_file in db.query(ProjectKnowledgeBaseFile).all()
-    ]
-    mandatory_files = []
-    if kb_file_ids:
-        mandatory_files = db.query(MandatoryFile).filter(MandatoryFile.id.in_(kb_file_ids)).all()
+    # Indexed uploads and knowledge-base files come from the in-memory registry (no table scans)
+    searchable_files = kb_registry_service.searchable_files(db, user_email=user_email)
     
-    if not uploaded_files and not mandatory_files:
+    if not searchable_files:
         print(f"⚠️ [ROUTER] No indexed files available for routing")
         return {"file_scores": [], "context_chunks": []}
     
-    existing_indexes = pinecone_service.list_indexes()
-    index_names = []
-    file_info_map = {}
-    
-    # Add uploaded file indexes
-    for file in uploaded_files:
-        index_name = pinecone_service.get_index_name_for_file(file.id, file.file_name)
-        if index_name in existing_indexes:
-            index_names.append(index_name)
-            file_info_map[index_name] = {
-                "file_id": file.id,
-                "file_name": file.file_name
-            }
-    
-    # Add mandatory file indexes
-    for file in mandatory_files:
-        index_name = pinecone_service.get_index_name_for_file(file.id, file.file_name)
-        if index_name in existing_indexes:
-            index_names.append(index_name)
-            file_info_map[index_name] = {
-                "file_id": file.id,
-                "file_name": file.file_name
-            }
-    
-    # Deduplicate index names
-    index_names = list(dict.fromkeys(index_names))
+    file_info_map = {
+        file["index_name"]: {"file_id": file["file_id"], "file_name": file["file_name"]}
+        for file in searchable_files
+    }
+    index_names = list(file_info_map)
     
     if not index_names:
         print(f"⚠️ [ROUTER] No Pinecone indexes available for routing")
         return {"file_scores": [], "context_chunks": []}
     
+    if query_embedding is None:
+        query_embedding = embedding_service.embed_query(question)
+    
+    # Two-stage retrieval: pick candidate files from in-memory centroids first
+    if file_centroid_service.enabled:
+        index_names = file_centroid_service.select_indexes(db, query_embedding, index_names)
+    
     print(f"📄 [ROUTER] Searching across indexes: {[file_info_map[idx]['file_name'] for idx in index_names]}")
     
-    query_embedding = embedding_service.embed_query(question)
-    search_result = pinecone_service.search_across_indexes(
-        query_embedding=query_embedding,
-        index_names=index_names,
-        top_k=max(3, top_k)  # ensure at least 3 per index
-    )
+    if hybrid_search_service.enabled:
+        # Lexical + vector fusion finds exact artifact names with a much smaller k
+        search_result = hybrid_search_service.search(
+            db,
+            question=question,
+            index_names=index_names,
+            top_k=min(top_k, hybrid_search_service.top_k),
+            query_embedding=query_embedding
+        )
+    else:
+        search_result = hybrid_search_service.vector_search(
+            query_embedding=query_embedding,
+            index_names=index_names,
+            top_k=max(3, top_k)  # ensure at least 3 per index
+        )
     
     if not search_result.get("success"):
         print(f"⚠️ [ROUTER] Pinecone search failed: {search_result.get('error')}")
@@ -2603,20 +2932,35 @@ def _search_across_all_files_and_route(
         
         files_dict[file_name]["chunks"].append({
             "score": score,
+            "rrf_score": result.get("rrf_score", score),
             "text": text,
             "metadata": metadata,
-            "chunk_id": result.get("id", f"chunk_{metadata.get('chunk_index', '?')}"),
+            "chunk_id": result.get("chunk_id", f"chunk_{metadata.get('chunk_index', '?')}"),
             "index_name": index_name
         })
         
         if score > files_dict[file_name]["top_score"]:
             files_dict[file_name]["top_score"] = score
     
+    # Hydrate chunk text only for the chunks that are sent to the LLM (top 3 per file, in fused rank order)
+    for file_data in files_dict.values():
+        file_data["chunks"] = sorted(file_data["chunks"], key=lambda x: x["rrf_score"], reverse=True)[:3]
+    chunk_store_service.hydrate(db, [chunk for file_data in files_dict.values() for chunk in file_data["chunks"]])
+    for file_name, file_data in files_dict.items():
+        for chunk in file_data["chunks"]:
+            chunk["text"] = chunk["metadata"].get("text", chunk["text"])
+            chunk["metadata"]["file_name"] = file_name
+    
+    # Merge overlapping neighbour chunks and drop near-duplicates within the token budget
+    packed_spans = context_packer_service.pack(
+        [chunk for file_data in files_dict.values() for chunk in file_data["chunks"]]
+    )
+    
     file_scores = []
     context_chunks = []
     
     for file_name, file_data in sorted(files_dict.items(), key=lambda x: x[1]["top_score"], reverse=True):
-        chunks = sorted(file_data["chunks"], key=lambda x: x["score"], reverse=True)
+        chunks = file_data["chunks"]
         top_chunk = chunks[0] if chunks else None
         summary = ""
         if top_chunk:
@@ -2631,12 +2975,14 @@ def _search_across_all_files_and_route(
             "summary": summary
         })
         
-        for chunk in chunks[:3]:
+        for span in packed_spans:
+            if span["file_name"] != file_name:
+                continue
             context_chunks.append({
                 "file_name": file_name,
-                "chunk_id": chunk.get("chunk_id"),
-                "text": chunk.get("text", ""),
-                "score": chunk.get("score", 0.0)
+                "chunk_id": "+".join(str(c) for c in span["chunk_ids"]),
+                "text": span["text"],
+                "score": span["score"]
             })
     
     print(f"📊 [ROUTER] Prepared {len(file_scores)} file scores and {len(context_chunks)} context chunks")
@@ -2647,43 +2993,69 @@ def _search_across_all_files_and_route(
     }
 
 
-@app.post("/api/ask-question")
-async def ask_chatbot_question(
-    question: str = Form(...),
-    file_id: int = Form(None),
-    file_context: str = Form(None),
-    mandatory_file_ids: str = Form(None),
-    chat_id: str = Form(None),
-    user_email: str = Form(None),
-    db: Session = Depends(get_db)
-):
+@app.get("/api/admin/answer-cache")
+async def get_answer_cache_stats():
+    """Semantic answer cache statistics (hit rate, saved LLM calls)"""
+    from services.answer_cache_service import answer_cache_service
+
+    return {
+        "success": True,
+        "stats": answer_cache_service.get_stats()
+    }
+
+@app.delete("/api/admin/answer-cache")
+async def clear_answer_cache():
+    """Drop all cached answers"""
+    from services.answer_cache_service import answer_cache_service
+
+    answer_cache_service.clear()
+    print(f"⚡ [ANSWER-CACHE] Cleared")
+    return {"success": True}
+
+
+def _prepare_question(
+    question: str,
+    file_id: int,
+    file_context: str,
+    mandatory_file_ids: str,
+    chat_id: str,
+    user_email: str,
+    db: Session
+) -> Dict[str, Any]:
     """
-    Ask a question to the chatbot using vector search.
-    - If file_context is provided, uses it directly (for mandatory files - backward compatibility)
-    - If file_id is provided, uses Pinecone vector search to retrieve relevant chunks
-    - If neither is provided, searches across all files using Pinecone indexes and ROUTER + ANSWERER system
+    Save the user's question, retrieve context and build the LLM request.
+
+    Returns:
+        Dict with either "response" (final payload; nothing to generate, e.g. an
+        answer-cache hit) or "mode" ("router" / "answer"), "messages" and
+        "max_tokens" / "temperature" for Gemini plus what _finish_question needs
     """
-    question = (question or "").strip()
-    chat_id = chat_id or str(uuid.uuid4())
-    
-    print(f"\n{'='*80}")
-    print(f"🔵 [ASK-QUESTION] New question received")
-    print(f"🔵 [ASK-QUESTION] Question: {question[:200]}...")
-    print(f"🔵 [ASK-QUESTION] Parameters - file_id: {file_id}, file_context: {'Yes' if file_context else 'No'}, mandatory_file_ids: {mandatory_file_ids}")
-    print(f"{'='*80}\n")
-    
     try:
-        from services.gemini_service import gemini_service
         from services.embedding_service import embedding_service
         from services.pinecone_service import pinecone_service
+        from services.chunk_store_service import chunk_store_service
+        from services.file_centroid_service import file_centroid_service
+        from services.hybrid_search_service import hybrid_search_service
+        from services.context_packer_service import context_packer_service
+        from services.vector_generation_service import vector_generation_service
+        from services.kb_registry_service import kb_registry_service
+        from services.answer_cache_service import answer_cache_service
         import json
         
+        # Pick up a vector generation activated by another worker (cheap; re-reads at most every few seconds)
+        vector_generation_service.refresh(db)
+        
         context_text = ""
         use_router_answerer = False
         use_pinecone_search = False  # Initialize Pinecone search flag
+        query_embedding = None
+        cache_scope = None  # Answer cache key (knowledge-base questions only)
         
         _save_chat_message(db, chat_id, "user", question, user_email)
         
+        # Knowledge-base retrieval is scoped to the asking user (KB_SCOPE)
+        scope_email = _resolve_user_email(db, chat_id, user_email)
+        
         if file_context:
             # Use provided file_context directly (e.g., from multiple mandatory files)
             # This maintains backward compatibility for mandatory files
@@ -2707,11 +3079,11 @@ async def ask_chatbot_question(
             # Use Pinecone vector search to retrieve relevant chunks
             uploaded_file = db.query(UploadedFile).filter(UploadedFile.id == file_id).first()
             if not uploaded_file:
-                return {
+                return {"response": {
                     "success": False,
                     "error": f"File with ID {file_id} not found.",
                     "chat_id": chat_id
-                }
+                }}
             
             print(f"📝 [ASK-QUESTION] 📄 Document being used: {uploaded_file.file_name} (ID: {file_id})")
             
@@ -2722,11 +3094,11 @@ async def ask_chatbot_question(
                     context_text = uploaded_file.extracted_text
                     print(f"⚠️ [ASK-QUESTION] File {file_id} not indexed, using full text (length: {len(context_text)} characters)")
                 else:
-                    return {
+                    return {"response": {
                         "success": False,
                         "error": f"File {file_id} is not indexed and has no extracted text available.",
                         "chat_id": chat_id
-                    }
+                    }}
             else:
                 # Use Pinecone vector search
                 print(f"🔍 [ASK-QUESTION] Using Pinecone search for file_id {file_id}")
@@ -2740,28 +3112,23 @@ async def ask_chatbot_question(
                         context_text = ""
                 else:
                     query_embedding = embedding_service.embed_query(question)
-                    search_result = pinecone_service.search_across_indexes(
+                    search_result = hybrid_search_service.vector_search(
                         query_embedding=query_embedding,
                         index_names=[index_name],
-                        top_k=5
+                        top_k=context_packer_service.max_candidates
                     )
                     
                     results = search_result.get("results") if search_result.get("success") else []
+                    chunk_store_service.hydrate(db, results)
                     
                     if results:
-                        chunk_texts = []
                         for result in results:
-                            metadata = result.get("metadata", {})
-                            chunk_text = metadata.get("text", "")
-                            chunk_index = metadata.get("chunk_index", "?")
-                            file_name = metadata.get("file_name", uploaded_file.file_name)
-                            score = result.get("score", 0.0)
-                            chunk_texts.append(
-                                f"[Chunk {chunk_index} from {file_name} (score: {score:.3f})]\n{chunk_text}"
-                            )
+                            result.setdefault("metadata", {}).setdefault("file_name", uploaded_file.file_name)
                         
-                        context_text = "\n\n---\n\n".join(chunk_texts)
-                        print(f"✅ [ASK-QUESTION] Retrieved {len(results)} relevant Pinecone chunks (total length: {len(context_text)} characters)")
+                        # Merge overlapping neighbour chunks and drop near-duplicates within the token budget
+                        spans = context_packer_service.pack(results)
+                        context_text = context_packer_service.format_context(spans)
+                        print(f"✅ [ASK-QUESTION] Retrieved {len(results)} relevant Pinecone chunks, packed into {len(spans)} spans (total length: {len(context_text)} characters)")
                     else:
                         if uploaded_file.extracted_text:
                             context_text = uploaded_file.extracted_text
@@ -2773,79 +3140,88 @@ async def ask_chatbot_question(
             # No file_id or file_context provided - search Pinecone indexes for knowledge base files
             use_pinecone_search = True
             print(f"🌲 [ASK-QUESTION] No specific file provided, searching Pinecone knowledge base indexes...")
+            
+            # Semantic answer cache: same question (by embedding) against the same knowledge-base version
+            if answer_cache_service.enabled:
+                query_embedding = embedding_service.embed_query(question)
+                cache_scope = kb_registry_service.scope_version(db, scope_email)
+                cached = answer_cache_service.lookup(cache_scope, query_embedding)
+                if cached:
+                    print(f"⚡ [ANSWER-CACHE] Hit (similarity {cached['similarity']:.3f}) for: {cached['question'][:100]}")
+                    from services.llm_usage_service import llm_usage_service
+                    llm_usage_service.record("answerer", cache_hit=True)
+                    _save_chat_message(db, chat_id, "assistant", cached["payload"].get("response", ""), user_email)
+                    return {"response": {
+                        **cached["payload"],
+                        "cached": True,
+                        "chat_id": chat_id
+                    }}
         
         # Build prompt with file context if available
         if use_pinecone_search:
             # Search across all Pinecone indexes for knowledge base files
             kb_context_found = False
             try:
-                knowledge_base_files = db.query(ProjectKnowledgeBaseFile).all()
+                knowledge_base_files = kb_registry_service.knowledge_base_files(db, user_email=scope_email)
                 
                 if knowledge_base_files:
-                    kb_file_ids = [kb_file.mandatory_file_id for kb_file in knowledge_base_files]
-                    all_mandatory_files = db.query(MandatoryFile).filter(
-                        MandatoryFile.id.in_(kb_file_ids),
-                        MandatoryFile.is_active == True,
-                        MandatoryFile.extracted_text.isnot(None),
-                        MandatoryFile.extracted_text != ""
-                    ).all()
+                    file_info_map = {
+                        file["index_name"]: {"file_id": file["file_id"], "file_name": file["file_name"]}
+                        for file in knowledge_base_files
+                        if file["indexed"]
+                    }
+                    index_names = list(file_info_map)
                     
-                    if all_mandatory_files:
-                        index_names = []
-                        file_info_map = {}
-                        existing_indexes = pinecone_service.list_indexes()
+                    if index_names:
+                        if query_embedding is None:
+                            query_embedding = embedding_service.embed_query(question)
+                        if file_centroid_service.enabled:
+                            index_names = file_centroid_service.select_indexes(db, query_embedding, index_names)
                         
-                        for file in all_mandatory_files:
-                            index_name = pinecone_service.get_index_name_for_file(file.id, file.file_name)
-                            if index_name in existing_indexes:
-                                index_names.append(index_name)
-                                file_info_map[index_name] = {
-                                    "file_id": file.id,
-                                    "file_name": file.file_name
-                                }
+                        print(f"🌲 [PINECONE] Searching across {len(index_names)} indexes: {[file_info_map[idx]['file_name'] for idx in index_names]}")
                         
-                        if index_names:
-                            print(f"🌲 [PINECONE] Searching across {len(index_names)} indexes: {[file_info_map[idx]['file_name'] for idx in index_names]}")
-                            
-                            query_embedding = embedding_service.embed_query(question)
-                            search_result = pinecone_service.search_across_indexes(
+                        if hybrid_search_service.enabled:
+                            search_result = hybrid_search_service.search(
+                                db,
+                                question=question,
+                                index_names=index_names,
+                                query_embedding=query_embedding
+                            )
+                        else:
+                            search_result = hybrid_search_service.vector_search(
                                 query_embedding=query_embedding,
                                 index_names=index_names,
                                 top_k=3
                             )
+                        
+                        if search_result.get("success") and search_result.get("results"):
+                            top_results = search_result["results"][:context_packer_service.max_candidates]
+                            chunk_store_service.hydrate(db, top_results)
                             
-                            if search_result.get("success") and search_result.get("results"):
-                                top_results = search_result["results"][:5]
-                                
-                                best_index = None
-                                best_score = 0.0
-                                for result in top_results:
-                                    if result["score"] > best_score:
-                                        best_score = result["score"]
-                                        best_index = result["index_name"]
-                                
-                                best_file_info = file_info_map.get(best_index, {})
-                                print(f"🌲 [PINECONE] Best match: {best_file_info.get('file_name', 'Unknown')} (score: {best_score:.3f})")
-                                
-                                chunk_texts = []
-                                for result in top_results:
-                                    metadata = result.get("metadata", {})
-                                    chunk_text = metadata.get("text", "")
-                                    file_name = metadata.get("file_name", "Unknown")
-                                    chunk_id = result.get("chunk_id", result.get("id", "?"))
-                                    score = result.get("score", 0.0)
-                                    
-                                    chunk_texts.append(f"[Chunk {chunk_id} from {file_name} (score: {score:.3f})]\n{chunk_text}")
-                                
-                                context_text = "\n\n---\n\n".join(chunk_texts)
-                                print(f"✅ [PINECONE] Retrieved {len(top_results)} relevant chunks (best score: {best_score:.3f})")
-                                kb_context_found = True
-                            else:
-                                print(f"⚠️ [PINECONE] No relevant results found in knowledge base.")
+                            best_index = None
+                            best_score = 0.0
+                            for result in top_results:
+                                if result["score"] > best_score:
+                                    best_score = result["score"]
+                                    best_index = result["index_name"]
+                            
+                            best_file_info = file_info_map.get(best_index, {})
+                            print(f"🌲 [PINECONE] Best match: {best_file_info.get('file_name', 'Unknown')} (score: {best_score:.3f})")
+                            
+                            for result in top_results:
+                                metadata = result.setdefault("metadata", {})
+                                if not metadata.get("file_name"):
+                                    metadata["file_name"] = file_info_map.get(result["index_name"], {}).get("file_name", "Unknown")
+                            
+                            # Merge overlapping neighbour chunks and drop near-duplicates within the token budget
+                            spans = context_packer_service.pack(top_results)
+                            context_text = context_packer_service.format_context(spans)
+                            print(f"✅ [PINECONE] Retrieved {len(top_results)} relevant chunks, packed into {len(spans)} spans (best score: {best_score:.3f})")
+                            kb_context_found = True
                         else:
-                            print(f"⚠️ [PINECONE] No Pinecone indexes found for knowledge base files.")
+                            print(f"⚠️ [PINECONE] No relevant results found in knowledge base.")
                     else:
-                        print(f"⚠️ [PINECONE] Mandatory files referenced by knowledge base are missing or empty.")
+                        print(f"⚠️ [PINECONE] No Pinecone indexes found for knowledge base files.")
                 else:
                     print(f"⚠️ [PINECONE] No files selected in knowledge base.")
             
@@ -2858,19 +3234,22 @@ async def ask_chatbot_question(
             if not kb_context_found:
                 use_router_answerer = True
                 context_text = ""
-        elif use_router_answerer:
+        
+        if use_router_answerer:
             # Use ROUTER + ANSWERER system (Pinecone fallback across all indexes)
-            router_data = _search_across_all_files_and_route(question, top_k=10, db=db)
+            router_data = _search_across_all_files_and_route(
+                question, top_k=10, db=db, user_email=scope_email, query_embedding=query_embedding
+            )
             
             if not router_data['file_scores'] or not router_data['context_chunks']:
                 # No results found, fallback to simple response
                 error_text = "No relevant documents found in the knowledge base. Please try rephrasing your question or upload relevant files."
                 _save_chat_message(db, chat_id, "assistant", error_text, user_email)
-                return {
+                return {"response": {
                     "success": False,
                     "error": error_text,
                     "chat_id": chat_id
-                }
+                }}
             
             # Build the prompt for ROUTER + ANSWERER
             user_prompt = f"""Process the following question using the provided file scores and context chunks.
@@ -2890,8 +3269,106 @@ Return ONLY the JSON object matching the schema specified in your instructions."
             ]
             
             print(f"📤 [ROUTER] Sending to LLM with {len(router_data['file_scores'])} files, {len(router_data['context_chunks'])} chunks")
-            result = gemini_service.chat(messages, max_tokens=4000)
+            return {
+                "mode": "router",
+                "call_site": "router",
+                "messages": messages,
+                "max_tokens": 4000,
+                "temperature": 0.1,  # Strict JSON output
+                "cache_scope": cache_scope,
+                "query_embedding": query_embedding
+            }
+        elif context_text:
+            prompt = f"""You are a helpful project management assistant. Based on the following document content, please answer the user's question in a clear, structured, and concise manner.
+
+DOCUMENT CONTENT:
+{context_text}
+
+USER QUESTION:
+{question}
+
+INSTRUCTIONS:
+- Provide a well-structured answer based on the document content
+- Use headings, bullet points, and clear formatting
+- Focus on answering the user's specific question
+- If the question cannot be answered using the document, clearly state that
+- Do NOT simply repeat the document content - synthesize and summarize the relevant information
+- When multiple documents are provided, consider information from all of them
+- **CRITICAL: The document contains links in the format "link_text (url)" or "[Link: url]". You MUST preserve ALL external links from the source document in your response.**
+- **When you mention any item that has a link in the source (like "Link to standard documentation/templates", "MOM Template", "RAID Log", "Project Plan", etc.), you MUST include the actual clickable HTML link in the format: <a href="url" target="_blank">link_text</a>**
+- **If a link appears in the format "link_text (url)" in the document content where url starts with http:// or https://, convert it to: <a href="url" target="_blank">link_text</a> in your response**
+- **If you see "[Link: url]" format in the document, convert it to: <a href="url" target="_blank">View Document</a> or <a href="url" target="_blank">Link</a>**
+- **IMPORTANT: If a section mentions a link text (like "Link to sample design document") and you can find a URL in the document content (even if not directly next to the text), include that URL as a clickable link.**
+- **Always scan the document content for any URLs (especially Google Sheets links like https://docs.google.com/spreadsheets/...) and include them as clickable links when they relate to the content being discussed.**
+- **For links marked as internal (format: "link_text (#internal:...)"), you can skip including the URL but still mention the link text if relevant.**
+- **Do NOT skip external links. If a section mentions a link with a valid URL, include that link in your response.**
+- **Look for patterns like "Link to...", "...Template", "...Log", "...Plan" - these are likely link references that need to be included with their URLs if they have valid external URLs.**
+- **For any Google Sheets or document links (URLs starting with http:// or https://), always include them as clickable links.**
+- **Example 1: If you see "Link to standard documentation/templates (https://example.com/templates)" in the document, your response should include: <a href="https://example.com/templates" target="_blank">Link to standard documentation/templates</a>**
+- **Example 2: If you see "Link to sample design document" and later find "https://docs.google.com/spreadsheets/d/1Gg4W2tmwaWqFQHpTqFxk3EVdWVuLKFrz/edit..." in the document, include: <a href="https://docs.google.com/spreadsheets/d/1Gg4W2tmwaWqFQHpTqFxk3EVdWVuLKFrz/edit..." target="_blank">Link to sample design document</a>**
+
+Please provide your answer:"""
+        else:
+            # No context available, answer without document reference
+            prompt = question
+        
+        # Debug: Log prompt length (but not the full content to avoid cluttering logs)
+        print(f"📝 [ASK-QUESTION] Prompt length: {len(prompt)} characters")
+        print(f"📝 [ASK-QUESTION] Question: {question[:100]}...")
+        
+        # Messages for Gemini (sent by the caller, blocking or streamed)
+        messages = [
+            {"role": "system", "content": _get_structured_html_system_prompt()},
+            {"role": "user", "content": prompt}
+        ]
+        
+        return {
+            "mode": "answer",
+            "call_site": "answerer",
+            "messages": messages,
+            "max_tokens": 3000,
+            "temperature": 0.3,
+            "context_text": context_text,
+            "cache_scope": cache_scope,
+            "query_embedding": query_embedding
+        }
             
+    except Exception as e:
+        error_message = f"Error processing question: {str(e)}"
+        _save_chat_message(db, chat_id, "assistant", error_message, user_email)
+        return {"response": {
+            "success": False,
+            "error": error_message,
+            "chat_id": chat_id
+        }}
+
+
+def _finish_question(
+    plan: Dict[str, Any],
+    result: Dict[str, Any],
+    question: str,
+    file_id: int,
+    chat_id: str,
+    user_email: str,
+    db: Session
+) -> Dict[str, Any]:
+    """
+    Turn the Gemini result for a prepared question into the response payload,
+    saving the assistant message and caching knowledge-base answers.
+
+    Args:
+        plan: Output of _prepare_question (mode, cache scope, context)
+        result: gemini_service.chat result, or the final chat_stream event
+    """
+    try:
+        from services.answer_cache_service import answer_cache_service
+        import json
+        
+        cache_scope = plan.get("cache_scope")
+        query_embedding = plan.get("query_embedding")
+        context_text = plan.get("context_text")
+        
+        if plan["mode"] == "router":
             if result['success']:
                 llm_response = result.get('response', '')
                 
@@ -2925,13 +3402,15 @@ Return ONLY the JSON object matching the schema specified in your instructions."
                     
                     formatted_answer = formatted_answer or ""
                     _save_chat_message(db, chat_id, "assistant", formatted_answer, user_email)
-                    return {
+                    response_payload = {
                         "success": True,
                         "response": formatted_answer,
                         "router_result": router_result,  # Include full router result for debugging
-                        "status": status,
-                        "chat_id": chat_id
+                        "status": status
                     }
+                    if cache_scope and status == "OK":
+                        answer_cache_service.store(cache_scope, question, query_embedding, response_payload)
+                    return {**response_payload, "chat_id": chat_id}
                 except json.JSONDecodeError as e:
                     print(f"⚠️ [ROUTER] Failed to parse JSON response: {e}")
                     print(f"⚠️ [ROUTER] Raw response: {llm_response[:500]}")
@@ -2954,51 +3433,6 @@ Return ONLY the JSON object matching the schema specified in your instructions."
                     "error": assistant_error,
                     "chat_id": chat_id
                 }
-        elif context_text:
-            prompt = f"""You are a helpful project management assistant. Based on the following document content, please answer the user's question in a clear, structured, and concise manner.
-
-DOCUMENT CONTENT:
-{context_text}
-
-USER QUESTION:
-{question}
-
-INSTRUCTIONS:
-- Provide a well-structured answer based on the document content
-- Use headings, bullet points, and clear formatting
-- Focus on answering the user's specific question
-- If the question cannot be answered using the document, clearly state that
-- Do NOT simply repeat the document content - synthesize and summarize the relevant information
-- When multiple documents are provided, consider information from all of them
-- **CRITICAL: The document contains links in the format "link_text (url)" or "[Link: url]". You MUST preserve ALL external links from the source document in your response.**
-- **When you mention any item that has a link in the source (like "Link to standard documentation/templates", "MOM Template", "RAID Log", "Project Plan", etc.), you MUST include the actual clickable HTML link in the format: <a href="url" target="_blank">link_text</a>**
-- **If a link appears in the format "link_text (url)" in the document content where url starts with http:// or https://, convert it to: <a href="url" target="_blank">link_text</a> in your response**
-- **If you see "[Link: url]" format in the document, convert it to: <a href="url" target="_blank">View Document</a> or <a href="url" target="_blank">Link</a>**
-- **IMPORTANT: If a section mentions a link text (like "Link to sample design document") and you can find a URL in the document content (even if not directly next to the text), include that URL as a clickable link.**
-- **Always scan the document content for any URLs (especially Google Sheets links like https://docs.google.com/spreadsheets/...) and include them as clickable links when they relate to the content being discussed.**
-- **For links marked as internal (format: "link_text (#internal:...)"), you can skip including the URL but still mention the link text if relevant.**
-- **Do NOT skip external links. If a section mentions a link with a valid URL, include that link in your response.**
-- **Look for patterns like "Link to...", "...Template", "...Log", "...Plan" - these are likely link references that need to be included with their URLs if they have valid external URLs.**
-- **For any Google Sheets or document links (URLs starting with http:// or https://), always include them as clickable links.**
-- **Example 1: If you see "Link to standard documentation/templates (https://example.com/templates)" in the document, your response should include: <a href="https://example.com/templates" target="_blank">Link to standard documentation/templates</a>**
-- **Example 2: If you see "Link to sample design document" and later find "https://docs.google.com/spreadsheets/d/1Gg4W2tmwaWqFQHpTqFxk3EVdWVuLKFrz/edit..." in the document, include: <a href="https://docs.google.com/spreadsheets/d/1Gg4W2tmwaWqFQHpTqFxk3EVdWVuLKFrz/edit..." target="_blank">Link to sample design document</a>**
-
-Please provide your answer:"""
-        else:
-            # No context available, answer without document reference
-            prompt = question
-        
-        # Debug: Log prompt length (but not the full content to avoid cluttering logs)
-        print(f"📝 [ASK-QUESTION] Prompt length: {len(prompt)} characters")
-        print(f"📝 [ASK-QUESTION] Question: {question[:100]}...")
-        
-        # Send to Gemini
-        messages = [
-            {"role": "system", "content": _get_structured_html_system_prompt()},
-            {"role": "user", "content": prompt}
-        ]
-        
-        result = gemini_service.chat(messages, max_tokens=3000)
         
         if result['success']:
             # Ensure we return the LLM response, not the file context
@@ -3024,6 +3458,12 @@ Please provide your answer:"""
                 print(f"⚠️ [ASK-QUESTION] Empty response detected, using fallback message")
             
             _save_chat_message(db, chat_id, "assistant", llm_response, user_email)
+            if cache_scope and context_text:
+                answer_cache_service.store(cache_scope, question, query_embedding, {
+                    "success": True,
+                    "response": llm_response,
+                    "file_id": file_id
+                })
             return {
                 "success": True,
                 "response": llm_response,
@@ -3052,6 +3492,125 @@ Please provide your answer:"""
         }
 
 
+@app.post("/api/ask-question")
+async def ask_chatbot_question(
+    question: str = Form(...),
+    file_id: int = Form(None),
+    file_context: str = Form(None),
+    mandatory_file_ids: str = Form(None),
+    chat_id: str = Form(None),
+    user_email: str = Form(None),
+    db: Session = Depends(get_db)
+):
+    """
+    Ask a question to the chatbot using vector search.
+    - If file_context is provided, uses it directly (for mandatory files - backward compatibility)
+    - If file_id is provided, uses Pinecone vector search to retrieve relevant chunks
+    - If neither is provided, searches across all files using Pinecone indexes and ROUTER + ANSWERER system
+    """
+    question = (question or "").strip()
+    chat_id = chat_id or str(uuid.uuid4())
+    
+    print(f"\n{'='*80}")
+    print(f"🔵 [ASK-QUESTION] New question received")
+    print(f"🔵 [ASK-QUESTION] Question: {question[:200]}...")
+    print(f"🔵 [ASK-QUESTION] Parameters - file_id: {file_id}, file_context: {'Yes' if file_context else 'No'}, mandatory_file_ids: {mandatory_file_ids}")
+    print(f"{'='*80}\n")
+    
+    plan = _prepare_question(question, file_id, file_context, mandatory_file_ids, chat_id, user_email, db)
+    if "response" in plan:
+        return plan["response"]
+    
+    from services.gemini_service import gemini_service
+    
+    result = await gemini_service.chat(
+        plan["messages"], max_tokens=plan["max_tokens"], temperature=plan["temperature"], call_site=plan["call_site"]
+    )
+    return _finish_question(plan, result, question, file_id, chat_id, user_email, db)
+
+
+@app.post("/api/ask-question/stream")
+async def ask_chatbot_question_stream(
+    question: str = Form(...),
+    file_id: int = Form(None),
+    file_context: str = Form(None),
+    mandatory_file_ids: str = Form(None),
+    chat_id: str = Form(None),
+    user_email: str = Form(None),
+    db: Session = Depends(get_db)
+):
+    """
+    Streaming variant of /api/ask-question (server-sent events).
+    - "start": {chat_id} as soon as retrieval is done
+    - "token": {text} for every chunk of the answer as Gemini generates it
+    - "done": the same payload /api/ask-question returns (cleaned answer)
+    Router + answerer replies are a JSON document, so they arrive as a single "done" event.
+    """
+    import json
+    import asyncio
+    
+    question = (question or "").strip()
+    chat_id = chat_id or str(uuid.uuid4())
+    
+    print(f"🔵 [ASK-STREAM] New question received: {question[:200]}...")
+    
+    plan = _prepare_question(question, file_id, file_context, mandatory_file_ids, chat_id, user_email, db)
+    
+    def sse(event: str, data: Dict[str, Any]) -> str:
+        return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+    
+    async def event_stream():
+        # The request session may be closed once the response starts; use our own
+        from database import SessionLocal
+        from services.gemini_service import gemini_service
+        
+        yield sse("start", {"chat_id": chat_id})
+        if "response" in plan:
+            yield sse("done", plan["response"])
+            return
+        
+        if plan["mode"] == "router":
+            result = await gemini_service.chat(
+                plan["messages"], max_tokens=plan["max_tokens"], temperature=plan["temperature"], call_site=plan["call_site"]
+            )
+        else:
+            result = None
+            partial = []
+            stream = gemini_service.chat_stream(
+                plan["messages"], max_tokens=plan["max_tokens"], temperature=plan["temperature"], call_site=plan["call_site"]
+            )
+            try:
+                async for event in stream:
+                    if event.get("done"):
+                        result = event
+                    else:
+                        partial.append(event["delta"])
+                        yield sse("token", {"text": event["delta"]})
+            except (GeneratorExit, asyncio.CancelledError):
+                # Client disconnected mid-answer: keep what was generated so far
+                await stream.aclose()
+                stream_db = SessionLocal()
+                try:
+                    _save_chat_message(stream_db, chat_id, "assistant", "".join(partial), user_email)
+                finally:
+                    stream_db.close()
+                print(f"⚠️ [ASK-STREAM] Client disconnected after {len(partial)} chunks; partial answer saved")
+                raise
+        
+        stream_db = SessionLocal()
+        try:
+            payload = _finish_question(plan, result, question, file_id, chat_id, user_email, stream_db)
+        finally:
+            stream_db.close()
+        yield sse("done", payload)
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 @app.get("/api/chat/sessions")
 async def get_chat_sessions(user_email: str = None, db: Session = Depends(get_db)):
     """Return a list of distinct chat sessions for the current user from conversations table.
@@ -3623,7 +4182,7 @@ Remember to incorporate the edit requirements: "{request.edit_comments}"
         ]
         
         print("🚀 [EDIT PLAN] Calling LLM service to regenerate plan...")
-        llm_response = gemini_service.chat(messages, max_tokens=4000)
+        llm_response = await gemini_service.chat(messages, max_tokens=4000, call_site="plan_edit")
         
         # Check if LLM service actually succeeded
         if not llm_response:
@@ -3649,24 +4208,6 @@ Remember to incorporate the edit requirements: "{request.edit_comments}"
         # STEP 2: VALIDATION AND FINE-TUNING FOR EDITED PLAN PB COMPLETENESS
         print("🔍 [EDIT VALIDATION] Starting PB completeness validation for edited plan...")
         
-        # Pre-validation check for missing sections in edited plan
-        missing_sections = []
-        
-        if "Detailed Task Breakdown" not in new_generated_plan:
-            missing_sections.append("Detailed Task Breakdown")
-        if "Committed Sprint Backlog" not in new_generated_plan:
-            missing_sections.append("Committed Sprint Backlog")
-        if "Sprint Overview" not in new_generated_plan:
-            missing_sections.append("Sprint Overview")
-        if "Team Capacity" not in new_generated_plan:
-            missing_sections.append("Team Capacity")
-        
-        if missing_sections:
-            print(f"❌ [EDIT PRE-VALIDATION] Missing critical sections: {missing_sections}")
-            print("🔄 [EDIT PRE-VALIDATION] Edited plan will be regenerated to include missing sections")
-        else:
-            print("✅ [EDIT PRE-VALIDATION] All critical sections present")
-        
         # Create user inputs text for validation
         user_inputs_text = f"""
 I. Sprint Overview & Proposed Goal:
@@ -3695,11 +4236,13 @@ VI. Additional Comments:
 {user_inputs['additional_comments'].get('CommentsContent', 'N/A')}
 """
         
-        validation_result = gemini_service.validate_and_finetune_sprint_plan(
+        # Sections and PB counts are checked locally first; Gemini only re-validates an incomplete plan
+        validation_result = await gemini_service.validate_and_finetune_sprint_plan(
             original_plan=new_generated_plan,
             user_inputs=user_inputs_text,
             stored_prompt=stored_prompt,
-            expected_pb_count=expected_pb_count
+            expected_pb_count=expected_pb_count,
+            backlog_items=[item.get('userStorySummary', '') for item in user_inputs['product_backlog'].get('BacklogItems', [])]
         )
         
         if validation_result.get("success"):
@@ -3895,7 +4438,7 @@ async def finish_risk_assessment(
         print("❌ [RISK FINISH] No RiskAssessment prompt found in database!")
         return {"success": False, "message": "No RiskAssessment prompt found in database"}
     
-    return risk_service.finish_risk_assessment(request, db, risk_prompt)
+    return await risk_service.finish_risk_assessment(request, db, risk_prompt)
 
 @app.post("/api/risk-assessment/generate-assessment")
 async def generate_risk_assessment(request: GenerateRiskAssessmentRequest, db: Session = Depends(get_db)):
@@ -3999,7 +4542,7 @@ async def generate_risk_assessment(request: GenerateRiskAssessmentRequest, db: S
         print(f"   - System message length: {len(stored_prompt)}")
         print(f"   - User message length: {len(messages[1]['content'])}")
         
-        gemini_response = gemini_service.chat(messages, max_tokens=4000)
+        gemini_response = await gemini_service.chat(messages, max_tokens=4000, cache=True, bypass_cache=request.bypass_cache, call_site="risk_generate")
         
         print("🔍 [GEMINI CALL] Gemini service response received:")
         print(f"   - Response object: {gemini_response}")
@@ -4030,20 +4573,9 @@ async def generate_risk_assessment(request: GenerateRiskAssessmentRequest, db: S
             # STEP 2: VALIDATION AND FINE-TUNING FOR RISK COMPLETENESS
             print("🔍 [STEP 2] Starting risk completeness validation and fine-tuning...")
             
-            # Pre-validation check for risk count
+            # Risk entries, fields and sections are checked locally first; Gemini only rewrites an incomplete assessment
             original_assessment = gemini_response.get("response", "")
             
-            # Count risks in the original assessment
-            risk_count_in_output = original_assessment.count("**Risk ID:**")
-            print(f"🔍 [PRE-VALIDATION] Risks found in output: {risk_count_in_output}")
-            print(f"🔍 [PRE-VALIDATION] Expected risks: {expected_risk_count}")
-            
-            if risk_count_in_output < expected_risk_count:
-                print(f"❌ [PRE-VALIDATION] Missing risks: {expected_risk_count - risk_count_in_output}")
-                print("🔄 [PRE-VALIDATION] Assessment will be regenerated to include all risks")
-            else:
-                print("✅ [PRE-VALIDATION] All risks present")
-            
             # Create user inputs text for validation
             user_inputs_text = f"""
 PROJECT OVERVIEW:
@@ -4072,11 +4604,12 @@ ADDITIONAL COMMENTS:
 {user_inputs['additional_comments'].get('CommentsContent', 'N/A')}
 """
             
-            validation_result = gemini_service.validate_and_finetune_risk_assessment(
+            validation_result = await gemini_service.validate_and_finetune_risk_assessment(
                 original_assessment=original_assessment,
                 user_inputs=user_inputs_text,
                 stored_prompt=stored_prompt,
-                expected_risk_count=expected_risk_count
+                expected_risk_count=expected_risk_count,
+                risk_ids=[risk.get('riskId', '') for risk in user_inputs.get('all_risks_data', []) if risk.get('riskId')]
             )
             
             if validation_result.get("success"):
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text, Boolean, JSON, ForeignKey, UniqueConstraint, LargeBinary
+from sqlalchemy import Column, Integer, BigInteger, Float, String, DateTime, Text, Boolean, JSON, ForeignKey, UniqueConstraint, LargeBinary, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from database import Base
@@ -243,4 +243,93 @@ class Project(Base):
     name = Column(String, nullable=False)
     user_email = Column(String, index=True, nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
\ No newline at end of file
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+class DocumentChunk(Base):
+    __tablename__ = "document_chunks"
+    
+    # Vector id as stored in Pinecone, scoped by the index it lives in
+    index_name = Column(String, primary_key=True)
+    vector_id = Column(String, primary_key=True)
+    file_id = Column(Integer, index=True, nullable=False)
+    file_name = Column(String)
+    chunk_index = Column(Integer, nullable=False)
+    chunk_start = Column(Integer)  # Character offset into the file's extracted text
+    chunk_end = Column(Integer)
+    text = Column(Text, nullable=False)
+    text_hash = Column(String(40), index=True)  # sha1 of text, used for dedup
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    # Full-text (lexical) index used by hybrid retrieval
+    __table_args__ = (
+        Index('ix_document_chunks_text_fts', func.to_tsvector('english', text), postgresql_using='gin'),
+    )
+
+
+class FileCentroid(Base):
+    __tablename__ = "file_centroids"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    index_name = Column(String, index=True, nullable=False)  # Pinecone index of the file
+    file_id = Column(Integer, index=True, nullable=False)
+    file_name = Column(String)
+    centroid_no = Column(Integer, nullable=False, default=0)  # 0..n-1 summary vectors per file
+    dimension = Column(Integer, nullable=False)
+    vector = Column(LargeBinary, nullable=False)  # float32 bytes, L2-normalised
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class VectorGeneration(Base):
+    __tablename__ = "vector_generations"
+    
+    id = Column(Integer, primary_key=True, index=True)  # Generation number, part of the index name for id > 1
+    provider = Column(String, nullable=False)  # local, openai, vertex
+    model_name = Column(String, nullable=False)
+    dimension = Column(Integer, nullable=False)
+    status = Column(String, default="building", index=True)  # building, active, failed, retired, deleted
+    total_files = Column(Integer, default=0)
+    indexed_files = Column(Integer, default=0)
+    error = Column(Text)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    activated_at = Column(DateTime(timezone=True))
+    heartbeat_at = Column(DateTime(timezone=True))  # Bumped by the build job; a stale one means the build died
+    retired_at = Column(DateTime(timezone=True))  # Retired or failed; indexes are collected after a grace period
+
+
+class LLMUsage(Base):
+    __tablename__ = "llm_usage"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    period_start = Column(DateTime(timezone=True), nullable=False, index=True)  # Hour bucket (UTC)
+    call_site = Column(String, nullable=False, index=True)  # router, answerer, plan_generate, docx_parse, ...
+    calls = Column(Integer, default=0)  # Upstream Gemini calls
+    errors = Column(Integer, default=0)
+    cache_hits = Column(Integer, default=0)  # Served by the response / answer cache
+    coalesced = Column(Integer, default=0)  # Joined an identical in-flight call
+    prompt_tokens = Column(BigInteger, default=0)
+    output_tokens = Column(BigInteger, default=0)
+    cached_tokens = Column(BigInteger, default=0)
+    latency_ms_total = Column(BigInteger, default=0)
+    latency_ms_max = Column(Integer, default=0)
+    cost_usd = Column(Float, default=0.0)
+    
+    __table_args__ = (
+        UniqueConstraint('period_start', 'call_site', name='uq_llm_usage_period_call_site'),
+    )
+
+
+class GenerationJob(Base):
+    __tablename__ = "generation_jobs"
+    
+    id = Column(String, primary_key=True, index=True)  # uuid4 hex, returned to the client
+    kind = Column(String, nullable=False, index=True)  # sprint_plan
+    status = Column(String, default="queued", index=True)  # queued, running, succeeded, failed
+    stage = Column(String, default="queued")  # Current pipeline stage, e.g. generating, validating, saving
+    progress = Column(Integer, default=0)  # 0-100
+    user_email = Column(String, index=True)
+    result = Column(JSON)  # Same payload the synchronous endpoint used to return
+    error = Column(Text)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now())  # Heartbeat, bumped on every stage
+    started_at = Column(DateTime(timezone=True))
+    finished_at = Column(DateTime(timezone=True))
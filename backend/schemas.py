@@ -107,6 +107,7 @@ class GenerateRiskAssessmentRequest(BaseModel):
     all_risks_data: List[dict] = []  # Add the all_risks_data field
     user_email: str
     workspace_id: Optional[int] = None  # Add workspace_id to track workspace
+    bypass_cache: bool = False  # Force a fresh Gemini call even if these exact inputs were generated before
 
 # Feedback schemas
 class FeedbackRequest(BaseModel):
@@ -0,0 +1,149 @@
+"""
+Answer Cache Service
+Semantic cache for knowledge-base answers. A question is a hit when an earlier
+question asked against the same knowledge-base version has an embedding above
+ANSWER_CACHE_SIMILARITY, so repeated Playbook questions skip the vector search
+and the Gemini call.
+
+Entries are grouped by scope key (the asking user's knowledge-base version
+stamp from kb_registry_service). Adding or removing a file changes the stamp
+of every scope that contains it, so their entries stop matching and age out;
+other users' entries are unaffected.
+"""
+import os
+import time
+import threading
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class AnswerCacheService:
+    """Service for caching answers by question embedding and knowledge-base version"""
+
+    def __init__(self):
+        self.enabled = os.getenv("ANSWER_CACHE_ENABLED", "true").lower() == "true"
+        self.similarity = float(os.getenv("ANSWER_CACHE_SIMILARITY", "0.95"))
+        self.max_entries = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "1000"))
+        self.ttl_seconds = int(os.getenv("ANSWER_CACHE_TTL_SECONDS", "86400"))
+
+        self._lock = threading.Lock()
+        # scope_key -> {"vectors": (n, dim) matrix, "entries": [...]}, least recently used first
+        self._scopes: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._size = 0
+        self._stats = {"lookups": 0, "hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+
+    @staticmethod
+    def _normalise(embedding: List[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        return vector / (np.linalg.norm(vector) or 1.0)
+
+    def _drop_expired(self, scope: Dict[str, Any], now: float) -> None:
+        """Remove expired entries of one scope (caller holds the lock)"""
+        keep = [i for i, entry in enumerate(scope["entries"]) if now - entry["created_at"] < self.ttl_seconds]
+        if len(keep) != len(scope["entries"]):
+            self._size -= len(scope["entries"]) - len(keep)
+            scope["entries"] = [scope["entries"][i] for i in keep]
+            scope["vectors"] = scope["vectors"][keep]
+
+    def lookup(self, scope_key: str, embedding: List[float]) -> Optional[Dict[str, Any]]:
+        """
+        Find a cached answer for a question.
+
+        Args:
+            scope_key: Knowledge-base version stamp of the asking user's scope
+            embedding: Question embedding
+
+        Returns:
+            Cached entry (question, payload, similarity) or None
+        """
+        if not self.enabled:
+            return None
+        query = self._normalise(embedding)
+        with self._lock:
+            self._stats["lookups"] += 1
+            scope = self._scopes.get(scope_key)
+            if scope is not None:
+                self._scopes.move_to_end(scope_key)
+                self._drop_expired(scope, time.time())
+            if scope is None or not scope["entries"] or scope["vectors"].shape[1] != query.shape[0]:
+                self._stats["misses"] += 1
+                return None
+
+            scores = scope["vectors"] @ query
+            best = int(np.argmax(scores))
+            if float(scores[best]) < self.similarity:
+                self._stats["misses"] += 1
+                return None
+
+            entry = scope["entries"][best]
+            entry["hits"] += 1
+            self._stats["hits"] += 1
+            return {
+                "question": entry["question"],
+                "payload": dict(entry["payload"]),
+                "similarity": float(scores[best])
+            }
+
+    def store(self, scope_key: str, question: str, embedding: List[float], payload: Dict[str, Any]) -> None:
+        """Cache an answer payload (response fields, without chat_id) for a question"""
+        if not self.enabled or embedding is None:
+            return
+        vector = self._normalise(embedding)
+        with self._lock:
+            scope = self._scopes.get(scope_key)
+            if scope is None or scope["vectors"].shape[1] != vector.shape[0]:
+                if scope is not None:
+                    self._size -= len(scope["entries"])
+                scope = {"vectors": np.zeros((0, vector.shape[0]), dtype=np.float32), "entries": []}
+                self._scopes[scope_key] = scope
+            self._scopes.move_to_end(scope_key)
+
+            scope["vectors"] = np.vstack([scope["vectors"], vector[None, :]])
+            scope["entries"].append({
+                "question": question,
+                "payload": dict(payload),
+                "created_at": time.time(),
+                "hits": 0
+            })
+            self._size += 1
+            self._stats["stores"] += 1
+
+            # Evict from the least recently used scope first; scopes whose
+            # knowledge-base version changed are never used again and go first
+            while self._size > self.max_entries and self._scopes:
+                oldest_key, oldest = next(iter(self._scopes.items()))
+                if oldest["entries"]:
+                    oldest["entries"].pop(0)
+                    oldest["vectors"] = oldest["vectors"][1:]
+                    self._size -= 1
+                    self._stats["evictions"] += 1
+                if not oldest["entries"]:
+                    del self._scopes[oldest_key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._scopes.clear()
+            self._size = 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Hit rate and number of LLM calls saved since start-up"""
+        with self._lock:
+            lookups = self._stats["lookups"]
+            return {
+                "enabled": self.enabled,
+                "similarity_threshold": self.similarity,
+                "entries": self._size,
+                "scopes": len(self._scopes),
+                **self._stats,
+                "hit_rate": round(self._stats["hits"] / lookups, 4) if lookups else 0.0,
+                "saved_llm_calls": self._stats["hits"]
+            }
+
+
+# Create service instance
+answer_cache_service = AnswerCacheService()
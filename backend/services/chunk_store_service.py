@@ -0,0 +1,222 @@
+"""
+Chunk Store Service
+Keeps chunk text, offsets and hashes in Postgres (document_chunks table).
+Pinecone only stores compact ids and filter fields; retrieval hydrates the
+final top-k matches from here with a single batched query.
+"""
+import hashlib
+import re
+from typing import List, Dict, Any
+import logging
+
+from sqlalchemy import tuple_, func
+from sqlalchemy.orm import Session
+
+from models import DocumentChunk
+
+logger = logging.getLogger(__name__)
+
+
+class ChunkStoreService:
+    """Service for persisting and hydrating document chunks"""
+
+    @staticmethod
+    def hash_text(text: str) -> str:
+        """Stable hash of chunk text (sha1 hex)"""
+        return hashlib.sha1((text or "").encode("utf-8")).hexdigest()
+
+    def save_chunks(
+        self,
+        db: Session,
+        index_name: str,
+        file_id: int,
+        file_name: str,
+        chunks: List[Dict[str, Any]],
+        vector_ids: List[str]
+    ) -> int:
+        """
+        Replace all stored chunks of an index with the given chunks.
+
+        Args:
+            db: Database session
+            index_name: Pinecone index the vectors were written to
+            file_id: Database ID of the file
+            file_name: Original filename
+            chunks: Chunk dicts with 'text' and 'metadata' (as produced by chunking_service)
+            vector_ids: Vector ids used for each chunk, in the same order
+
+        Returns:
+            Number of chunks stored
+        """
+        try:
+            db.query(DocumentChunk).filter(DocumentChunk.index_name == index_name).delete(synchronize_session=False)
+
+            rows = []
+            for i, (chunk, vector_id) in enumerate(zip(chunks, vector_ids)):
+                chunk_text = chunk.get("text", "")
+                metadata = chunk.get("metadata", {}) or {}
+                rows.append({
+                    "index_name": index_name,
+                    "vector_id": vector_id,
+                    "file_id": file_id,
+                    "file_name": file_name,
+                    "chunk_index": int(metadata.get("chunk_index", i)),
+                    "chunk_start": metadata.get("chunk_start"),
+                    "chunk_end": metadata.get("chunk_end"),
+                    "text": chunk_text,
+                    "text_hash": self.hash_text(chunk_text)
+                })
+
+            if rows:
+                db.bulk_insert_mappings(DocumentChunk, rows)
+            db.commit()
+
+            logger.info(f"Stored {len(rows)} chunks for index {index_name}")
+            return len(rows)
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Failed to store chunks for index {index_name}: {str(e)}")
+            raise
+
+    def delete_chunks(self, db: Session, index_name: str) -> int:
+        """Delete all stored chunks for an index. Returns number of rows removed."""
+        try:
+            deleted = db.query(DocumentChunk).filter(
+                DocumentChunk.index_name == index_name
+            ).delete(synchronize_session=False)
+            db.commit()
+            return deleted
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Failed to delete chunks for index {index_name}: {str(e)}")
+            return 0
+
+    def hydrate(self, db: Session, results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Fill in chunk text for vector search results with one batched query.
+
+        Each result must carry 'index_name' and 'chunk_id'. The chunk text is set
+        on both result['text'] and result['metadata']['text'] so existing callers
+        keep working; file_name and offsets are added to the metadata as well.
+        Results whose chunk is not in the store (vectors written before the chunk
+        store existed) keep whatever text their metadata already carried.
+
+        Args:
+            db: Database session
+            results: Search results (typically the final top-k only)
+
+        Returns:
+            The same list, hydrated in place
+        """
+        if not results or db is None:
+            return results
+
+        # Results that already carry text (lexical hits, legacy vectors) need no lookup
+        keys = list({
+            (r.get("index_name"), r.get("chunk_id"))
+            for r in results
+            if r.get("chunk_id") and not r.get("text")
+        })
+        if not keys:
+            return results
+
+        try:
+            rows = db.query(DocumentChunk).filter(
+                tuple_(DocumentChunk.index_name, DocumentChunk.vector_id).in_(keys)
+            ).all()
+        except Exception as e:
+            logger.error(f"Failed to hydrate chunks: {str(e)}")
+            return results
+
+        by_key = {(row.index_name, row.vector_id): row for row in rows}
+
+        for result in results:
+            row = by_key.get((result.get("index_name"), result.get("chunk_id")))
+            if row is None:
+                continue
+            metadata = result.setdefault("metadata", {})
+            metadata.update({
+                "text": row.text,
+                "file_name": row.file_name,
+                "chunk_index": row.chunk_index,
+                "chunk_start": row.chunk_start,
+                "chunk_end": row.chunk_end
+            })
+            result["text"] = row.text
+
+        logger.info(f"Hydrated {len(by_key)}/{len(keys)} chunks from chunk store")
+        return results
+
+    def keyword_search(
+        self,
+        db: Session,
+        query: str,
+        index_names: List[str],
+        limit: int = 10
+    ) -> List[Dict[str, Any]]:
+        """
+        Lexical search over stored chunks using Postgres full-text search.
+
+        Query terms are OR-ed so a chunk matching only "RAID Log" still ranks for
+        "where is the RAID Log template?"; ts_rank_cd rewards chunks that match
+        more terms and match them close together.
+
+        Args:
+            db: Database session
+            query: User question
+            index_names: Restrict the search to these indexes
+            limit: Maximum number of hits
+
+        Returns:
+            Hits in the same shape as pinecone_service search results, already
+            hydrated with chunk text. 'score' is the normalised rank (0..1).
+        """
+        terms = [t.lower() for t in re.findall(r"[A-Za-z0-9]+", query or "")]
+        terms = list(dict.fromkeys(terms))
+        if not terms or not index_names or db is None:
+            return []
+
+        ts_query = func.to_tsquery('english', " | ".join(terms))
+        ts_vector = func.to_tsvector('english', DocumentChunk.text)
+        # Normalisation flag 32 maps rank into 0..1 (rank / (rank + 1))
+        rank = func.ts_rank_cd(ts_vector, ts_query, 32).label("rank")
+
+        try:
+            rows = (
+                db.query(DocumentChunk, rank)
+                .filter(
+                    DocumentChunk.index_name.in_(index_names),
+                    ts_vector.op("@@")(ts_query)
+                )
+                .order_by(rank.desc())
+                .limit(limit)
+                .all()
+            )
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Keyword search failed: {str(e)}")
+            return []
+
+        hits = []
+        for row, row_rank in rows:
+            hits.append({
+                "index_name": row.index_name,
+                "score": float(row_rank or 0.0),
+                "chunk_id": row.vector_id,
+                "metadata": {
+                    "file_id": str(row.file_id),
+                    "file_name": row.file_name,
+                    "chunk_index": row.chunk_index,
+                    "chunk_start": row.chunk_start,
+                    "chunk_end": row.chunk_end,
+                    "text": row.text
+                },
+                "text": row.text
+            })
+
+        logger.info(f"Keyword search returned {len(hits)} hits across {len(index_names)} indexes")
+        return hits
+
+
+# Create service instance
+chunk_store_service = ChunkStoreService()
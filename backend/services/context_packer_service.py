@@ -0,0 +1,214 @@
+"""
+Context Packer Service
+Assembles retrieved chunks into the context sent to the LLM:
+- merges adjacent/overlapping chunks of the same file into contiguous spans
+  (chunks overlap by 100 of 400 characters, so neighbours repeat text),
+- drops near-duplicate spans with maximal marginal relevance (MMR),
+- stops once a token budget is filled.
+"""
+import os
+import re
+from typing import List, Dict, Any, Set
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class ContextPackerService:
+    """Service for packing retrieved chunks into a compact LLM context"""
+
+    def __init__(self):
+        self.token_budget = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1500"))
+        # Number of top search results considered for packing
+        self.max_candidates = int(os.getenv("CONTEXT_MAX_CANDIDATES", "10"))
+        # MMR trade-off: 1.0 = relevance only, 0.0 = diversity only
+        self.mmr_lambda = float(os.getenv("CONTEXT_MMR_LAMBDA", "0.7"))
+        # Spans at least this similar to an already selected span are dropped
+        self.duplicate_threshold = float(os.getenv("CONTEXT_DUPLICATE_THRESHOLD", "0.8"))
+
+    @staticmethod
+    def estimate_tokens(text: str) -> int:
+        """Rough token estimate (~4 characters per token)"""
+        return max(1, len(text or "") // 4)
+
+    @staticmethod
+    def _shingles(text: str) -> Set[str]:
+        words = re.findall(r"\w+", (text or "").lower())
+        if len(words) < 3:
+            return set(words)
+        return {" ".join(words[i:i + 3]) for i in range(len(words) - 2)}
+
+    @staticmethod
+    def _similarity(a: Set[str], b: Set[str]) -> float:
+        if not a or not b:
+            return 0.0
+        return len(a & b) / len(a | b)
+
+    @staticmethod
+    def _join_overlapping(left: str, right: str, expected_overlap: int) -> str:
+        """Join two neighbouring chunk texts, removing the text they share"""
+        if expected_overlap > 0:
+            probe = right[:min(32, len(right))]
+            search_from = max(0, len(left) - expected_overlap - 32)
+            pos = left.find(probe, search_from)
+            while pos != -1:
+                if right.startswith(left[pos:]):
+                    return left[:pos] + right
+                pos = left.find(probe, pos + 1)
+        if right in left:
+            return left
+        return f"{left} {right}"
+
+    def merge_spans(self, results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Merge hits from the same index whose character ranges touch or overlap.
+
+        Hits without offsets (legacy vectors) are kept as single-chunk spans.
+        Each span keeps the best score of its chunks, and the best relevance:
+        the fused rank score ('rrf_score') of hybrid results, else the score.
+        """
+        by_index: Dict[str, List[Dict[str, Any]]] = {}
+        spans = []
+
+        for result in results:
+            metadata = result.get("metadata", {}) or {}
+            text = result.get("text") or metadata.get("text", "")
+            if not text:
+                continue
+            span = {
+                "index_name": result.get("index_name"),
+                "file_name": metadata.get("file_name", "Unknown"),
+                "chunk_ids": [result.get("chunk_id")],
+                "start": metadata.get("chunk_start"),
+                "end": metadata.get("chunk_end"),
+                "score": result.get("score", 0.0),
+                "relevance": result.get("rrf_score", result.get("score", 0.0)),
+                "text": text
+            }
+            if span["start"] is None or span["end"] is None:
+                spans.append(span)
+            else:
+                span["start"], span["end"] = int(span["start"]), int(span["end"])
+                # (chunk_id, start, end, score) of every merged chunk, to trim around the best one
+                span["chunks"] = [(result.get("chunk_id"), span["start"], span["end"], span["relevance"])]
+                by_index.setdefault(span["index_name"], []).append(span)
+
+        for index_spans in by_index.values():
+            index_spans.sort(key=lambda x: x["start"])
+            current = None
+            for span in index_spans:
+                if current is not None and span["start"] <= current["end"]:
+                    overlap = current["end"] - span["start"]
+                    if span["end"] > current["end"]:
+                        current["text"] = self._join_overlapping(current["text"], span["text"], overlap)
+                        current["end"] = span["end"]
+                    current["chunk_ids"].extend(span["chunk_ids"])
+                    current["chunks"].extend(span["chunks"])
+                    current["score"] = max(current["score"], span["score"])
+                    current["relevance"] = max(current["relevance"], span["relevance"])
+                else:
+                    if current is not None:
+                        spans.append(current)
+                    current = span
+            if current is not None:
+                spans.append(current)
+
+        return spans
+
+    @staticmethod
+    def _trim_to_best_chunk(span: Dict[str, Any], max_chars: int) -> None:
+        """
+        Cut a span to max_chars around its highest-scoring chunk (the start of
+        the span when offsets are unknown), keeping only the chunk ids left in it.
+        """
+        text = span["text"]
+        chunks = span.get("chunks")
+        if len(text) <= max_chars:
+            return
+        if not chunks:
+            span["text"] = text[:max_chars]
+            return
+
+        _, best_start, best_end, _ = max(chunks, key=lambda chunk: chunk[3])
+        chunk_start = min(max(best_start - span["start"], 0), len(text))
+        chunk_end = min(max(best_end - span["start"], chunk_start), len(text))
+        # Centre the window on the chunk; a chunk longer than the window keeps its start
+        left = max(0, chunk_start - max(0, max_chars - (chunk_end - chunk_start)) // 2)
+        right = min(len(text), left + max_chars)
+        left = max(0, right - max_chars)
+
+        span["text"] = text[left:right]
+        kept = [chunk for chunk in chunks if chunk[1] - span["start"] < right and chunk[2] - span["start"] > left]
+        span["chunk_ids"] = [chunk[0] for chunk in kept]
+        span["start"], span["end"] = span["start"] + left, span["start"] + right
+
+    def pack(self, results: List[Dict[str, Any]], token_budget: int = None) -> List[Dict[str, Any]]:
+        """
+        Turn hydrated search results into a list of context spans.
+
+        Args:
+            results: Hydrated search results (with text and, ideally, offsets)
+            token_budget: Maximum estimated tokens of span text (defaults to CONTEXT_TOKEN_BUDGET)
+
+        Returns:
+            Spans ordered by selection (most relevant first), each with
+            file_name, chunk_ids, score, text and an estimated token count
+        """
+        token_budget = token_budget or self.token_budget
+        candidates = self.merge_spans(results)
+        for span in candidates:
+            span["shingles"] = self._shingles(span["text"])
+            span["tokens"] = self.estimate_tokens(span["text"])
+
+        # Hybrid results rank by their fused score; ts_rank_cd and cosine values do not compare
+        max_relevance = max((c["relevance"] for c in candidates), default=0.0) or 1.0
+        selected: List[Dict[str, Any]] = []
+        used_tokens = 0
+        dropped_duplicates = 0
+
+        while candidates:
+            best, best_value, best_redundancy = None, None, 0.0
+            for candidate in candidates:
+                redundancy = max(
+                    (self._similarity(candidate["shingles"], s["shingles"]) for s in selected),
+                    default=0.0
+                )
+                value = self.mmr_lambda * (candidate["relevance"] / max_relevance) - (1 - self.mmr_lambda) * redundancy
+                if best_value is None or value > best_value:
+                    best, best_value, best_redundancy = candidate, value, redundancy
+            candidates.remove(best)
+
+            if best_redundancy >= self.duplicate_threshold:
+                dropped_duplicates += 1
+                continue
+            if used_tokens + best["tokens"] > token_budget:
+                if selected:
+                    continue
+                # Always return something: trim the single best span to the budget, around its best chunk
+                self._trim_to_best_chunk(best, token_budget * 4)
+                best["tokens"] = self.estimate_tokens(best["text"])
+            selected.append(best)
+            used_tokens += best["tokens"]
+
+        for span in selected:
+            span.pop("shingles", None)
+            span.pop("chunks", None)
+            span.pop("relevance", None)
+
+        logger.info(
+            f"Packed {len(results)} chunks into {len(selected)} spans "
+            f"(~{used_tokens}/{token_budget} tokens, {dropped_duplicates} near-duplicates dropped)"
+        )
+        return selected
+
+    def format_context(self, spans: List[Dict[str, Any]]) -> str:
+        """Render packed spans in the chunk-header format the answer prompt expects"""
+        parts = []
+        for span in spans:
+            chunk_label = "+".join(str(c) for c in span["chunk_ids"])
+            parts.append(f"[Chunk {chunk_label} from {span['file_name']} (score: {span['score']:.3f})]\n{span['text']}")
+        return "\n\n---\n\n".join(parts)
+
+
+# Create service instance
+context_packer_service = ContextPackerService()
@@ -35,7 +35,7 @@ class DocxService:
             ]
         }
     
-    def parse_docx_file(self, file_content: bytes) -> Dict[str, Any]:
+    async def parse_docx_file(self, file_content: bytes) -> Dict[str, Any]:
         """Parse DOCX file and extract structured data using LLM"""
         try:
             # Extract raw text from DOCX
@@ -48,7 +48,7 @@ class DocxService:
                 }
             
             # Use LLM to convert unstructured text to structured format
-            structured_data = self._convert_to_structured_format(raw_text)
+            structured_data = await self._convert_to_structured_format(raw_text)
             
             if structured_data['success']:
                 return {
@@ -94,7 +94,7 @@ class DocxService:
         except Exception as e:
             raise Exception(f"Error extracting text from document: {str(e)}")
     
-    def _convert_to_structured_format(self, raw_text: str) -> Dict[str, Any]:
+    async def _convert_to_structured_format(self, raw_text: str) -> Dict[str, Any]:
         """Use LLM to convert unstructured text to structured format"""
         try:
             # Create a comprehensive prompt for the LLM
@@ -112,7 +112,8 @@ class DocxService:
                 }
             ]
             
-            result = gemini_service.chat(messages, max_tokens=4000)
+            # Extraction to JSON: no creativity wanted
+            result = await gemini_service.chat(messages, max_tokens=4000, temperature=0.0, cache=True, call_site="docx_parse")
             
             if not result['success']:
                 return {
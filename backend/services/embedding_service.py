@@ -11,11 +11,28 @@ logger = logging.getLogger(__name__)
 class EmbeddingService:
     """Service for generating text embeddings"""
     
-    def __init__(self):
-        self.provider = os.getenv("EMBEDDING_PROVIDER", "local").lower()
-        self.model_name = os.getenv("EMBEDDING_MODEL_NAME", "all-MiniLM-L6-v2")
+    def __init__(self, provider: Optional[str] = None, model_name: Optional[str] = None):
+        self.provider = (provider or os.getenv("EMBEDDING_PROVIDER", "local")).lower()
+        self.model_name = model_name or os.getenv("EMBEDDING_MODEL_NAME", "all-MiniLM-L6-v2")
         self._model = None
         self._embedding_dimension = None
+    
+    def configure(self, provider: str, model_name: str):
+        """Switch to another provider/model (used when a vector generation is activated)"""
+        provider = provider.lower()
+        if provider != self.provider or model_name != self.model_name:
+            logger.info(f"Embedding model switched: {self.provider}/{self.model_name} -> {provider}/{model_name}")
+            self.provider = provider
+            self.model_name = model_name
+            self._model = None
+            self._embedding_dimension = None
+    
+    def adopt(self, other: "EmbeddingService"):
+        """Take over another instance's provider, model and already-loaded weights"""
+        self.provider = other.provider
+        self.model_name = other.model_name
+        self._model = other._model
+        self._embedding_dimension = other._embedding_dimension
         
     def _load_local_model(self):
         """Lazy load the local sentence-transformers model"""
@@ -0,0 +1,227 @@
+"""
+File Centroid Service
+Keeps a few summary (centroid) vectors per indexed file in a small in-memory
+matrix so a query can pick the top-N candidate files with one numpy dot product
+before any chunk-level Pinecone search runs.
+"""
+import os
+import time
+import threading
+from typing import List, Dict, Any, Optional
+import logging
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from models import FileCentroid
+
+logger = logging.getLogger(__name__)
+
+
+class FileCentroidService:
+    """Service for file-level centroid pre-filtering"""
+
+    def __init__(self):
+        # Number of candidate files that get chunk-level search (0 disables the pre-filter)
+        self.top_n = int(os.getenv("FILE_PREFILTER_TOP_N", "0"))
+        self.centroids_per_file = int(os.getenv("CENTROIDS_PER_FILE", "4"))
+        # Other workers may index files too; reload the matrix from the DB periodically
+        self.refresh_seconds = int(os.getenv("FILE_CENTROID_REFRESH_SECONDS", "60"))
+
+        self._lock = threading.Lock()
+        self._matrix: Optional[np.ndarray] = None  # (num_centroids, dim)
+        self._owners: List[str] = []  # index_name per matrix row
+        self._dimension: Optional[int] = None  # embedding dimension of the loaded matrix
+        self._loaded_at = 0.0
+
+    @property
+    def enabled(self) -> bool:
+        return self.top_n > 0
+
+    @staticmethod
+    def _normalise(vectors: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+    def compute_centroids(self, embeddings: List[List[float]]) -> np.ndarray:
+        """
+        Compute summary vectors for a file: the mean of all chunks plus the means
+        of up to centroids_per_file - 1 contiguous sections of the document, so
+        long files with several topics are still found by any one of them.
+        """
+        vectors = self._normalise(np.asarray(embeddings, dtype=np.float32))
+        centroids = [vectors.mean(axis=0)]
+        sections = min(self.centroids_per_file - 1, len(vectors))
+        if sections > 1:
+            for section in np.array_split(vectors, sections):
+                centroids.append(section.mean(axis=0))
+        return self._normalise(np.vstack(centroids).astype(np.float32))
+
+    def update_file(
+        self,
+        db: Session,
+        index_name: str,
+        file_id: int,
+        file_name: str,
+        embeddings: List[List[float]]
+    ) -> int:
+        """
+        Store centroids for a freshly indexed file and update the in-memory matrix.
+
+        Returns:
+            Number of centroids stored
+        """
+        if embeddings is None or len(embeddings) == 0:
+            return 0
+        try:
+            centroids = self.compute_centroids(embeddings)
+            db.query(FileCentroid).filter(FileCentroid.index_name == index_name).delete(synchronize_session=False)
+            for centroid_no, centroid in enumerate(centroids):
+                db.add(FileCentroid(
+                    index_name=index_name,
+                    file_id=file_id,
+                    file_name=file_name,
+                    centroid_no=centroid_no,
+                    dimension=int(centroid.shape[0]),
+                    vector=centroid.tobytes()
+                ))
+            db.commit()
+
+            with self._lock:
+                # Centroids of another vector generation (different dimension) are not in this matrix
+                if self._matrix is not None and centroids.shape[1] == self._dimension:
+                    self._drop_owner(index_name)
+                    if not self._owners:
+                        self._matrix = centroids
+                        self._owners = [index_name] * len(centroids)
+                    else:
+                        self._matrix = np.vstack([self._matrix, centroids])
+                        self._owners.extend([index_name] * len(centroids))
+
+            logger.info(f"Stored {len(centroids)} centroids for index {index_name}")
+            return len(centroids)
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Failed to store centroids for index {index_name}: {str(e)}")
+            return 0
+
+    def remove(self, db: Session, index_name: str) -> None:
+        """Remove a file's centroids (DB and in-memory)"""
+        try:
+            db.query(FileCentroid).filter(FileCentroid.index_name == index_name).delete(synchronize_session=False)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Failed to delete centroids for index {index_name}: {str(e)}")
+        with self._lock:
+            if self._matrix is not None:
+                self._drop_owner(index_name)
+
+    def _drop_owner(self, index_name: str) -> None:
+        """Remove all matrix rows belonging to an index (caller holds the lock)"""
+        keep = [i for i, owner in enumerate(self._owners) if owner != index_name]
+        if len(keep) != len(self._owners):
+            self._matrix = self._matrix[keep]
+            self._owners = [self._owners[i] for i in keep]
+
+    def _ensure_loaded(self, db: Session, dimension: int) -> None:
+        """
+        Load (or periodically reload) the centroid matrix for one embedding
+        dimension from the database. Centroids of other vector generations
+        (different embedding model) are skipped.
+        """
+        with self._lock:
+            if (
+                self._matrix is not None
+                and self._dimension == dimension
+                and time.time() - self._loaded_at < self.refresh_seconds
+            ):
+                return
+        rows = db.query(FileCentroid.index_name, FileCentroid.vector).filter(
+            FileCentroid.dimension == dimension
+        ).all()
+        if rows:
+            matrix = np.vstack([np.frombuffer(r.vector, dtype=np.float32) for r in rows])
+            owners = [r.index_name for r in rows]
+        else:
+            matrix = np.zeros((0, dimension), dtype=np.float32)
+            owners = []
+        with self._lock:
+            self._matrix = matrix
+            self._owners = owners
+            self._dimension = dimension
+            self._loaded_at = time.time()
+        logger.info(f"Loaded {len(owners)} file centroids into memory")
+
+    def select_indexes(
+        self,
+        db: Session,
+        query_embedding: List[float],
+        index_names: List[str],
+        top_n: int = None
+    ) -> List[str]:
+        """
+        Pick the candidate indexes whose best centroid is closest to the query.
+
+        Indexes without stored centroids (indexed before this existed) are always
+        kept so they are never silently dropped from search.
+
+        Args:
+            db: Database session
+            query_embedding: Query embedding vector
+            index_names: All indexes the caller may search
+            top_n: Number of files to keep (defaults to FILE_PREFILTER_TOP_N)
+
+        Returns:
+            Subset of index_names, best candidates first
+        """
+        top_n = top_n or self.top_n
+        if not top_n or len(index_names) <= top_n:
+            return index_names
+
+        try:
+            query = np.asarray(query_embedding, dtype=np.float32)
+            self._ensure_loaded(db, int(query.shape[0]))
+            with self._lock:
+                matrix, owners = self._matrix, list(self._owners)
+
+            if matrix is None or not owners or matrix.shape[1] != query.shape[0]:
+                return index_names
+            query = query / (np.linalg.norm(query) or 1.0)
+
+            scores = matrix @ query
+            best: Dict[str, float] = {}
+            for owner, score in zip(owners, scores.tolist()):
+                if score > best.get(owner, -1.0):
+                    best[owner] = score
+
+            candidates = set(index_names)
+            scored = sorted(
+                (name for name in best if name in candidates),
+                key=lambda name: best[name],
+                reverse=True
+            )
+            unscored = [name for name in index_names if name not in best]
+            selected = scored[:top_n] + unscored
+
+            logger.info(f"Centroid pre-filter: {len(index_names)} files -> {len(selected)} ({len(unscored)} without centroids)")
+            return selected
+        except Exception as e:
+            logger.error(f"Centroid pre-filter failed, searching all files: {str(e)}")
+            return index_names
+
+    def get_stats(self) -> Dict[str, Any]:
+        """In-memory matrix statistics"""
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "top_n": self.top_n,
+                "centroids": len(self._owners),
+                "files": len(set(self._owners)),
+                "loaded_at": self._loaded_at
+            }
+
+
+# Create service instance
+file_centroid_service = FileCentroidService()
@@ -0,0 +1,211 @@
+"""
+Gemini API Key Scheduler
+Spreads requests across GEMINI_API_KEY_1..3 instead of using them only as
+failover, so aggregate throughput reaches the sum of the keys' quotas.
+
+- Smooth weighted round-robin over the keys (GEMINI_API_KEY_WEIGHTS)
+- A token bucket per key for requests per minute and tokens per minute
+  (GEMINI_KEY_RPM / GEMINI_KEY_TPM, 0 = unlimited); token estimates are settled
+  against the usage Gemini reports
+- Throttled keys (429 / quota errors) cool down for Retry-After or an
+  exponentially growing GEMINI_KEY_COOLDOWN_SECONDS and then rejoin automatically
+- Callers wait (up to GEMINI_KEY_MAX_WAIT_SECONDS) when every key is busy
+  instead of failing
+"""
+import os
+import time
+import asyncio
+import threading
+from typing import List, Dict, Any, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+MAX_COOLDOWN_SECONDS = 600
+
+
+class TokenBucket:
+    """Continuously refilled bucket holding up to `capacity` units per minute"""
+
+    def __init__(self, per_minute: int):
+        self.capacity = float(per_minute)
+        self.level = float(per_minute)
+        self.updated_at = time.monotonic()
+
+    @property
+    def unlimited(self) -> bool:
+        return self.capacity <= 0
+
+    def _refill(self, now: float) -> None:
+        self.level = min(self.capacity, self.level + (now - self.updated_at) * self.capacity / 60.0)
+        self.updated_at = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Seconds until `amount` units are available (0 = now)"""
+        if self.unlimited:
+            return 0.0
+        self._refill(now)
+        # A single request larger than the whole bucket waits for a full bucket
+        amount = min(amount, self.capacity)
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) * 60.0 / self.capacity
+
+    def take(self, amount: float, now: float) -> None:
+        if not self.unlimited:
+            self._refill(now)
+            self.level -= min(amount, self.capacity)
+
+    def give_back(self, amount: float) -> None:
+        """Return over-estimated units (or charge more when amount is negative)"""
+        if not self.unlimited:
+            self.level = min(self.capacity, self.level + amount)
+
+
+class KeySlot:
+    """Scheduling state and usage counters of one API key"""
+
+    def __init__(self, index: int, api_key: str, weight: int, rpm: int, tpm: int):
+        self.index = index
+        self.api_key = api_key
+        self.label = f"#{index + 1}"
+        self.weight = max(1, weight)
+        self.current_weight = 0
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.cooldown_until = 0.0
+        self.consecutive_throttles = 0
+        self.stats = {"requests": 0, "successes": 0, "throttled": 0, "errors": 0, "tokens": 0}
+
+
+class GeminiKeyScheduler:
+    """Weighted round-robin scheduler with per-key rate limits and cooldowns"""
+
+    def __init__(self, api_keys: List[str]):
+        weights = [w.strip() for w in os.getenv("GEMINI_API_KEY_WEIGHTS", "").split(",") if w.strip()]
+        rpm = int(os.getenv("GEMINI_KEY_RPM", "0"))
+        tpm = int(os.getenv("GEMINI_KEY_TPM", "0"))
+        self.cooldown_seconds = float(os.getenv("GEMINI_KEY_COOLDOWN_SECONDS", "30"))
+        self.max_wait_seconds = float(os.getenv("GEMINI_KEY_MAX_WAIT_SECONDS", "30"))
+
+        self._lock = threading.Lock()
+        self.slots = [
+            KeySlot(i, key, int(weights[i]) if i < len(weights) else 1, rpm, tpm)
+            for i, key in enumerate(api_keys)
+        ]
+        self._by_key = {slot.api_key: slot for slot in self.slots}
+
+    def label(self, api_key: Optional[str]) -> Optional[str]:
+        slot = self._by_key.get(api_key)
+        return slot.label if slot else None
+
+    def _try_acquire(self, estimated_tokens: int, exclude: set) -> Tuple[Optional[KeySlot], Optional[float]]:
+        """Pick a key now, or return how long until one could be picked"""
+        now = time.monotonic()
+        with self._lock:
+            ready, soonest = [], None
+            for slot in self.slots:
+                if slot.index in exclude:
+                    continue
+                wait = max(
+                    slot.cooldown_until - now,
+                    slot.requests.wait_time(1, now),
+                    slot.tokens.wait_time(estimated_tokens, now)
+                )
+                if wait <= 0:
+                    ready.append(slot)
+                elif soonest is None or wait < soonest:
+                    soonest = wait
+            if not ready:
+                return None, soonest
+
+            # Smooth weighted round-robin (nginx style) over the keys that are ready
+            total = sum(slot.weight for slot in ready)
+            for slot in ready:
+                slot.current_weight += slot.weight
+            chosen = max(ready, key=lambda slot: slot.current_weight)
+            chosen.current_weight -= total
+
+            chosen.requests.take(1, now)
+            chosen.tokens.take(estimated_tokens, now)
+            chosen.stats["requests"] += 1
+            return chosen, 0.0
+
+    async def acquire(self, estimated_tokens: int = 0, exclude: set = None, max_wait: float = None) -> Optional[KeySlot]:
+        """
+        Reserve a request (and an estimated token count) on the next key.
+
+        Args:
+            estimated_tokens: Expected prompt + output tokens, charged to the key's TPM bucket
+            exclude: Key indexes not to use (already tried for this call)
+            max_wait: Cap on waiting (the caller's remaining deadline)
+
+        Returns:
+            The key slot, or None when no key frees up within GEMINI_KEY_MAX_WAIT_SECONDS
+        """
+        exclude = exclude or set()
+        wait_limit = self.max_wait_seconds if max_wait is None else min(self.max_wait_seconds, max_wait)
+        deadline = time.monotonic() + wait_limit
+        while True:
+            slot, wait = self._try_acquire(estimated_tokens, exclude)
+            if slot is not None:
+                return slot
+            if wait is None or time.monotonic() + wait > deadline:
+                return None
+            logger.info(f"All Gemini keys busy; waiting {wait:.1f}s for capacity")
+            await asyncio.sleep(wait)
+
+    def record_success(self, slot: KeySlot, estimated_tokens: int = 0, actual_tokens: int = None) -> None:
+        """Mark a call successful and settle the token estimate against reported usage"""
+        with self._lock:
+            slot.consecutive_throttles = 0
+            slot.stats["successes"] += 1
+            if actual_tokens is not None:
+                slot.tokens.give_back(estimated_tokens - actual_tokens)
+                slot.stats["tokens"] += actual_tokens
+            else:
+                slot.stats["tokens"] += estimated_tokens
+
+    def record_throttled(self, slot: KeySlot, retry_after: float = None) -> float:
+        """
+        Put a key on cooldown after a rate-limit response.
+
+        Returns:
+            Cooldown length in seconds
+        """
+        with self._lock:
+            slot.consecutive_throttles += 1
+            slot.stats["throttled"] += 1
+            cooldown = retry_after or min(
+                self.cooldown_seconds * 2 ** (slot.consecutive_throttles - 1), MAX_COOLDOWN_SECONDS
+            )
+            slot.cooldown_until = time.monotonic() + cooldown
+            # The request was rejected, so it does not count against the RPM bucket
+            slot.requests.give_back(1)
+        logger.warning(f"Gemini API key {slot.label} throttled; cooling down for {cooldown:.0f}s")
+        return cooldown
+
+    def record_error(self, slot: KeySlot) -> None:
+        with self._lock:
+            slot.stats["errors"] += 1
+
+    def get_stats(self) -> List[Dict[str, Any]]:
+        """Per-key usage, remaining bucket levels and cooldown state"""
+        now = time.monotonic()
+        with self._lock:
+            stats = []
+            for slot in self.slots:
+                slot.requests.wait_time(0, now)
+                slot.tokens.wait_time(0, now)
+                stats.append({
+                    "key": slot.label,
+                    "weight": slot.weight,
+                    **slot.stats,
+                    "rpm_limit": int(slot.requests.capacity) or None,
+                    "rpm_available": None if slot.requests.unlimited else round(slot.requests.level, 1),
+                    "tpm_limit": int(slot.tokens.capacity) or None,
+                    "tpm_available": None if slot.tokens.unlimited else int(slot.tokens.level),
+                    "cooling_down": slot.cooldown_until > now,
+                    "cooldown_remaining_seconds": round(max(0.0, slot.cooldown_until - now), 1)
+                })
+            return stats
@@ -0,0 +1,140 @@
+"""
+Gemini Resilience
+Retry policy and circuit breaker for outbound Gemini calls.
+
+- Transient failures (network errors, timeouts, 5xx) are retried with capped
+  exponential backoff and full jitter, within an overall deadline per call
+- After GEMINI_BREAKER_FAILURE_THRESHOLD consecutive transient failures the
+  breaker opens and calls fail fast; after GEMINI_BREAKER_RESET_SECONDS one
+  probe call is let through (half-open) and its outcome closes or re-opens it;
+  a probe still unsettled after GEMINI_CALL_DEADLINE_SECONDS is presumed lost
+  and another one is let through
+- Rate limits (429) are not upstream failures; they are handled by key rotation
+"""
+import os
+import time
+import random
+import threading
+from typing import Dict, Any
+import logging
+
+logger = logging.getLogger(__name__)
+
+RETRYABLE_STATUS_CODES = {500, 502, 503, 504}
+
+
+class RetryPolicy:
+    """Capped exponential backoff with full jitter and a per-call deadline"""
+
+    def __init__(self):
+        self.max_retries = int(os.getenv("GEMINI_MAX_RETRIES", "3"))
+        self.base_seconds = float(os.getenv("GEMINI_BACKOFF_BASE_SECONDS", "0.5"))
+        self.max_backoff_seconds = float(os.getenv("GEMINI_BACKOFF_MAX_SECONDS", "8"))
+        self.deadline_seconds = float(os.getenv("GEMINI_CALL_DEADLINE_SECONDS", "180"))
+
+        self._lock = threading.Lock()
+        self._stats = {"retries": 0, "retries_exhausted": 0, "deadline_exceeded": 0}
+
+    def backoff(self, retry: int) -> float:
+        """Delay before retry number `retry` (1-based)"""
+        return random.uniform(0, min(self.max_backoff_seconds, self.base_seconds * 2 ** (retry - 1)))
+
+    def record(self, event: str) -> None:
+        with self._lock:
+            self._stats[event] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "max_retries": self.max_retries,
+                "deadline_seconds": self.deadline_seconds,
+                **self._stats
+            }
+
+
+class CircuitBreaker:
+    """Closed -> open after consecutive failures -> half-open probe -> closed"""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self):
+        self.failure_threshold = int(os.getenv("GEMINI_BREAKER_FAILURE_THRESHOLD", "5"))
+        self.reset_seconds = float(os.getenv("GEMINI_BREAKER_RESET_SECONDS", "30"))
+        # No call runs longer than its deadline, so an older probe was lost without a verdict
+        self.probe_timeout_seconds = float(os.getenv("GEMINI_CALL_DEADLINE_SECONDS", "180"))
+
+        self._lock = threading.Lock()
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self._probe_in_flight = False
+        self._probe_started_at = 0.0
+        self._stats = {"opened": 0, "rejected": 0, "failures": 0, "successes": 0, "probes_expired": 0}
+
+    def allow(self) -> bool:
+        """Whether a call may go upstream now"""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_seconds:
+                self.state = self.HALF_OPEN
+                self._probe_in_flight = False
+            if (
+                self.state == self.HALF_OPEN and self._probe_in_flight
+                and time.monotonic() - self._probe_started_at >= self.probe_timeout_seconds
+            ):
+                self._stats["probes_expired"] += 1
+                logger.warning(f"Gemini circuit breaker probe unsettled after {self.probe_timeout_seconds:.0f}s; letting another through")
+                self._probe_in_flight = False
+            if self.state == self.HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                self._probe_started_at = time.monotonic()
+                return True
+            self._stats["rejected"] += 1
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._stats["successes"] += 1
+            self.consecutive_failures = 0
+            if self.state != self.CLOSED:
+                logger.info("Gemini circuit breaker closed")
+            self.state = self.CLOSED
+            self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._stats["failures"] += 1
+            self.consecutive_failures += 1
+            if self.state == self.HALF_OPEN or (
+                self.state == self.CLOSED and self.consecutive_failures >= self.failure_threshold
+            ):
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+                self._probe_in_flight = False
+                self._stats["opened"] += 1
+                logger.warning(
+                    f"Gemini circuit breaker opened after {self.consecutive_failures} consecutive failures; "
+                    f"failing fast for {self.reset_seconds:.0f}s"
+                )
+
+    def release_probe(self) -> None:
+        """A half-open probe ended without a verdict (e.g. rate limited); let another one through"""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "state": self.state,
+                "consecutive_failures": self.consecutive_failures,
+                "failure_threshold": self.failure_threshold,
+                "reset_seconds": self.reset_seconds,
+                "open_remaining_seconds": (
+                    round(max(0.0, self.reset_seconds - (time.monotonic() - self.opened_at)), 1)
+                    if self.state == self.OPEN else 0.0
+                ),
+                **self._stats
+            }
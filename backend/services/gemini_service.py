@@ -1,7 +1,64 @@
 import os
-import requests
+import time
+import html
 import json
-from typing import List, Dict, Any
+import asyncio
+import re
+from typing import List, Dict, Any, AsyncIterator
+
+import httpx
+
+from .gemini_key_scheduler import GeminiKeyScheduler
+from .gemini_resilience import RetryPolicy, CircuitBreaker, RETRYABLE_STATUS_CODES
+from .llm_cache_service import llm_cache_service
+from .llm_usage_service import llm_usage_service
+from .llm_dispatcher import llm_dispatcher, LLMQueueTimeout
+from .plan_validator_service import plan_validator_service, clean_html, strip_document, SPRINT_PLAN_SECTIONS, PB_SECTIONS
+
+# Output budget for targeted plan repairs: a whole missing section, and one missing PB entry
+REPAIR_SECTION_MAX_TOKENS = 1200
+REPAIR_TOKENS_PER_PB = {"committed sprint backlog": 150, "detailed task breakdown": 400}
+
+# Sectioned plan generation: sections written by one call each (keys of SPRINT_PLAN_SECTIONS,
+# in plan order). The Detailed Task Breakdown is generated per PB instead.
+PLAN_SECTION_GROUPS = [
+    ("sprint overview", "sprint goal"),
+    ("team capacity",),
+    ("committed sprint backlog",),
+    ("detailed task breakdown",),
+    ("definition of done",),
+    ("capacity vs committed effort",),
+    ("risk management",),
+    ("collaboration",),
+    ("sprint confidence", "sprint confidence improvement")
+]
+PLAN_SECTION_MAX_TOKENS = 1200
+PLAN_PB_BREAKDOWN_MAX_TOKENS = 700
+# Outer document of a single-call sprint plan, so sectioned plans render and export the same way
+PLAN_DOCUMENT_TEMPLATE = """<!DOCTYPE html>
+<html lang="en">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>{title}</title>
+    <style>
+        body {{ font-family: Arial, sans-serif; line-height: 1.6; margin: 20px; }}
+        h1, h2 {{ color: #333; }}
+        table {{ width: 100%; border-collapse: collapse; margin-bottom: 20px; }}
+        th, td {{ border: 1px solid #ddd; padding: 8px; text-align: left; }}
+        th {{ background-color: #f2f2f2; font-weight: bold; }}
+        tbody tr:nth-child(even) {{ background-color: #f9f9f9; }}
+        ul {{ list-style-type: disc; margin-left: 20px; }}
+    </style>
+</head>
+<body>
+
+    <h1>{title}</h1>
+
+{sections}
+
+</body>
+</html>"""
 
 class GeminiService:
     def __init__(self):
@@ -24,25 +81,43 @@ class GeminiService:
         if not self.api_keys:
             raise ValueError("At least one GEMINI_API_KEY environment variable is required. Please set GEMINI_API_KEY_1, GEMINI_API_KEY_2, or GEMINI_API_KEY_3 in your .env file.")
         
-        # Track current API key index and usage
-        self.current_key_index = 0
-        self.current_api_key = self.api_keys[0]
+        # Requests are spread across all keys (weighted round-robin, per-key RPM/TPM buckets, cooldowns)
+        self.key_scheduler = GeminiKeyScheduler(self.api_keys)
+        # Backoff/deadline for transient failures and a breaker that fails fast during upstream brownouts
+        self.retry_policy = RetryPolicy()
+        self.circuit_breaker = CircuitBreaker()
+        # Single-flight: request hash -> the upstream task identical callers share
+        self._in_flight: Dict[str, "asyncio.Future"] = {}
+        self._coalesce_stats = {"upstream_calls": 0, "coalesced": 0}
         self.model = "gemini-2.0-flash"
-        self.base_url = "https://generativelanguage.googleapis.com/v1beta/models/gemini-2.0-flash:generateContent"
+        # GEMINI_BASE_URL points the service at the offline stub (loadtest/gemini_stub.py) for load tests
+        self.api_root = os.getenv("GEMINI_BASE_URL", "https://generativelanguage.googleapis.com").rstrip("/")
+        self.base_url = f"{self.api_root}/v1beta/models/{self.model}:generateContent"
+        self.stream_url = f"{self.api_root}/v1beta/models/{self.model}:streamGenerateContent?alt=sse"
+        
+        # One pooled async client per process: keep-alive connections instead of a TLS handshake per call,
+        # and explicit timeouts so a stalled upstream cannot hold a request forever
+        self.timeout = httpx.Timeout(
+            connect=float(os.getenv("GEMINI_CONNECT_TIMEOUT_SECONDS", "10")),
+            read=float(os.getenv("GEMINI_READ_TIMEOUT_SECONDS", "120")),
+            write=float(os.getenv("GEMINI_CONNECT_TIMEOUT_SECONDS", "10")),
+            pool=float(os.getenv("GEMINI_CONNECT_TIMEOUT_SECONDS", "10"))
+        )
+        self.limits = httpx.Limits(
+            max_connections=int(os.getenv("GEMINI_MAX_CONNECTIONS", "100")),
+            max_keepalive_connections=int(os.getenv("GEMINI_MAX_KEEPALIVE_CONNECTIONS", "20"))
+        )
+        self._client = None
+        
+        # PLAN_GENERATION_MODE=sectioned generates sprint plans as concurrent per-section calls,
+        # at most PLAN_SECTION_CONCURRENCY at a time per plan
+        self.plan_generation_mode = os.getenv("PLAN_GENERATION_MODE", "monolithic").lower()
+        self.plan_section_concurrency = max(1, int(os.getenv("PLAN_SECTION_CONCURRENCY", "6")))
         
         print(f"🔑 [GEMINI SERVICE] Initialized with {len(self.api_keys)} API key(s)")
-        print(f"🔑 [GEMINI SERVICE] Using API key #{self.current_key_index + 1}")
-        
-    def _switch_to_next_api_key(self):
-        """Switch to the next available API key"""
-        if self.current_key_index < len(self.api_keys) - 1:
-            self.current_key_index += 1
-            self.current_api_key = self.api_keys[self.current_key_index]
-            print(f"🔄 [GEMINI SERVICE] Switched to API key #{self.current_key_index + 1}")
-            return True
-        else:
-            print(f"❌ [GEMINI SERVICE] All API keys exhausted. No more fallback options.")
-            return False
+        if self.api_root != "https://generativelanguage.googleapis.com":
+            print(f"🧪 [GEMINI SERVICE] Using GEMINI_BASE_URL {self.api_root}")
+        print(f"🔑 [GEMINI SERVICE] Scheduling across keys with weights {[slot.weight for slot in self.key_scheduler.slots]}")
     
     def _is_rate_limit_error(self, response):
         """Check if the response indicates a rate limit error"""
@@ -66,131 +141,448 @@ class GeminiService:
         except:
             return False
     
-    def _make_api_request(self, headers, data):
-        """Make API request with automatic fallback on rate limits"""
-        max_retries = len(self.api_keys)
+    def _retry_after(self, response):
+        """Seconds the upstream asked us to wait (Retry-After header or RetryInfo detail), if any"""
+        header = response.headers.get("retry-after")
+        if header:
+            try:
+                return float(header)
+            except ValueError:
+                pass
+        try:
+            for detail in response.json().get("error", {}).get("details", []):
+                delay = detail.get("retryDelay")
+                if delay and delay.endswith("s"):
+                    return float(delay[:-1])
+        except Exception:
+            pass
+        return None
+    
+    def _estimate_tokens(self, data):
+        """Rough prompt size in tokens (~4 characters per token) for rate-limit accounting"""
+        characters = sum(
+            len(part.get("text", ""))
+            for content in data.get("contents", [])
+            for part in content.get("parts", [])
+        )
+        return characters // 4
+    
+    @staticmethod
+    def _normalise_usage(usage_metadata):
+        """Gemini usageMetadata -> prompt / output / cached / total token counts"""
+        usage_metadata = usage_metadata or {}
+        return {
+            "prompt_tokens": usage_metadata.get("promptTokenCount", 0),
+            "output_tokens": usage_metadata.get("candidatesTokenCount", 0),
+            "cached_tokens": usage_metadata.get("cachedContentTokenCount", 0),
+            "total_tokens": usage_metadata.get("totalTokenCount", 0)
+        }
+    
+    def _get_client(self) -> httpx.AsyncClient:
+        """Shared keep-alive connection pool (created on first use inside the event loop)"""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(timeout=self.timeout, limits=self.limits)
+        return self._client
+    
+    def get_key_stats(self):
+        """Per-key request counts, throttles, bucket levels and cooldowns"""
+        return self.key_scheduler.get_stats()
+    
+    def get_resilience_stats(self):
+        """Circuit breaker state and retry counters"""
+        return {
+            "circuit_breaker": self.circuit_breaker.get_stats(),
+            "retries": self.retry_policy.get_stats(),
+            "coalescing": {**self._coalesce_stats, "in_flight": len(self._in_flight)}
+        }
+    
+    async def aclose(self):
+        """Close the connection pool (application shutdown)"""
+        if self._client is not None and not self._client.is_closed:
+            await self._client.aclose()
+        self._client = None
+    
+    async def _make_api_request(self, headers, data, url=None, stream=False, estimated_tokens=0):
+        """
+        Make API request on the next scheduled key.
+        - Rate limits move the request to another key
+        - Network errors, timeouts and 5xx are retried with jittered exponential backoff
+        - Everything happens within GEMINI_CALL_DEADLINE_SECONDS; an open circuit breaker fails fast
+        With stream=True the returned response is still open; the caller must aclose() it.
+        """
+        client = self._get_client()
+        deadline = time.monotonic() + self.retry_policy.deadline_seconds
+        throttled_keys = set()
+        retries = 0
+        attempt = 0
+        last_error = None
         
-        for attempt in range(max_retries):
+        while True:
+            attempt += 1
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                self.retry_policy.record("deadline_exceeded")
+                return None, f"Gemini call exceeded its {self.retry_policy.deadline_seconds:.0f}s deadline. Last error: {last_error}"
+            
+            if not self.circuit_breaker.allow():
+                print(f"⛔ [GEMINI SERVICE] Circuit breaker open, failing fast")
+                return None, "Gemini is temporarily unavailable (circuit breaker open). Please try again shortly."
+            
+            # An attempt that ends without a verdict on the upstream (no key, rate limit,
+            # non-retryable error, cancellation, unreadable body) releases the half-open probe
+            settled = False
             try:
-                print(f"🌐 [GEMINI SERVICE] Making request with API key #{self.current_key_index + 1} (attempt {attempt + 1})")
+                slot = await self.key_scheduler.acquire(estimated_tokens, exclude=throttled_keys, max_wait=remaining)
+                if slot is None:
+                    print(f"❌ [GEMINI SERVICE] No API key available (all throttled or busy)")
+                    return None, f"All API keys have reached their limits. Last error: {last_error or 'no key became available in time'}"
+                headers["X-goog-api-key"] = slot.api_key
+                
+                print(f"🌐 [GEMINI SERVICE] Making request with API key {slot.label} (attempt {attempt})")
                 
-                response = requests.post(self.base_url, headers=headers, json=data)
+                request = client.build_request("POST", url or self.base_url, headers=headers, json=data)
+                response = await asyncio.wait_for(client.send(request, stream=stream), timeout=deadline - time.monotonic())
                 
                 # Check if request was successful
                 if response.status_code == 200:
-                    print(f"✅ [GEMINI SERVICE] Request successful with API key #{self.current_key_index + 1}")
+                    print(f"✅ [GEMINI SERVICE] Request successful with API key {slot.label}")
+                    actual_tokens = None
+                    if not stream:
+                        actual_tokens = response.json().get("usageMetadata", {}).get("totalTokenCount")
+                    self.key_scheduler.record_success(slot, estimated_tokens, actual_tokens)
+                    self.circuit_breaker.record_success()
+                    settled = True
                     return response, None
                 
+                if stream:
+                    # Error bodies are small; read them so the connection goes back to the pool
+                    await response.aread()
+                    await response.aclose()
+                
                 # Check if it's a rate limit error
                 if self._is_rate_limit_error(response):
-                    print(f"⚠️ [GEMINI SERVICE] Rate limit hit with API key #{self.current_key_index + 1}")
-                    
-                    # Try to switch to next API key
-                    if self._switch_to_next_api_key():
-                        # Update headers with new API key
-                        headers["X-goog-api-key"] = self.current_api_key
-                        continue
-                    else:
-                        # No more API keys available
-                        error_msg = f"All API keys have reached their limits. Last error: {response.text}"
-                        return None, error_msg
-                else:
-                    # Non-rate-limit error
-                    error_msg = f"API error (status {response.status_code}): {response.text}"
-                    return None, error_msg
-                    
-            except requests.exceptions.RequestException as e:
-                print(f"❌ [GEMINI SERVICE] Request exception with API key #{self.current_key_index + 1}: {str(e)}")
-                
-                # Try to switch to next API key for network issues
-                if self._switch_to_next_api_key():
-                    headers["X-goog-api-key"] = self.current_api_key
+                    cooldown = self.key_scheduler.record_throttled(slot, self._retry_after(response))
+                    print(f"⚠️ [GEMINI SERVICE] Rate limit hit with API key {slot.label}, cooling down for {cooldown:.0f}s")
+                    throttled_keys.add(slot.index)
+                    last_error = response.text
                     continue
+                
+                self.key_scheduler.record_error(slot)
+                last_error = f"API error (status {response.status_code}): {response.text}"
+                if response.status_code not in RETRYABLE_STATUS_CODES:
+                    # Non-retryable error (bad request, auth, ...): the upstream itself is healthy
+                    return None, last_error
+                # 5xx: transient upstream failure
+                self.circuit_breaker.record_failure()
+                settled = True
+                    
+            except (httpx.HTTPError, asyncio.TimeoutError) as e:
+                print(f"❌ [GEMINI SERVICE] Request exception with API key {slot.label}: {type(e).__name__}: {str(e)}")
+                self.key_scheduler.record_error(slot)
+                last_error = f"Network error: {type(e).__name__}: {str(e)}"
+                self.circuit_breaker.record_failure()
+                settled = True
+            
+            finally:
+                if not settled:
+                    self.circuit_breaker.release_probe()
+            
+            # Transient failure (network, timeout, 5xx): back off and retry
+            retries += 1
+            if retries > self.retry_policy.max_retries:
+                self.retry_policy.record("retries_exhausted")
+                return None, last_error
+            delay = min(self.retry_policy.backoff(retries), max(0.0, deadline - time.monotonic()))
+            self.retry_policy.record("retries")
+            print(f"🔁 [GEMINI SERVICE] Transient failure, retry {retries}/{self.retry_policy.max_retries} in {delay:.2f}s")
+            await asyncio.sleep(delay)
+    
+    def _build_request_body(
+        self,
+        messages: List[Dict[str, str]],
+        max_tokens: int = None,
+        temperature: float = None,
+        stop_sequences: List[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Convert OpenAI-style messages to a Gemini request body.
+
+        System messages become `systemInstruction`, user/assistant turns become
+        `user`/`model` contents (consecutive turns of the same role are merged),
+        and the output cap, temperature and stop sequences go into `generationConfig`.
+        """
+        system_parts = []
+        contents = []
+        for msg in messages:
+            role = msg.get("role", "user")
+            content = msg.get("content", "")
+            
+            if role == "system":
+                if content:
+                    system_parts.append({"text": content})
+                continue
+            
+            gemini_role = "model" if role == "assistant" else "user"
+            if contents and contents[-1]["role"] == gemini_role:
+                contents[-1]["parts"].append({"text": content})
+            else:
+                contents.append({"role": gemini_role, "parts": [{"text": content}]})
+        
+        body = {"contents": contents}
+        if system_parts:
+            if contents:
+                body["systemInstruction"] = {"parts": system_parts}
+            else:
+                # A request needs at least one turn; a system-only prompt is sent as the user turn
+                body["contents"] = [{"role": "user", "parts": system_parts}]
+        
+        generation_config = {}
+        if max_tokens:
+            generation_config["maxOutputTokens"] = int(max_tokens)
+        if temperature is not None:
+            generation_config["temperature"] = float(temperature)
+        if stop_sequences:
+            generation_config["stopSequences"] = list(stop_sequences)[:5]  # Gemini accepts at most 5
+        if generation_config:
+            body["generationConfig"] = generation_config
+        
+        return body
+    
+    async def chat(
+        self,
+        messages: List[Dict[str, str]],
+        max_tokens: int = 3000,
+        temperature: float = None,
+        stop_sequences: List[str] = None,
+        cache: bool = False,
+        bypass_cache: bool = False,
+        call_site: str = "other"
+    ) -> Dict[str, Any]:
+        """
+        Send messages to Gemini API and get response with fallback support.
+        Identical requests already in flight are coalesced into one upstream call.
+
+        Args:
+            messages: OpenAI-style messages (system / user / assistant)
+            max_tokens: Output token cap (maxOutputTokens)
+            temperature: Sampling temperature; None keeps the model default
+            stop_sequences: Up to 5 strings that end generation
+            cache: Serve identical requests from the LLM response cache
+            bypass_cache: With cache, skip the lookup and refresh the entry
+            call_site: Tag for token / cost accounting (router, plan_generate, ...)
+        """
+        started = time.monotonic()
+        try:
+            data = self._build_request_body(messages, max_tokens, temperature, stop_sequences)
+            request_key = llm_cache_service.make_key(self.model, data)
+            
+            use_cache = cache and llm_cache_service.enabled
+            if use_cache:
+                if bypass_cache:
+                    llm_cache_service.record_bypass()
                 else:
-                    return None, f"Network error: {str(e)}"
+                    cached = llm_cache_service.get(request_key)
+                    if cached:
+                        print(f"⚡ [GEMINI SERVICE] Response cache hit ({request_key[:12]})")
+                        llm_usage_service.record(
+                            call_site, latency_ms=(time.monotonic() - started) * 1000, cache_hit=True
+                        )
+                        return {**cached, "cached": True}
+            
+            chat_result = await self._single_flight(request_key, data, max_tokens, llm_dispatcher.lane_for(call_site))
+            if use_cache and chat_result["success"] and not chat_result.get("coalesced"):
+                llm_cache_service.put(request_key, {k: v for k, v in chat_result.items() if k != "coalesced"})
+            llm_usage_service.record(
+                call_site, chat_result.get("usage"), latency_ms=(time.monotonic() - started) * 1000,
+                success=chat_result["success"], coalesced=chat_result.get("coalesced", False)
+            )
+            return chat_result
+            
+        except Exception as e:
+            llm_usage_service.record(call_site, latency_ms=(time.monotonic() - started) * 1000, success=False)
+            return {
+                "success": False,
+                "response": f"Unexpected error: {str(e)}",
+                "error": str(e)
+            }
+    
+    async def _single_flight(self, request_key: str, data: Dict[str, Any], max_tokens: int, lane: str) -> Dict[str, Any]:
+        """
+        Run one upstream call per request hash. Later identical callers await the
+        same task; it is shielded, so a caller that disconnects does not cancel
+        the call for the others.
+        """
+        task = self._in_flight.get(request_key)
+        if task is not None:
+            self._coalesce_stats["coalesced"] += 1
+            print(f"🔗 [GEMINI SERVICE] Joined in-flight request ({request_key[:12]})")
+            return {**await asyncio.shield(task), "coalesced": True}
         
-        return None, "Maximum retry attempts exceeded"
+        task = asyncio.ensure_future(self._send_chat(data, max_tokens, lane))
+        self._in_flight[request_key] = task
+        self._coalesce_stats["upstream_calls"] += 1
+        task.add_done_callback(lambda _: self._in_flight.pop(request_key, None))
+        return dict(await asyncio.shield(task))
+    
+    async def _send_chat(self, data: Dict[str, Any], max_tokens: int, lane: str) -> Dict[str, Any]:
+        """Send one generateContent request (in its priority lane) and normalise the result"""
+        headers = {
+            "Content-Type": "application/json"
+        }
         
-    def chat(self, messages: List[Dict[str, str]], max_tokens: int = 3000) -> Dict[str, Any]:
-        """Send messages to Gemini API and get response with fallback support"""
+        # Make API request on the next scheduled key once the lane has a free slot
         try:
-            headers = {
-                "Content-Type": "application/json",
-                "X-goog-api-key": self.current_api_key
+            async with llm_dispatcher.slot(lane):
+                response, error = await self._make_api_request(
+                    headers, data, estimated_tokens=self._estimate_tokens(data) + max_tokens
+                )
+        except LLMQueueTimeout as e:
+            response, error = None, str(e)
+        
+        if error:
+            return {
+                "success": False,
+                "response": f"Gemini API error: {error}",
+                "error": error
             }
-            
-            # Convert OpenAI format messages to Gemini format
-            contents = []
-            for msg in messages:
-                role = msg.get("role", "user")
-                content = msg.get("content", "")
-                
-                if role == "system":
-                    # For system messages, prepend to user message or handle separately
-                    continue
-                elif role == "user":
-                    contents.append({
-                        "parts": [{"text": content}]
-                    })
-                elif role == "assistant":
-                    # Gemini doesn't have assistant role in the same way, so we'll include it as context
-                    contents.append({
-                        "parts": [{"text": f"Assistant: {content}"}]
-                    })
-            
-            # If we have system message, prepend it to the first user message
-            if messages and messages[0].get("role") == "system":
-                system_content = messages[0].get("content", "")
-                if contents:
-                    contents[0]["parts"][0]["text"] = f"{system_content}\n\n{contents[0]['parts'][0]['text']}"
-            
-            data = {
-                "contents": contents
+        
+        result = response.json()
+        
+        # Extract content from Gemini response
+        finish_reason = None
+        if "candidates" in result and result["candidates"]:
+            candidate = result["candidates"][0]
+            finish_reason = candidate.get("finishReason")
+            content = "".join(part.get("text", "") for part in candidate.get("content", {}).get("parts", []))
+            content = content or "No response generated"
+        else:
+            content = "No response generated"
+        
+        if finish_reason == "MAX_TOKENS":
+            print(f"⚠️ [GEMINI SERVICE] Response cut off at the {max_tokens}-token output cap")
+        
+        print(f"Gemini Response Type: {type(content)}")
+        print(f"Gemini Response Content: {content[:200]}...")
+        
+        # Ensure we return a string, not an object
+        if isinstance(content, dict):
+            # If Gemini returns a JSON object, convert it to a formatted string
+            content = json.dumps(content, indent=2)
+        elif not isinstance(content, str):
+            content = str(content)
+        
+        return {
+            "success": True,
+            "response": content,
+            "usage": self._normalise_usage(result.get("usageMetadata")),
+            "finish_reason": finish_reason,
+            "api_key_used": self.key_scheduler.label(response.request.headers.get("X-goog-api-key"))
+        }
+    
+    async def chat_stream(
+        self,
+        messages: List[Dict[str, str]],
+        max_tokens: int = 3000,
+        temperature: float = None,
+        stop_sequences: List[str] = None,
+        call_site: str = "other"
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Stream a response from Gemini (streamGenerateContent over server-sent events).
+
+        Key fallback on rate limits happens before the first token, as in chat().
+
+        Args:
+            messages: OpenAI-style messages
+            max_tokens: Output token cap (maxOutputTokens)
+            temperature: Sampling temperature; None keeps the model default
+            stop_sequences: Up to 5 strings that end generation
+            call_site: Tag for token / cost accounting
+
+        Yields:
+            {"delta": text} for every chunk, then a final
+            {"done": True, "success": bool, "response": full_text, "error": ...}
+        """
+        response = None
+        parts = []
+        finish_reason = None
+        usage_metadata = None
+        success = False
+        lane = None
+        started = time.monotonic()
+        try:
+            headers = {
+                "Content-Type": "application/json"
             }
             
-            # Make API request with fallback support
-            response, error = self._make_api_request(headers, data)
+            data = self._build_request_body(messages, max_tokens, temperature, stop_sequences)
+            # The slot is held until the stream ends
+            lane_name = llm_dispatcher.lane_for(call_site)
+            await llm_dispatcher.acquire(lane_name)
+            lane = lane_name
+            response, error = await self._make_api_request(
+                headers, data, url=self.stream_url, stream=True,
+                estimated_tokens=self._estimate_tokens(data) + max_tokens
+            )
             
             if error:
-                return {
+                yield {
+                    "done": True,
                     "success": False,
                     "response": f"Gemini API error: {error}",
                     "error": error
                 }
+                return
             
-            result = response.json()
-            
-            # Extract content from Gemini response
-            if "candidates" in result and result["candidates"]:
-                content = result["candidates"][0]["content"]["parts"][0]["text"]
-            else:
-                content = "No response generated"
-            
-            print(f"Gemini Response Type: {type(content)}")
-            print(f"Gemini Response Content: {content[:200]}...")
-            
-            # Ensure we return a string, not an object
-            if isinstance(content, dict):
-                # If Gemini returns a JSON object, convert it to a formatted string
-                content = json.dumps(content, indent=2)
-            elif not isinstance(content, str):
-                content = str(content)
+            async for line in response.aiter_lines():
+                # SSE frames look like "data: {...}"; blank lines separate events
+                if not line or not line.startswith("data:"):
+                    continue
+                chunk = json.loads(line[len("data:"):].strip())
+                # Every chunk carries running totals; the last one is final
+                usage_metadata = chunk.get("usageMetadata") or usage_metadata
+                for candidate in chunk.get("candidates", [])[:1]:
+                    finish_reason = candidate.get("finishReason") or finish_reason
+                    for part in candidate.get("content", {}).get("parts", []):
+                        text = part.get("text")
+                        if text:
+                            parts.append(text)
+                            yield {"delta": text}
             
-            return {
+            content = "".join(parts) or "No response generated"
+            print(f"Gemini Streamed Response Content: {content[:200]}...")
+            if finish_reason == "MAX_TOKENS":
+                print(f"⚠️ [GEMINI SERVICE] Streamed response cut off at the {max_tokens}-token output cap")
+            success = True
+            yield {
+                "done": True,
                 "success": True,
                 "response": content,
-                "usage": result.get("usage", {}),
-                "api_key_used": f"#{self.current_key_index + 1}"
+                "usage": self._normalise_usage(usage_metadata),
+                "finish_reason": finish_reason,
+                "api_key_used": self.key_scheduler.label(response.request.headers.get("X-goog-api-key"))
             }
             
         except Exception as e:
-            return {
+            yield {
+                "done": True,
                 "success": False,
-                "response": f"Unexpected error: {str(e)}",
+                "response": "".join(parts) or f"Unexpected error: {str(e)}",
                 "error": str(e)
             }
+        finally:
+            # Also runs when the consumer stops early (client disconnected); tokens
+            # generated up to that point are still billed
+            llm_usage_service.record(
+                call_site, self._normalise_usage(usage_metadata),
+                latency_ms=(time.monotonic() - started) * 1000, success=success
+            )
+            if response is not None:
+                await response.aclose()
+            if lane is not None:
+                llm_dispatcher.release(lane)
     
-    def generate_sprint_plan(self, conversation_history: List[Dict[str, str]], prompt_data: str = None) -> Dict[str, Any]:
+    async def generate_sprint_plan(self, conversation_history: List[Dict[str, str]], prompt_data: str = None, bypass_cache: bool = False) -> Dict[str, Any]:
         """Generate a comprehensive sprint plan based on conversation history"""
         try:
             # Use the provided prompt data from global variable
@@ -219,7 +611,7 @@ class GeminiService:
                 "content": "Based on our conversation, please create a comprehensive sprint plan with all the details we discussed."
             })
             
-            return self.chat(messages, max_tokens=3000)
+            return await self.chat(messages, max_tokens=3000, cache=True, bypass_cache=bypass_cache, call_site="plan_generate")
             
         except Exception as e:
             return {
@@ -228,7 +620,102 @@ class GeminiService:
                 "error": str(e)
             }
 
-    def generate_risk_assessment(self, conversation_history: List[Dict[str, str]], prompt_data: str = None) -> Dict[str, Any]:
+    async def generate_sprint_plan_sectioned(self, stored_prompt: str, user_inputs: str, backlog_items: List[Dict[str, Any]], title: str = "Sprint Plan", bypass_cache: bool = False) -> Dict[str, Any]:
+        """
+        Generate a sprint plan as concurrent per-section calls and assemble it locally.
+
+        Each group in PLAN_SECTION_GROUPS and each PB's task breakdown is its own
+        Gemini call (call site "plan_section") with the same system prompt and
+        inputs, at most plan_section_concurrency at a time, so the wall-clock time
+        is about that of the longest section. Sections that fail are left out for
+        the validation step to repair. The sections are wrapped in the same
+        document (title, styles, one <section> per heading) a single call produces.
+
+        Args:
+            stored_prompt: Sprint planning system prompt
+            user_inputs: Sprint inputs text (as for the single-call generation)
+            backlog_items: Product Backlog Items (userStorySummary, priority, effortEstimate)
+            title: Document title and <h1>, e.g. "Sprint Plan - Sprint 9"
+            bypass_cache: Skip the response cache
+
+        Returns:
+            Dict with success, response (the assembled plan HTML), sections
+            (number of calls) and failed_sections
+        """
+        semaphore = asyncio.Semaphore(self.plan_section_concurrency)
+        
+        async def generate(instruction: str, max_tokens: int) -> Dict[str, Any]:
+            messages = [
+                {"role": "system", "content": stored_prompt},
+                {"role": "user", "content": f"{user_inputs}\n\nOUTPUT SCOPE:\n{instruction}"}
+            ]
+            async with semaphore:
+                return await self.chat(messages, max_tokens=max_tokens, cache=True, bypass_cache=bypass_cache, call_site="plan_section")
+        
+        jobs = []
+        for group in PLAN_SECTION_GROUPS:
+            if group == ("detailed task breakdown",) and backlog_items:
+                for item in backlog_items:
+                    summary = item.get('userStorySummary', 'N/A')
+                    instruction = (
+                        f"Write ONLY the Detailed Task Breakdown entry for the Product Backlog Item \"{summary}\" "
+                        f"(Priority: {item.get('priority', 'N/A')}, Effort: {item.get('effortEstimate', 0)} hours). "
+                        f"Start with <h3>{html.escape(summary)}</h3>, then its specific, actionable tasks. "
+                        "Do not write the section heading, other items or any other section. HTML only: no markdown, no code fences."
+                    )
+                    jobs.append((group, summary, generate(instruction, PLAN_PB_BREAKDOWN_MAX_TOKENS)))
+                continue
+            
+            names = [SPRINT_PLAN_SECTIONS[key] for key in group]
+            instruction = (
+                f"Write ONLY the following section{'s' if len(names) > 1 else ''} of the sprint plan, in this order: {'; '.join(names)}. "
+                f"Start each with an <h2> heading carrying its name and format it as the instructions above prescribe. "
+                "Do not write a plan title, any other section or commentary. HTML only: no markdown, no code fences."
+            )
+            max_tokens = PLAN_SECTION_MAX_TOKENS
+            if group == ("committed sprint backlog",) or group == ("detailed task breakdown",):
+                max_tokens = max(max_tokens, min(4000, REPAIR_TOKENS_PER_PB[group[0]] * len(backlog_items) + 300))
+            jobs.append((group, None, generate(instruction, max_tokens)))
+        
+        print(f"🧩 [SECTIONED PLAN] Generating {len(jobs)} sections concurrently (limit {self.plan_section_concurrency})")
+        started = time.monotonic()
+        results = await asyncio.gather(*(coroutine for _, _, coroutine in jobs))
+        
+        sections: Dict[tuple, str] = {}
+        breakdown_entries, failed, errors = [], [], []
+        for (group, summary, _), result in zip(jobs, results):
+            # The full-plan prompt asks for a whole page; only its body content is pasted in
+            fragment = strip_document(clean_html(result.get("response", ""))) if result.get("success") else ""
+            if not fragment:
+                failed.append(summary or "; ".join(SPRINT_PLAN_SECTIONS[key] for key in group))
+                errors.append(result.get("error") or result.get("response") or "empty response")
+            elif summary is not None:
+                if not plan_validator_service.has_heading(fragment, summary):
+                    fragment = f"<h3>{html.escape(summary)}</h3>\n{fragment}"
+                breakdown_entries.append(fragment)
+            else:
+                if not any(plan_validator_service.has_section(fragment, key) for key in group):
+                    fragment = f"<h2>{html.escape(SPRINT_PLAN_SECTIONS[group[0]])}</h2>\n{fragment}"
+                sections[group] = fragment
+        if breakdown_entries:
+            sections[("detailed task breakdown",)] = "\n".join([f"<h2>{SPRINT_PLAN_SECTIONS['detailed task breakdown']}</h2>"] + breakdown_entries)
+        
+        # Assemble in plan order; missing sections / PB entries are left for the repair step
+        parts = [sections[group] for group in PLAN_SECTION_GROUPS if group in sections]
+        if not parts:
+            return {"success": False, "response": f"Sectioned generation failed: {errors[0] if errors else 'no sections'}", "error": errors[0] if errors else "no sections"}
+        
+        # One <section> per top-level heading (a group's call can return several)
+        wrapped = [
+            f"    <section>\n{piece.strip()}\n    </section>"
+            for part in parts for piece in re.split(r"(?=<h2\b)", part, flags=re.IGNORECASE) if piece.strip()
+        ]
+        document = PLAN_DOCUMENT_TEMPLATE.format(title=html.escape(title), sections="\n\n".join(wrapped))
+        
+        print(f"✅ [SECTIONED PLAN] Assembled {len(jobs) - len(failed)}/{len(jobs)} sections in {time.monotonic() - started:.1f}s" + (f"; failed: {failed}" if failed else ""))
+        return {"success": True, "response": document, "sections": len(jobs), "failed_sections": failed}
+
+    async def generate_risk_assessment(self, conversation_history: List[Dict[str, str]], prompt_data: str = None, bypass_cache: bool = False) -> Dict[str, Any]:
         """Generate a comprehensive risk assessment based on conversation history"""
         try:
             # Use the provided prompt data from global variable
@@ -257,7 +744,7 @@ class GeminiService:
                 "content": "Based on our conversation, please create a comprehensive risk assessment with all the details we discussed."
             })
             
-            return self.chat(messages, max_tokens=3000)
+            return await self.chat(messages, max_tokens=3000, cache=True, bypass_cache=bypass_cache, call_site="risk_generate")
             
         except Exception as e:
             return {
@@ -266,10 +753,43 @@ class GeminiService:
                 "error": str(e)
             }
 
-    def validate_and_finetune_sprint_plan(self, original_plan: str, user_inputs: str, stored_prompt: str, expected_pb_count: int) -> Dict[str, Any]:
-        """Validate and fine-tune the generated sprint plan to ensure ALL PBs are included"""
+    async def validate_and_finetune_sprint_plan(self, original_plan: str, user_inputs: str, stored_prompt: str, expected_pb_count: int, backlog_items: List[str] = None) -> Dict[str, Any]:
+        """Validate and fine-tune the generated sprint plan to ensure ALL PBs are included.
+
+        The plan is first checked locally (sections and PB counts). When that check
+        fails, only the missing sections / PB entries are generated and spliced in;
+        Gemini regenerates the whole plan only if that targeted repair fails.
+        """
         try:
             print(f"🔍 [VALIDATION] Starting sprint plan validation for {expected_pb_count} expected PBs...")
+            local_validation = None
+            if plan_validator_service.enabled:
+                local_validation = plan_validator_service.validate_sprint_plan(original_plan, expected_pb_count, backlog_items)
+                if local_validation["valid"]:
+                    print(f"✅ [VALIDATION] Local check passed (all sections, {expected_pb_count} PBs in both PB sections); skipping Gemini validation")
+                    return {
+                        "success": True,
+                        "response": original_plan,
+                        "validated": True,
+                        "improved": False,
+                        "expected_pb_count": expected_pb_count,
+                        "local_validation": local_validation
+                    }
+                print(f"❌ [VALIDATION] Local check failed: {local_validation['issues']}")
+                
+                if plan_validator_service.repair_enabled:
+                    repair = await self.repair_sprint_plan(original_plan, user_inputs, local_validation, backlog_items)
+                    if repair["success"]:
+                        return {
+                            "success": True,
+                            "response": repair["response"],
+                            "validated": True,
+                            "improved": True,
+                            "repaired": True,
+                            "expected_pb_count": expected_pb_count,
+                            "local_validation": local_validation
+                        }
+                    print(f"⚠️ [VALIDATION] Targeted repair did not complete the plan ({repair['error']}); regenerating the whole plan")
             
             # Create validation prompt
             validation_prompt = f"""
@@ -281,6 +801,9 @@ ORIGINAL USER INPUTS:
 GENERATED SPRINT PLAN TO VALIDATE:
 {original_plan}
 
+AUTOMATED CHECK FINDINGS:
+{chr(10).join(f"- {issue}" for issue in local_validation["issues"]) if local_validation else "- Not run"}
+
 CRITICAL VALIDATION REQUIREMENTS:
 1. **PB Count Verification**: The user provided {expected_pb_count} Product Backlog Items (PBs) in their input
 2. **Committed Sprint Backlog**: ALL {expected_pb_count} PBs must be present in this section
@@ -324,7 +847,7 @@ Please validate this sprint plan and ensure ALL {expected_pb_count} Product Back
             print("🔍 [VALIDATION] Sending validation request to Gemini...")
             
             # Call Gemini for validation
-            validation_result = self.chat(validation_messages, max_tokens=4000)
+            validation_result = await self.chat(validation_messages, max_tokens=4000, temperature=0.2, cache=True, call_site="plan_validate")
             
             if validation_result["success"]:
                 validated_plan = validation_result["response"]
@@ -345,7 +868,8 @@ Please validate this sprint plan and ensure ALL {expected_pb_count} Product Back
                     "response": validated_plan,
                     "validated": True,
                     "improved": "🔄 PLAN REGENERATED" in validation_result["response"],
-                    "expected_pb_count": expected_pb_count
+                    "expected_pb_count": expected_pb_count,
+                    "local_validation": local_validation
                 }
             else:
                 print(f"❌ [VALIDATION] Validation failed: {validation_result.get('error', 'Unknown error')}")
@@ -371,10 +895,139 @@ Please validate this sprint plan and ensure ALL {expected_pb_count} Product Back
                 "expected_pb_count": expected_pb_count
             }
 
-    def validate_and_finetune_risk_assessment(self, original_assessment: str, user_inputs: str, stored_prompt: str, expected_risk_count: int) -> Dict[str, Any]:
-        """Validate and fine-tune the generated risk assessment to ensure ALL risks are included and format is correct"""
+    async def repair_sprint_plan(self, plan: str, user_inputs: str, local_validation: Dict[str, Any], backlog_items: List[str] = None) -> Dict[str, Any]:
+        """
+        Generate only the parts of a sprint plan the local check found missing and splice them in.
+
+        Each missing section and each section's missing PB entries is one small,
+        concurrent Gemini call (call site "plan_repair"); the full plan is never resent.
+
+        Args:
+            plan: Generated sprint plan (HTML)
+            user_inputs: Sprint inputs as sent to the generation prompt
+            local_validation: Result of plan_validator_service.validate_sprint_plan for the plan
+            backlog_items: User story summaries of the Product Backlog Items
+
+        Returns:
+            Dict with success and the repaired plan in response (re-checked locally), or error
+        """
+        missing_sections = local_validation["missing_sections"]
+        missing_pbs = local_validation["missing_pbs"]
+        expected_pb_count = local_validation["expected_pb_count"]
+        
+        # Without PB summaries a short PB section cannot be told which entries it lacks
+        for key in PB_SECTIONS:
+            name = SPRINT_PLAN_SECTIONS[key]
+            if name not in missing_sections and local_validation["pb_counts"][name] < expected_pb_count and not missing_pbs.get(name):
+                return {"success": False, "error": f"cannot tell which PBs {name} is missing"}
+        
+        level = plan_validator_service.section_level(plan)
+        style_sample = plan_validator_service.style_sample(plan)
+        repairs = []
+        for key, name in SPRINT_PLAN_SECTIONS.items():
+            if name in missing_sections:
+                repairs.append(("section", key, self._generate_plan_section(name, key, level, user_inputs, style_sample, backlog_items or [])))
+            elif key in PB_SECTIONS and missing_pbs.get(name):
+                section = plan_validator_service.section_html(plan, key)
+                repairs.append(("entries", key, self._generate_plan_entries(name, key, missing_pbs[name], section, user_inputs)))
+        if not repairs:
+            return {"success": False, "error": "nothing to repair"}
+        
+        print(f"🩹 [REPAIR] Generating {len(repairs)} fragment(s): {[SPRINT_PLAN_SECTIONS[key] + (' entries' if kind == 'entries' else '') for kind, key, _ in repairs]}")
+        results = await asyncio.gather(*(coroutine for _, _, coroutine in repairs))
+        
+        repaired = plan
+        for (kind, key, _), result in zip(repairs, results):
+            fragment = strip_document(clean_html(result.get("response", ""))) if result.get("success") else ""
+            if not fragment:
+                plan_validator_service.record_repair(False)
+                return {"success": False, "error": f"{SPRINT_PLAN_SECTIONS[key]}: {result.get('error', 'empty fragment')}"}
+            if kind == "section":
+                if not plan_validator_service.has_section(fragment, key):
+                    fragment = f"<h{level}>{html.escape(SPRINT_PLAN_SECTIONS[key])}</h{level}>\n{fragment}"
+                repaired = plan_validator_service.insert_section(repaired, key, fragment)
+            else:
+                repaired = plan_validator_service.insert_entries(repaired, key, fragment, backlog_items)
+        
+        # The fragments are only trusted once the spliced plan passes the same check
+        recheck = plan_validator_service.validate_sprint_plan(repaired, expected_pb_count, backlog_items)
+        plan_validator_service.record_repair(recheck["valid"])
+        if not recheck["valid"]:
+            print(f"⚠️ [REPAIR] Spliced plan still fails the local check: {recheck['issues']}")
+            return {"success": False, "error": f"still incomplete: {recheck['issues']}"}
+        
+        print(f"✅ [REPAIR] Plan repaired with {len(repairs)} fragment(s), {len(repaired) - len(plan)} characters added")
+        return {"success": True, "response": repaired}
+
+    async def _generate_plan_section(self, name: str, key: str, level: int, user_inputs: str, style_sample: str, backlog_items: List[str]) -> Dict[str, Any]:
+        """One missing sprint plan section as an HTML fragment"""
+        pb_rule = ""
+        max_tokens = REPAIR_SECTION_MAX_TOKENS
+        if key in PB_SECTIONS and backlog_items:
+            pb_rule = f"- Include ALL {len(backlog_items)} Product Backlog Items: " + "; ".join(backlog_items) + "\n"
+            max_tokens = max(max_tokens, min(4000, REPAIR_TOKENS_PER_PB[key] * len(backlog_items) + 200))
+        
+        prompt = f"""Write ONLY the "{name}" section of this sprint plan.
+
+SPRINT INPUTS:
+{user_inputs}
+
+START OF THE EXISTING PLAN (match its HTML tags and classes):
+{style_sample}
+
+RULES:
+- Start with <h{level}>{name}</h{level}> and write nothing after this section
+{pb_rule}- HTML only: no markdown, no code fences, no commentary
+"""
+        messages = [
+            {"role": "system", "content": "You complete sprint plans by writing single missing sections as HTML fragments."},
+            {"role": "user", "content": prompt}
+        ]
+        return await self.chat(messages, max_tokens=max_tokens, temperature=0.2, cache=True, call_site="plan_repair")
+
+    async def _generate_plan_entries(self, name: str, key: str, missing: List[str], section: str, user_inputs: str) -> Dict[str, Any]:
+        """Entries for the PBs a sprint plan section is missing, in that section's format"""
+        is_table = "<table" in section.lower()
+        entry_format = "table rows (<tr>...</tr>) with exactly the same columns as the existing table" if is_table else "exactly the same HTML structure and heading level as the existing entries"
+        missing_list = "\n".join(f"- {summary}" for summary in missing)
+        
+        prompt = f"""The "{name}" section of a sprint plan is missing these Product Backlog Items:
+{missing_list}
+
+EXISTING SECTION (format reference only, do not repeat it):
+{section[:3000]}
+
+SPRINT INPUTS:
+{user_inputs}
+
+Write ONLY the entries for the missing items, as {entry_format}. Use each item's user story summary verbatim. HTML only: no markdown, no code fences, no commentary.
+"""
+        messages = [
+            {"role": "system", "content": "You complete sprint plans by writing only the missing entries of a section as HTML."},
+            {"role": "user", "content": prompt}
+        ]
+        max_tokens = min(4000, REPAIR_TOKENS_PER_PB[key] * len(missing) + 100)
+        return await self.chat(messages, max_tokens=max_tokens, temperature=0.2, cache=True, call_site="plan_repair")
+
+    async def validate_and_finetune_risk_assessment(self, original_assessment: str, user_inputs: str, stored_prompt: str, expected_risk_count: int, risk_ids: List[str] = None) -> Dict[str, Any]:
+        """Validate and fine-tune the generated risk assessment to ensure ALL risks are included and format is correct.
+
+        The assessment is first checked locally (risk entries, fields and sections);
+        Gemini is only asked to rewrite it when that check fails.
+        """
         try:
             print(f"🔍 [RISK VALIDATION] Starting risk assessment validation for {expected_risk_count} expected risks...")
+            if plan_validator_service.enabled:
+                local_validation = plan_validator_service.validate_risk_assessment(original_assessment, expected_risk_count, risk_ids)
+                if local_validation["valid"]:
+                    print(f"✅ [RISK VALIDATION] Local check passed ({expected_risk_count} risks, correct format); skipping Gemini validation")
+                    return {
+                        "success": True,
+                        "response": original_assessment,
+                        "message": "Risk assessment passed local validation",
+                        "local_validation": local_validation
+                    }
+                print(f"❌ [RISK VALIDATION] Local check failed: {local_validation['issues']}")
             
             # Create validation prompt
             validation_prompt = f"""
@@ -445,7 +1098,7 @@ Please validate this risk assessment and ensure ALL {expected_risk_count} risks
             ]
             
             print("🔍 [RISK VALIDATION] Calling Gemini service for validation...")
-            gemini_response = self.chat(messages, max_tokens=4000)
+            gemini_response = await self.chat(messages, max_tokens=4000, temperature=0.2, cache=True, call_site="risk_validate")
             
             if not gemini_response or not gemini_response.get('success', False):
                 error_msg = gemini_response.get('response', 'Unknown error from Gemini service') if gemini_response else 'No response from Gemini'
@@ -0,0 +1,155 @@
+"""
+Hybrid Search Service
+Combines Pinecone vector search with lexical (Postgres full-text) search over the
+chunk store and fuses both rankings with reciprocal rank fusion (RRF).
+
+Exact artifact names ("RAID Log", "MOM Template") are matched well lexically even
+when MiniLM embeddings miss them, so hybrid mode can use a smaller k and send a
+smaller context to Gemini.
+"""
+import os
+from typing import List, Dict, Any
+import logging
+
+from sqlalchemy.orm import Session
+
+from .pinecone_service import pinecone_service
+from .embedding_service import embedding_service
+from .chunk_store_service import chunk_store_service
+from .local_vector_store_service import local_vector_store_service
+
+logger = logging.getLogger(__name__)
+
+
+class HybridSearchService:
+    """Service for hybrid lexical + vector retrieval"""
+
+    def __init__(self):
+        # RETRIEVAL_MODE: "vector" (default) or "hybrid"
+        self.mode = os.getenv("RETRIEVAL_MODE", "vector").lower()
+        self.top_k = int(os.getenv("HYBRID_TOP_K", "5"))
+        self.rrf_k = int(os.getenv("HYBRID_RRF_K", "60"))
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode == "hybrid"
+
+    def list_indexes(self) -> List[str]:
+        """Indexes available on the configured vector backend"""
+        if local_vector_store_service.enabled:
+            return local_vector_store_service.list_indexes()
+        return pinecone_service.list_indexes()
+
+    def vector_search(self, query_embedding: List[float], index_names: List[str], top_k: int = 3) -> Dict[str, Any]:
+        """Vector search on the configured backend (Pinecone, or the local quantized store)"""
+        if local_vector_store_service.enabled:
+            return local_vector_store_service.search_across_indexes(query_embedding, index_names, top_k)
+        return pinecone_service.search_across_indexes(
+            query_embedding=query_embedding,
+            index_names=index_names,
+            top_k=top_k
+        )
+
+    def fuse(self, ranked_lists: List[List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+        """
+        Reciprocal rank fusion of several ranked result lists.
+
+        Results are identified by (index_name, chunk_id); the first list holds
+        the vector hits. Each result gets an 'rrf_score', which is what ranks
+        them. 'score' stays a cosine similarity, because the router thresholds
+        compare it as one: vector hits keep theirs, and lexical-only hits get the
+        lowest vector similarity in the fusion (0.0 without vector hits), so they
+        never raise confidence. A lexical rank is kept in 'lexical_score'.
+
+        Returns:
+            Fused results sorted by rrf_score (descending)
+        """
+        fused: Dict[tuple, Dict[str, Any]] = {}
+
+        for list_position, results in enumerate(ranked_lists):
+            for rank, result in enumerate(results, start=1):
+                key = (result.get("index_name"), result.get("chunk_id"))
+                entry = fused.get(key)
+                if entry is None:
+                    entry = dict(result)
+                    entry["metadata"] = dict(result.get("metadata", {}))
+                    entry["rrf_score"] = 0.0
+                    entry["matched_by"] = []
+                    fused[key] = entry
+                elif list_position == 0:
+                    # Prefer the vector similarity as the display score
+                    entry["score"] = result.get("score", entry.get("score", 0.0))
+                else:
+                    entry["lexical_score"] = result.get("score", 0.0)
+                    # Carry hydrated text over from the lexical hit
+                    if result.get("text") and not entry.get("text"):
+                        entry["text"] = result["text"]
+                        entry["metadata"].update(result.get("metadata", {}))
+                entry["rrf_score"] += 1.0 / (self.rrf_k + rank)
+                entry["matched_by"].append(list_position)
+
+        # ts_rank_cd values are not cosine similarities; give lexical-only hits a neutral one
+        neutral = min((entry.get("score", 0.0) for entry in fused.values() if 0 in entry["matched_by"]), default=0.0)
+        for entry in fused.values():
+            if 0 not in entry["matched_by"]:
+                entry["lexical_score"] = entry.get("score", 0.0)
+                entry["score"] = neutral
+
+        return sorted(fused.values(), key=lambda x: x["rrf_score"], reverse=True)
+
+    def search(
+        self,
+        db: Session,
+        question: str,
+        index_names: List[str],
+        top_k: int = None,
+        query_embedding: List[float] = None
+    ) -> Dict[str, Any]:
+        """
+        Run vector and lexical search and fuse the results.
+
+        Args:
+            db: Database session (chunk store)
+            question: User question
+            index_names: Pinecone indexes to search
+            top_k: Number of fused results to return (defaults to HYBRID_TOP_K)
+            query_embedding: Precomputed query embedding (computed if omitted)
+
+        Returns:
+            Dict shaped like pinecone_service.search_across_indexes
+        """
+        top_k = top_k or self.top_k
+        try:
+            if query_embedding is None:
+                query_embedding = embedding_service.embed_query(question)
+            vector_result = self.vector_search(query_embedding, index_names, top_k)
+            vector_hits = vector_result.get("results", []) if vector_result.get("success") else []
+
+            lexical_hits = chunk_store_service.keyword_search(
+                db,
+                query=question,
+                index_names=index_names,
+                limit=top_k * 2
+            )
+
+            fused = self.fuse([vector_hits, lexical_hits])[:top_k]
+            logger.info(
+                f"Hybrid search: {len(vector_hits)} vector hits, {len(lexical_hits)} lexical hits, "
+                f"{len(fused)} fused results"
+            )
+            return {
+                "success": True,
+                "results": fused,
+                "total_results": len(fused)
+            }
+        except Exception as e:
+            logger.error(f"Hybrid search failed: {str(e)}")
+            return {
+                "success": False,
+                "error": str(e),
+                "results": []
+            }
+
+
+# Create service instance
+hybrid_search_service = HybridSearchService()
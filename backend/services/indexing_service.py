@@ -0,0 +1,364 @@
+"""
+Indexing Service
+Single pipeline for putting a file's text into the vector store
+(create index -> chunk -> embed -> upsert -> chunk store -> centroids),
+removing it again, and reconciling the vector store against the database.
+"""
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional
+import logging
+
+from sqlalchemy.orm import Session
+
+from models import UploadedFile, MandatoryFile, ProjectKnowledgeBaseFile
+from .pinecone_service import pinecone_service
+from .chunking_service import chunking_service
+from .chunk_store_service import chunk_store_service
+from .file_centroid_service import file_centroid_service
+from .local_vector_store_service import local_vector_store_service
+from .kb_registry_service import kb_registry_service
+
+logger = logging.getLogger(__name__)
+
+# Every per-file index created by pinecone_service starts with this prefix
+INDEX_PREFIX = "kb-file-"
+
+
+class IndexingService:
+    """Service for indexing files and keeping the vector store in sync with the DB"""
+
+    def __init__(self):
+        self.chunk_size = 400
+        self.chunk_overlap = 100
+        self.reconcile_workers = int(os.getenv("RECONCILE_MAX_WORKERS", "8"))
+
+    def _write_targets(self, db: Session) -> List[Dict[str, Any]]:
+        """Vector generations new vectors go to (active, plus one being built)"""
+        from .vector_generation_service import vector_generation_service
+        return vector_generation_service.write_targets(db)
+
+    def _live_generations(self, db: Session) -> List[int]:
+        from .vector_generation_service import vector_generation_service
+        return vector_generation_service.live_generations(db)
+
+    def _retained_indexes(self, db: Session) -> set:
+        """Indexes of retired/failed generations awaiting their garbage-collection sweep"""
+        from .vector_generation_service import vector_generation_service
+        generations = vector_generation_service.retained_generations(db)
+        if not generations:
+            return set()
+        files = self.expected_files(db, include_inactive=True)
+        return {
+            pinecone_service.get_index_name_for_file(entry["file_id"], entry["file_name"], generation)
+            for generation in generations
+            for entry in files
+        }
+
+    def index_file(
+        self,
+        db: Session,
+        file_id: int,
+        file_name: str,
+        text: str,
+        metadata: Optional[Dict[str, Any]] = None,
+        targets: Optional[List[Dict[str, Any]]] = None
+    ) -> Dict[str, Any]:
+        """
+        Index a file's text into its own Pinecone index.
+
+        While a new vector generation is being built the file is written to both
+        the active and the building generation, so nothing uploaded during a
+        re-embed is missing after the switch.
+
+        Args:
+            db: Database session (chunk store and centroids)
+            file_id: Database ID of the file
+            file_name: Original filename
+            text: Extracted text to index
+            metadata: Extra chunk metadata (file_type, uploaded_by, ...)
+            targets: Generations to write (defaults to the live ones), each with
+                'generation', 'dimension' and 'embedder'
+
+        Returns:
+            Dict with success status, index_name and chunks_indexed (or error);
+            index_name is the first target's index (the active generation by default)
+        """
+        chunks = chunking_service.chunk_text_by_characters(
+            text=text,
+            chunk_size=self.chunk_size,
+            chunk_overlap=self.chunk_overlap,
+            metadata={
+                "file_id": file_id,
+                "file_name": file_name,
+                **(metadata or {})
+            }
+        )
+
+        results = [
+            self._index_generation(db, file_id, file_name, chunks, target)
+            for target in (targets or self._write_targets(db))
+        ]
+        failed = [r for r in results if not r.get("success")]
+        if failed:
+            return failed[0]
+        return results[0]
+
+    def _index_generation(
+        self,
+        db: Session,
+        file_id: int,
+        file_name: str,
+        chunks: List[Dict[str, Any]],
+        target: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """Write one file's chunks into the index of one vector generation"""
+        generation = target["generation"]
+        index_result = pinecone_service.create_index_for_file(
+            file_id=file_id,
+            file_name=file_name,
+            dimension=target["dimension"],
+            generation=generation
+        )
+        if not index_result.get("success"):
+            return {
+                "success": False,
+                "error": index_result.get("error", "Failed to create index")
+            }
+
+        if not chunks:
+            return {
+                "success": False,
+                "index_name": index_result.get("index_name"),
+                "error": "No chunks created"
+            }
+
+        embeddings = target["embedder"].embed([chunk["text"] for chunk in chunks])
+
+        index_chunks_result = pinecone_service.index_file_chunks(
+            file_id=file_id,
+            file_name=file_name,
+            chunks=chunks,
+            embeddings=embeddings,
+            generation=generation
+        )
+        if not index_chunks_result.get("success"):
+            return {
+                "success": False,
+                "index_name": index_result.get("index_name"),
+                "error": index_chunks_result.get("error", "Failed to index chunks")
+            }
+
+        index_name = index_chunks_result["index_name"]
+        kb_registry_service.invalidate()
+        if local_vector_store_service.enabled:
+            local_vector_store_service.write_index(
+                index_name,
+                vector_ids=index_chunks_result["vector_ids"],
+                embeddings=embeddings,
+                metadatas=[
+                    {
+                        "file_id": str(file_id),
+                        "chunk_index": str(chunk.get("metadata", {}).get("chunk_index", i)),
+                        "generation": str(generation)
+                    }
+                    for i, chunk in enumerate(chunks)
+                ]
+            )
+        chunk_store_service.save_chunks(
+            db,
+            index_name=index_name,
+            file_id=file_id,
+            file_name=file_name,
+            chunks=chunks,
+            vector_ids=index_chunks_result["vector_ids"]
+        )
+        file_centroid_service.update_file(
+            db,
+            index_name=index_name,
+            file_id=file_id,
+            file_name=file_name,
+            embeddings=embeddings
+        )
+
+        return {
+            "success": True,
+            "index_name": index_name,
+            "chunks_indexed": index_chunks_result.get("chunks_indexed", 0)
+        }
+
+    def forget_index(self, db: Session, index_name: str) -> None:
+        """Drop the chunk-store rows and centroids stored alongside an index"""
+        chunk_store_service.delete_chunks(db, index_name)
+        file_centroid_service.remove(db, index_name)
+        kb_registry_service.invalidate()
+
+    def remove_index(self, db: Session, index_name: str) -> Dict[str, Any]:
+        """Delete an index and everything stored alongside it"""
+        result = pinecone_service.delete_index_by_name(index_name)
+        local_vector_store_service.delete_index_by_name(index_name)
+        self.forget_index(db, index_name)
+        return result
+
+    def remove_file(self, db: Session, file_id: int, file_name: str) -> Dict[str, Any]:
+        """Delete the indexes of a file (in every live generation) and everything stored alongside them"""
+        results = [
+            self.remove_index(db, pinecone_service.get_index_name_for_file(file_id, file_name, generation))
+            for generation in self._live_generations(db)
+        ]
+        failed = [r for r in results if not r.get("success")]
+        return failed[0] if failed else results[0]
+
+    def expected_files(self, db: Session, include_inactive: bool = False) -> List[Dict[str, Any]]:
+        """
+        Files that should be indexed according to the database.
+
+        Only light columns are loaded; file text is fetched later for the few
+        files that actually need (re)building.
+
+        Args:
+            db: Database session
+            include_inactive: Also list files that are no longer expected to be
+                indexed (used when garbage-collecting a whole generation)
+        """
+        files = []
+
+        uploaded = db.query(UploadedFile.id, UploadedFile.file_name)
+        if not include_inactive:
+            uploaded = uploaded.filter(UploadedFile.indexing_status == "indexed")
+        for file_id, file_name in uploaded.all():
+            files.append({"source": "uploaded", "file_id": file_id, "file_name": file_name})
+
+        mandatory = db.query(MandatoryFile.id, MandatoryFile.file_name)
+        if not include_inactive:
+            kb_file_ids = db.query(ProjectKnowledgeBaseFile.mandatory_file_id).distinct()
+            mandatory = mandatory.filter(
+                MandatoryFile.id.in_(kb_file_ids),
+                MandatoryFile.is_active == True,
+                MandatoryFile.extracted_text.isnot(None),
+                MandatoryFile.extracted_text != ""
+            )
+        for file_id, file_name in mandatory.all():
+            files.append({"source": "mandatory", "file_id": file_id, "file_name": file_name})
+
+        return files
+
+    def _expected_indexes(self, db: Session, generations: List[int]) -> Dict[str, Dict[str, Any]]:
+        """Index names that should exist in the given generations, mapped to their file"""
+        expected = {}
+        for entry in self.expected_files(db):
+            for generation in generations:
+                index_name = pinecone_service.get_index_name_for_file(entry["file_id"], entry["file_name"], generation)
+                expected[index_name] = {**entry, "generation": generation}
+        return expected
+
+    def rebuild_file(
+        self,
+        db: Session,
+        entry: Dict[str, Any],
+        targets: Optional[List[Dict[str, Any]]] = None
+    ) -> Dict[str, Any]:
+        """Re-index one file from its stored extracted text"""
+        if entry["source"] == "uploaded":
+            row = db.query(UploadedFile.extracted_text, UploadedFile.file_type, UploadedFile.uploaded_by).filter(
+                UploadedFile.id == entry["file_id"]
+            ).first()
+            metadata = {"file_type": row.file_type, "uploaded_by": row.uploaded_by} if row else {}
+        else:
+            row = db.query(MandatoryFile.extracted_text, MandatoryFile.file_type).filter(
+                MandatoryFile.id == entry["file_id"]
+            ).first()
+            metadata = {"file_type": row.file_type or "unknown"} if row else {}
+
+        if not row or not row.extracted_text:
+            return {"success": False, "error": "No extracted text to index"}
+        return self.index_file(db, entry["file_id"], entry["file_name"], row.extracted_text, metadata, targets)
+
+    def reconcile(self, db: Session, dry_run: bool = True, rebuild_missing: bool = True) -> Dict[str, Any]:
+        """
+        Diff DB rows (UploadedFile, MandatoryFile, ProjectKnowledgeBaseFile)
+        against the vector store: delete orphaned indexes in parallel and
+        rebuild indexes that are missing.
+
+        Args:
+            db: Database session
+            dry_run: Only report what would change
+            rebuild_missing: Re-index files whose index is missing
+
+        Returns:
+            Dict with counts and the affected index names
+        """
+        existing = [name for name in pinecone_service.list_indexes() if name.startswith(INDEX_PREFIX)]
+        targets = self._write_targets(db)
+        generations = [target["generation"] for target in targets]
+        expected = self._expected_indexes(db, generations)
+
+        # Uploads still being indexed in the background are neither orphans nor missing
+        in_progress = {
+            pinecone_service.get_index_name_for_file(file_id, file_name, generation)
+            for file_id, file_name in db.query(UploadedFile.id, UploadedFile.file_name).filter(
+                UploadedFile.indexing_status == "pending_index"
+            ).all()
+            for generation in generations
+        }
+
+        # Retired generations may still be queried by workers that have not refreshed; their sweep deletes them
+        orphaned = sorted(set(existing) - set(expected) - in_progress - self._retained_indexes(db))
+        # The generation being built creates its own indexes; only the active one is rebuilt here
+        missing = sorted(
+            name for name in set(expected) - set(existing)
+            if expected[name]["generation"] == generations[0]
+        )
+
+        report = {
+            "success": True,
+            "dry_run": dry_run,
+            "existing_count": len(existing),
+            "expected_count": len(expected),
+            "orphaned_count": len(orphaned),
+            "missing_count": len(missing),
+            "orphaned": orphaned,
+            "missing": [{"index_name": name, **expected[name]} for name in missing],
+            "deleted_count": 0,
+            "rebuilt_count": 0,
+            "errors": []
+        }
+
+        if dry_run:
+            logger.info(f"Reconcile (dry run): {len(orphaned)} orphaned, {len(missing)} missing")
+            return report
+
+        if orphaned:
+            # Pinecone deletes are slow network calls; run them in parallel
+            with ThreadPoolExecutor(max_workers=self.reconcile_workers) as executor:
+                delete_results = list(executor.map(
+                    lambda name: pinecone_service.delete_index_by_name(name, check_exists=False),
+                    orphaned
+                ))
+            for index_name, result in zip(orphaned, delete_results):
+                if result.get("success"):
+                    report["deleted_count"] += 1
+                    self.forget_index(db, index_name)
+                else:
+                    report["errors"].append({"index_name": index_name, "error": result.get("error")})
+
+        if rebuild_missing:
+            for index_name in missing:
+                try:
+                    result = self.rebuild_file(db, expected[index_name], targets=targets[:1])
+                except Exception as e:
+                    result = {"success": False, "error": str(e)}
+                if result.get("success"):
+                    report["rebuilt_count"] += 1
+                else:
+                    report["errors"].append({"index_name": index_name, "error": result.get("error")})
+
+        logger.info(
+            f"Reconcile: deleted {report['deleted_count']}/{len(orphaned)} orphaned, "
+            f"rebuilt {report['rebuilt_count']}/{len(missing)} missing, {len(report['errors'])} errors"
+        )
+        return report
+
+
+# Create service instance
+indexing_service = IndexingService()
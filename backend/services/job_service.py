@@ -0,0 +1,239 @@
+"""
+Job Service
+Background jobs for long LLM pipelines (sprint-plan generation), so the request
+that starts one returns a job id immediately instead of holding the connection
+for the whole generate -> validate -> save sequence.
+
+- Job state (status, stage, progress, result) lives in the generation_jobs
+  table, so any worker can answer polls and SSE subscriptions
+- Each worker process runs its jobs on JOB_WORKERS asyncio worker tasks; the
+  stages await Gemini instead of blocking, so workers never sleep a thread
+- A running job whose heartbeat is older than JOB_STALE_SECONDS (e.g. its
+  process restarted) is reported as failed. Queued jobs wait in this process's
+  in-memory queue for as long as the pool is busy, so they are never timed out;
+  a restart loses them and they stay queued (clients should resubmit)
+- Job state writes run in a worker thread on their own short-lived session, so
+  a slow commit never stalls the event loop; progress reports made while a
+  write is in flight are coalesced into the next one
+"""
+import os
+import uuid
+import asyncio
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Any, Optional, Callable, Awaitable
+import logging
+
+from sqlalchemy.orm import Session
+
+from models import GenerationJob
+
+logger = logging.getLogger(__name__)
+
+FINISHED_STATUSES = ("succeeded", "failed")
+
+# runner(db, report) -> result dict with "success"; report(stage, progress) records progress
+JobRunner = Callable[[Session, Callable[[str, int], None]], Awaitable[Dict[str, Any]]]
+
+
+class JobService:
+    """In-process worker pool for DB-tracked background jobs"""
+
+    def __init__(self):
+        self.worker_count = max(1, int(os.getenv("JOB_WORKERS", "4")))
+        self.stale_seconds = int(os.getenv("JOB_STALE_SECONDS", "900"))
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers = []
+        self._running = 0
+
+    def start(self) -> None:
+        """Start the worker tasks on the running event loop (idempotent)"""
+        if self._workers:
+            return
+        self._queue = asyncio.Queue()
+        self._workers = [asyncio.ensure_future(self._worker()) for _ in range(self.worker_count)]
+        logger.info(f"Job workers started: {self.worker_count}")
+
+    async def stop(self) -> None:
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    def submit(self, db: Session, kind: str, runner: JobRunner, user_email: str = None) -> Dict[str, Any]:
+        """
+        Record a job and queue it for the worker pool.
+
+        Args:
+            db: Request database session (the job itself runs on its own session)
+            kind: Job type, e.g. "sprint_plan"
+            runner: Coroutine function doing the work
+            user_email: Owner of the job
+
+        Returns:
+            The job as a dict (status "queued")
+        """
+        job = GenerationJob(id=uuid.uuid4().hex, kind=kind, status="queued", stage="queued", progress=0, user_email=user_email)
+        db.add(job)
+        db.commit()
+        db.refresh(job)
+
+        self.start()
+        self._queue.put_nowait((job.id, runner))
+        logger.info(f"Queued {kind} job {job.id} (queue depth {self._queue.qsize()})")
+        return self._to_dict(job)
+
+    async def _worker(self) -> None:
+        while True:
+            job_id, runner = await self._queue.get()
+            self._running += 1
+            try:
+                await self._run(job_id, runner)
+            except Exception as e:
+                logger.error(f"Job {job_id} crashed outside its runner: {str(e)}")
+            finally:
+                self._running -= 1
+                self._queue.task_done()
+
+    @staticmethod
+    def _update(db: Session, job_id: str, **fields) -> None:
+        fields["updated_at"] = datetime.now(timezone.utc)
+        db.query(GenerationJob).filter(GenerationJob.id == job_id).update(fields, synchronize_session=False)
+        db.commit()
+
+    @classmethod
+    def _write(cls, job_id: str, **fields) -> None:
+        """Update a job on a session of its own (called via asyncio.to_thread)"""
+        from database import SessionLocal
+
+        db = SessionLocal()
+        try:
+            cls._update(db, job_id, **fields)
+        finally:
+            db.close()
+
+    @classmethod
+    def _claim(cls, job_id: str) -> bool:
+        """Move a queued job to running; False when it is no longer queued (called via asyncio.to_thread)"""
+        from database import SessionLocal
+
+        db = SessionLocal()
+        try:
+            now = datetime.now(timezone.utc)
+            claimed = db.query(GenerationJob).filter(
+                GenerationJob.id == job_id, GenerationJob.status == "queued"
+            ).update(
+                {"status": "running", "stage": "starting", "started_at": now, "updated_at": now},
+                synchronize_session=False
+            )
+            db.commit()
+            return claimed == 1
+        finally:
+            db.close()
+
+    async def _run(self, job_id: str, runner: JobRunner) -> None:
+        from database import SessionLocal
+
+        if not await asyncio.to_thread(self._claim, job_id):
+            logger.warning(f"Job {job_id} is no longer queued; not running it")
+            return
+
+        db = SessionLocal()
+        pending: Dict[str, Any] = {}
+        flusher: Optional[asyncio.Future] = None
+
+        async def flush() -> None:
+            # Latest stage / progress wins; reports made during a write go out with the next one
+            while pending:
+                fields = dict(pending)
+                pending.clear()
+                try:
+                    await asyncio.to_thread(self._write, job_id, **fields)
+                except Exception as e:
+                    logger.warning(f"Job {job_id}: could not record progress: {str(e)}")
+
+        def report(stage: str, progress: int) -> None:
+            nonlocal flusher
+            logger.info(f"Job {job_id}: {stage} ({progress}%)")
+            pending.update(stage=stage, progress=progress)
+            if flusher is None or flusher.done():
+                flusher = asyncio.ensure_future(flush())
+
+        try:
+            try:
+                result = await runner(db, report)
+            except Exception as e:
+                db.rollback()
+                logger.error(f"Job {job_id} failed: {str(e)}")
+                result = {"success": False, "message": f"Error running job: {str(e)}"}
+
+            if flusher is not None:
+                await flusher
+            success = bool(result.get("success"))
+            await asyncio.to_thread(
+                self._write, job_id,
+                status="succeeded" if success else "failed",
+                stage="done",
+                progress=100,
+                result=result,
+                error=None if success else (result.get("message") or result.get("error") or "Job failed"),
+                finished_at=datetime.now(timezone.utc)
+            )
+        finally:
+            db.close()
+
+    def get(self, db: Session, job_id: str) -> Optional[Dict[str, Any]]:
+        """Job status, stage, progress and (when finished) result; None when unknown"""
+        job = db.query(GenerationJob).filter(GenerationJob.id == job_id).first()
+        if job is None:
+            return None
+
+        # Only a running job has a heartbeat; a queued one may just be waiting for a worker
+        heartbeat = job.updated_at or job.started_at
+        if job.status == "running" and heartbeat is not None:
+            if heartbeat.tzinfo is None:
+                heartbeat = heartbeat.replace(tzinfo=timezone.utc)
+            if datetime.now(timezone.utc) - heartbeat > timedelta(seconds=self.stale_seconds):
+                self._update(
+                    db, job.id, status="failed", stage="done",
+                    error="Job was interrupted (worker restarted or stalled); please retry",
+                    finished_at=datetime.now(timezone.utc)
+                )
+                db.refresh(job)
+        return self._to_dict(job)
+
+    def fetch(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """get() on a session of its own, for callers on the event loop (via asyncio.to_thread)"""
+        from database import SessionLocal
+
+        db = SessionLocal()
+        try:
+            return self.get(db, job_id)
+        finally:
+            db.close()
+
+    @staticmethod
+    def _to_dict(job: GenerationJob) -> Dict[str, Any]:
+        return {
+            "job_id": job.id,
+            "kind": job.kind,
+            "status": job.status,
+            "stage": job.stage,
+            "progress": job.progress,
+            "result": job.result,
+            "error": job.error,
+            "created_at": job.created_at.isoformat() if job.created_at else None,
+            "started_at": job.started_at.isoformat() if job.started_at else None,
+            "finished_at": job.finished_at.isoformat() if job.finished_at else None
+        }
+
+    def get_stats(self) -> Dict[str, Any]:
+        """This worker process's pool: size, queued and running jobs"""
+        return {
+            "workers": len(self._workers),
+            "queued": self._queue.qsize() if self._queue else 0,
+            "running": self._running
+        }
+
+
+# Create service instance
+job_service = JobService()
@@ -0,0 +1,206 @@
+"""
+Knowledge Base Registry Service
+Compact in-memory map of the files the question path can search
+(file id -> name, index name, indexed flag, knowledge-base users), so answering
+a question needs no table scans and never loads file blobs or extracted text.
+
+The registry is rebuilt lazily after invalidate() (called by the endpoints that
+add, remove, upload or delete files, and by the indexing pipeline) and at most
+every KB_REGISTRY_REFRESH_SECONDS to pick up changes made by other workers.
+
+With KB_SCOPE=user, a question only searches the asking user's knowledge-base
+selection plus their own uploads; KB_GLOBAL_FALLBACK decides whether users with
+nothing selected (or anonymous questions) search the shared knowledge base.
+"""
+import os
+import time
+import hashlib
+import threading
+from typing import List, Dict, Any, Optional
+import logging
+
+from sqlalchemy import and_
+from sqlalchemy.orm import Session
+
+from models import UploadedFile, MandatoryFile, ProjectKnowledgeBaseFile
+from .pinecone_service import pinecone_service
+
+logger = logging.getLogger(__name__)
+
+
+class KBRegistryService:
+    """Service for the in-memory knowledge-base file registry"""
+
+    def __init__(self):
+        self.refresh_seconds = int(os.getenv("KB_REGISTRY_REFRESH_SECONDS", "60"))
+        # KB_SCOPE: "user" (asking user's selection and uploads) or "global" (every user's files)
+        self.scope = os.getenv("KB_SCOPE", "user").lower()
+        self.global_fallback = os.getenv("KB_GLOBAL_FALLBACK", "true").lower() == "true"
+
+        self._lock = threading.Lock()
+        self._mandatory: Dict[int, Dict[str, Any]] = {}  # KB mandatory files by id
+        self._uploaded: Dict[int, Dict[str, Any]] = {}  # Indexed uploads by id
+        self._users: Dict[str, List[int]] = {}  # user_email -> mandatory file ids in their KB
+        self._version = ""
+        self._generation: Optional[int] = None
+        self._loaded_at = 0.0
+        self._stale = True
+
+    def invalidate(self) -> None:
+        """Mark the registry stale; it is rebuilt on next use"""
+        with self._lock:
+            self._stale = True
+
+    def _ensure_loaded(self, db: Session) -> None:
+        with self._lock:
+            if (
+                not self._stale
+                and self._generation == pinecone_service.active_generation
+                and time.time() - self._loaded_at < self.refresh_seconds
+            ):
+                return
+        self._load(db)
+
+    def _load(self, db: Session) -> None:
+        """Rebuild the registry from light columns only"""
+        from .hybrid_search_service import hybrid_search_service
+
+        generation = pinecone_service.active_generation
+        existing = set(hybrid_search_service.list_indexes())
+
+        users: Dict[str, List[int]] = {}
+        for user_email, mandatory_file_id in db.query(
+            ProjectKnowledgeBaseFile.user_email, ProjectKnowledgeBaseFile.mandatory_file_id
+        ).all():
+            users.setdefault(user_email, []).append(mandatory_file_id)
+
+        mandatory = {}
+        kb_file_ids = {file_id for file_ids in users.values() for file_id in file_ids}
+        if kb_file_ids:
+            has_text = and_(MandatoryFile.extracted_text.isnot(None), MandatoryFile.extracted_text != "")
+            for file_id, file_name, is_active, text_present in db.query(
+                MandatoryFile.id, MandatoryFile.file_name, MandatoryFile.is_active, has_text.label("has_text")
+            ).filter(MandatoryFile.id.in_(kb_file_ids)).all():
+                index_name = pinecone_service.get_index_name_for_file(file_id, file_name, generation)
+                mandatory[file_id] = {
+                    "source": "mandatory",
+                    "file_id": file_id,
+                    "file_name": file_name,
+                    "index_name": index_name,
+                    "is_active": bool(is_active),
+                    "has_text": bool(text_present),
+                    "indexed": index_name in existing
+                }
+
+        uploaded = {}
+        for file_id, file_name, uploaded_by in db.query(
+            UploadedFile.id, UploadedFile.file_name, UploadedFile.uploaded_by
+        ).filter(UploadedFile.indexing_status == "indexed").all():
+            index_name = pinecone_service.get_index_name_for_file(file_id, file_name, generation)
+            uploaded[file_id] = {
+                "source": "uploaded",
+                "file_id": file_id,
+                "file_name": file_name,
+                "uploaded_by": uploaded_by,
+                "index_name": index_name,
+                "indexed": index_name in existing
+            }
+
+        # Deterministic stamp of what is searchable, identical across workers
+        signature = repr((
+            generation,
+            sorted((f["file_id"], f["index_name"], f["indexed"], f["is_active"], f["has_text"]) for f in mandatory.values()),
+            sorted((f["file_id"], f["index_name"], f["indexed"]) for f in uploaded.values()),
+            sorted((user, sorted(ids)) for user, ids in users.items())
+        ))
+        version = hashlib.sha1(signature.encode("utf-8")).hexdigest()[:12]
+
+        with self._lock:
+            self._mandatory = mandatory
+            self._uploaded = uploaded
+            self._users = users
+            self._version = version
+            self._generation = generation
+            self._loaded_at = time.time()
+            self._stale = False
+
+        logger.info(
+            f"KB registry loaded: {len(mandatory)} knowledge-base files, {len(uploaded)} indexed uploads, "
+            f"{len(users)} users (version {version})"
+        )
+
+    def version(self, db: Session) -> str:
+        """Stamp that changes whenever the searchable file set changes"""
+        self._ensure_loaded(db)
+        return self._version
+
+    def scope_version(self, db: Session, user_email: str = None) -> str:
+        """
+        Stamp of the files one user's questions can search. It only changes when a
+        file in that user's scope is added, removed or finishes indexing (or the
+        vector generation changes).
+        """
+        files = sorted(
+            {(f["index_name"], f["indexed"]) for f in self.knowledge_base_files(db, user_email)}
+            | {(f["index_name"], f["indexed"]) for f in self.searchable_files(db, user_email)}
+        )
+        signature = repr((self._generation, files))
+        return hashlib.sha1(signature.encode("utf-8")).hexdigest()[:12]
+
+    def _scoped(self, files: List[Dict[str, Any]], user_email: Optional[str], owned) -> List[Dict[str, Any]]:
+        """Restrict files to the user's own (caller holds the lock)"""
+        if self.scope != "user":
+            return files
+        own = [f for f in files if owned(f)] if user_email else []
+        if own or not self.global_fallback:
+            return own
+        return files
+
+    def knowledge_base_files(self, db: Session, user_email: str = None) -> List[Dict[str, Any]]:
+        """
+        Active knowledge-base mandatory files that have extracted text.
+
+        Args:
+            db: Database session
+            user_email: Asking user; with KB_SCOPE=user only their selection is returned
+        """
+        self._ensure_loaded(db)
+        with self._lock:
+            files = [dict(f) for f in self._mandatory.values() if f["is_active"] and f["has_text"]]
+            selected = set(self._users.get(user_email, []))
+            return self._scoped(files, user_email, lambda f: f["file_id"] in selected)
+
+    def searchable_files(self, db: Session, user_email: str = None) -> List[Dict[str, Any]]:
+        """
+        Every file with an existing index: indexed uploads plus knowledge-base files.
+
+        Args:
+            db: Database session
+            user_email: Asking user; with KB_SCOPE=user only their uploads and selection are returned
+        """
+        self._ensure_loaded(db)
+        with self._lock:
+            files = [dict(f) for f in list(self._uploaded.values()) + list(self._mandatory.values()) if f["indexed"]]
+            selected = set(self._users.get(user_email, []))
+            return self._scoped(
+                files,
+                user_email,
+                lambda f: f["uploaded_by"] == user_email if f["source"] == "uploaded" else f["file_id"] in selected
+            )
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "scope": self.scope,
+                "global_fallback": self.global_fallback,
+                "version": self._version,
+                "knowledge_base_files": len(self._mandatory),
+                "indexed_uploads": len(self._uploaded),
+                "users": len(self._users),
+                "loaded_at": self._loaded_at,
+                "stale": self._stale
+            }
+
+
+# Create service instance
+kb_registry_service = KBRegistryService()
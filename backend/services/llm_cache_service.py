@@ -0,0 +1,161 @@
+"""
+LLM Response Cache Service
+Content-hash cache for deterministic Gemini prompts (plan / assessment
+validation, DOCX template parsing, regenerate clicks with unchanged inputs).
+
+The key is a SHA-256 of the model and the exact request body (system
+instruction, turns and generation config), so any change to the prompt,
+inputs, output cap or temperature is a miss. Call sites opt in per call
+(`cache=True`) and can force a fresh answer with `bypass_cache=True`, which
+skips the lookup and overwrites the entry.
+
+Entries are small JSON files in LLM_CACHE_DIR, shared by every worker on the
+host, expire after LLM_CACHE_TTL_SECONDS and are evicted least recently used
+first once the directory exceeds LLM_CACHE_MAX_BYTES.
+"""
+import os
+import json
+import time
+import hashlib
+import threading
+from typing import Dict, Any, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class LLMCacheService:
+    """Service for caching LLM responses by request content hash"""
+
+    def __init__(self):
+        self.enabled = os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true"
+        self.cache_dir = os.getenv("LLM_CACHE_DIR", "llm_cache")
+        self.ttl_seconds = int(os.getenv("LLM_CACHE_TTL_SECONDS", "604800"))
+        self.max_bytes = int(os.getenv("LLM_CACHE_MAX_BYTES", str(100 * 1024 * 1024)))
+
+        self._lock = threading.Lock()
+        self._size_bytes = None  # Directory size, computed on first store
+        self._stats = {"hits": 0, "misses": 0, "stores": 0, "bypassed": 0, "evictions": 0}
+
+    @staticmethod
+    def make_key(model: str, body: Dict[str, Any]) -> str:
+        """Hash of the model and the full request body (prompt, turns, generation config)"""
+        canonical = json.dumps({"model": model, "body": body}, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Cached result for a key, or None when missing or expired"""
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            with self._lock:
+                self._stats["misses"] += 1
+            return None
+
+        if time.time() - entry.get("created_at", 0) >= self.ttl_seconds:
+            self._remove(path)
+            with self._lock:
+                self._stats["misses"] += 1
+            return None
+
+        # Touch for least-recently-used eviction
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+        with self._lock:
+            self._stats["hits"] += 1
+        return entry["result"]
+
+    def put(self, key: str, result: Dict[str, Any]) -> None:
+        """Store a successful result (written atomically so other workers never read a partial file)"""
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            path = self._path(key)
+            data = json.dumps({"created_at": time.time(), "result": result}, ensure_ascii=False)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"Failed to write LLM cache entry: {str(e)}")
+            return
+
+        with self._lock:
+            self._stats["stores"] += 1
+            if self._size_bytes is None:
+                self._size_bytes = self._directory_size()
+            else:
+                self._size_bytes += len(data.encode("utf-8"))
+            if self._size_bytes > self.max_bytes:
+                self._evict()
+
+    def record_bypass(self) -> None:
+        with self._lock:
+            self._stats["bypassed"] += 1
+
+    def _directory_size(self) -> int:
+        if not os.path.isdir(self.cache_dir):
+            return 0
+        return sum(entry.stat().st_size for entry in os.scandir(self.cache_dir) if entry.name.endswith(".json"))
+
+    def _evict(self) -> None:
+        """Drop expired entries, then least recently used ones until 90% of the limit (caller holds the lock)"""
+        now = time.time()
+        entries = sorted(
+            (entry.stat().st_mtime, entry.stat().st_size, entry.path)
+            for entry in os.scandir(self.cache_dir)
+            if entry.name.endswith(".json")
+        )
+        size = sum(entry_size for _, entry_size, _ in entries)
+        target = int(self.max_bytes * 0.9)
+        for mtime, entry_size, path in entries:
+            if size <= target and now - mtime < self.ttl_seconds:
+                break
+            if self._remove(path):
+                size -= entry_size
+                self._stats["evictions"] += 1
+        self._size_bytes = size
+
+    @staticmethod
+    def _remove(path: str) -> bool:
+        try:
+            os.remove(path)
+            return True
+        except OSError:
+            return False
+
+    def clear(self) -> int:
+        """Delete every cache entry; returns the number removed"""
+        with self._lock:
+            removed = 0
+            if os.path.isdir(self.cache_dir):
+                for entry in os.scandir(self.cache_dir):
+                    if entry.name.endswith(".json") and self._remove(entry.path):
+                        removed += 1
+            self._size_bytes = 0
+            return removed
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            if self._size_bytes is None:
+                self._size_bytes = self._directory_size()
+            lookups = self._stats["hits"] + self._stats["misses"]
+            return {
+                "enabled": self.enabled,
+                "cache_dir": self.cache_dir,
+                "ttl_seconds": self.ttl_seconds,
+                "size_bytes": self._size_bytes,
+                "max_bytes": self.max_bytes,
+                **self._stats,
+                "hit_rate": round(self._stats["hits"] / lookups, 4) if lookups else 0.0
+            }
+
+
+# Create service instance
+llm_cache_service = LLMCacheService()
@@ -0,0 +1,179 @@
+"""
+LLM Dispatcher
+Priority lanes in front of every upstream Gemini call, so a burst of plan
+generations cannot starve interactive chat.
+
+- Two lanes: `interactive` (call sites in LLM_INTERACTIVE_CALL_SITES, by default
+  the /api/ask-question router and answerer and /api/gemini/chat) and `bulk`
+  (plan / risk generation, validation passes, DOCX parsing, everything else)
+- At most LLM_MAX_CONCURRENCY calls run at once per worker; bulk may only use
+  LLM_MAX_CONCURRENCY - LLM_INTERACTIVE_RESERVED of them, so interactive calls
+  always find capacity
+- When a slot frees up, queued interactive calls are admitted before any bulk
+  call, whatever the arrival order (running calls are never interrupted)
+- A call waits in its lane for at most LLM_INTERACTIVE_MAX_WAIT_SECONDS /
+  LLM_BULK_MAX_WAIT_SECONDS and then fails with a clear error
+
+Cache hits and coalesced duplicates never enter a lane. All state lives on the
+event loop, so no locking is needed.
+"""
+import os
+import time
+import asyncio
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Dict, Any
+import logging
+
+logger = logging.getLogger(__name__)
+
+INTERACTIVE = "interactive"
+BULK = "bulk"
+
+
+class LLMQueueTimeout(Exception):
+    """A call waited longer than its lane allows"""
+
+
+class Lane:
+    """Queue, concurrency limit and wait-time counters of one priority lane"""
+
+    def __init__(self, name: str, limit: int, max_wait_seconds: float):
+        self.name = name
+        self.limit = max(1, limit)
+        self.max_wait_seconds = max_wait_seconds
+        self.waiters = deque()  # (future, enqueued_at)
+        self.in_flight = 0
+        self.recent_waits = deque(maxlen=500)  # seconds, for percentiles
+        self.stats = {"admitted": 0, "queued": 0, "timed_out": 0, "completed": 0}
+        self.max_wait_seen = 0.0
+
+    def queue_depth(self) -> int:
+        return sum(1 for future, _ in self.waiters if not future.done())
+
+
+class LLMDispatcher:
+    """Two-lane priority scheduler with reserved interactive capacity"""
+
+    def __init__(self):
+        self.max_concurrency = max(1, int(os.getenv("LLM_MAX_CONCURRENCY", "12")))
+        reserved = min(int(os.getenv("LLM_INTERACTIVE_RESERVED", "4")), self.max_concurrency - 1)
+        self.interactive_call_sites = {
+            site.strip() for site in os.getenv("LLM_INTERACTIVE_CALL_SITES", "router,answerer,gemini_chat").split(",")
+            if site.strip()
+        }
+
+        self.lanes = {
+            INTERACTIVE: Lane(
+                INTERACTIVE, self.max_concurrency,
+                float(os.getenv("LLM_INTERACTIVE_MAX_WAIT_SECONDS", "30"))
+            ),
+            BULK: Lane(
+                BULK, self.max_concurrency - max(0, reserved),
+                float(os.getenv("LLM_BULK_MAX_WAIT_SECONDS", "600"))
+            )
+        }
+        self.in_flight = 0
+
+    def lane_for(self, call_site: str) -> str:
+        return INTERACTIVE if call_site in self.interactive_call_sites else BULK
+
+    def _has_capacity(self, lane: Lane) -> bool:
+        return self.in_flight < self.max_concurrency and lane.in_flight < lane.limit
+
+    def _admit(self, lane: Lane, waited: float) -> None:
+        lane.in_flight += 1
+        self.in_flight += 1
+        lane.stats["admitted"] += 1
+        lane.recent_waits.append(waited)
+        lane.max_wait_seen = max(lane.max_wait_seen, waited)
+
+    def _dispatch(self) -> None:
+        """Hand free slots to queued calls, interactive lane first"""
+        now = time.monotonic()
+        for lane in (self.lanes[INTERACTIVE], self.lanes[BULK]):
+            while lane.waiters and self._has_capacity(lane):
+                future, enqueued_at = lane.waiters.popleft()
+                if future.done():  # Timed out or caller went away
+                    continue
+                self._admit(lane, now - enqueued_at)
+                future.set_result(None)
+            if lane.name == INTERACTIVE and lane.queue_depth():
+                # Interactive calls are still waiting; bulk must not take the slot
+                return
+
+    async def acquire(self, lane_name: str) -> None:
+        """
+        Wait for a slot in a lane.
+
+        Raises:
+            LLMQueueTimeout: No slot within the lane's maximum wait
+        """
+        lane = self.lanes[lane_name]
+        interactive_waiting = self.lanes[INTERACTIVE].queue_depth() > 0
+        if not lane.queue_depth() and self._has_capacity(lane) and (lane_name == INTERACTIVE or not interactive_waiting):
+            self._admit(lane, 0.0)
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        enqueued_at = time.monotonic()
+        lane.waiters.append((future, enqueued_at))
+        lane.stats["queued"] += 1
+        try:
+            await asyncio.wait_for(future, timeout=lane.max_wait_seconds)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if future.done() and not future.cancelled():
+                # Admitted just as the wait ended; hand the slot back
+                self.release(lane_name)
+            if isinstance(e, asyncio.TimeoutError):
+                lane.stats["timed_out"] += 1
+                logger.warning(f"LLM {lane_name} call waited {lane.max_wait_seconds:g}s without a slot")
+                raise LLMQueueTimeout(
+                    f"LLM {lane_name} queue is full; waited {lane.max_wait_seconds:g}s for a slot"
+                )
+            raise
+
+    def release(self, lane_name: str) -> None:
+        lane = self.lanes[lane_name]
+        lane.in_flight -= 1
+        self.in_flight -= 1
+        lane.stats["completed"] += 1
+        self._dispatch()
+
+    @asynccontextmanager
+    async def slot(self, lane_name: str):
+        """Hold a slot in a lane for the duration of the block"""
+        await self.acquire(lane_name)
+        try:
+            yield
+        finally:
+            self.release(lane_name)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Per-lane limits, running and queued calls, and wait times"""
+        now = time.monotonic()
+        lanes = {}
+        for name, lane in self.lanes.items():
+            waits = sorted(lane.recent_waits)
+            pending = [now - enqueued_at for future, enqueued_at in lane.waiters if not future.done()]
+            lanes[name] = {
+                "limit": lane.limit,
+                "in_flight": lane.in_flight,
+                "queue_depth": len(pending),
+                "oldest_wait_seconds": round(max(pending), 2) if pending else 0.0,
+                "max_wait_seconds": lane.max_wait_seconds,
+                **lane.stats,
+                "avg_wait_ms": round(sum(waits) / len(waits) * 1000) if waits else 0,
+                "p95_wait_ms": round(waits[min(len(waits) - 1, int(len(waits) * 0.95))] * 1000) if waits else 0,
+                "max_wait_ms": round(lane.max_wait_seen * 1000)
+            }
+        return {
+            "max_concurrency": self.max_concurrency,
+            "in_flight": self.in_flight,
+            "interactive_call_sites": sorted(self.interactive_call_sites),
+            "lanes": lanes
+        }
+
+
+# Create dispatcher instance
+llm_dispatcher = LLMDispatcher()
@@ -80,7 +80,7 @@ class LLMService:
         user_responses = [r for r in context if r.get("type") == "user"]
         return len(user_responses)
     
-    def generate_sprint_plan(self, conversation_history: list, prompt_data: str = None) -> dict:
+    async def generate_sprint_plan(self, conversation_history: list, prompt_data: str = None) -> dict:
         """Generate sprint plan using Gemini"""
         try:
             # Use prompt data if provided
@@ -96,7 +96,7 @@ class LLMService:
                     messages.append({"role": "assistant", "content": msg.get("message", "")})
             
             # Generate sprint plan using Gemini with prompt data
-            result = gemini_service.generate_sprint_plan(messages, prompt_data)
+            result = await gemini_service.generate_sprint_plan(messages, prompt_data)
             
             if result["success"]:
                 return {
@@ -118,7 +118,7 @@ class LLMService:
                 "error": str(e)
             }
 
-    def generate_risk_assessment(self, conversation_history: list, prompt_data: str = None) -> dict:
+    async def generate_risk_assessment(self, conversation_history: list, prompt_data: str = None) -> dict:
         """Generate risk assessment using Gemini"""
         try:
             # Use prompt data if provided
@@ -134,7 +134,7 @@ class LLMService:
                     messages.append({"role": "assistant", "content": msg.get("message", "")})
             
             # Generate risk assessment using Gemini with prompt data
-            result = gemini_service.generate_risk_assessment(messages, prompt_data)
+            result = await gemini_service.generate_risk_assessment(messages, prompt_data)
             
             if result["success"]:
                 return {
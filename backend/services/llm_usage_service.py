@@ -0,0 +1,208 @@
+"""
+LLM Usage Service
+Token, latency and cost accounting for every Gemini call, tagged by call site
+(router, answerer, plan_generate, plan_validate, risk_generate, docx_parse, ...).
+
+Calls are aggregated in memory and flushed every LLM_USAGE_FLUSH_SECONDS into
+hourly llm_usage rows (one per call site), with atomic increments so several
+workers can share the table. Costs use the per-million-token prices in
+GEMINI_PRICE_INPUT_PER_MTOK / GEMINI_PRICE_OUTPUT_PER_MTOK /
+GEMINI_PRICE_CACHED_PER_MTOK.
+"""
+import os
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import List, Dict, Any
+import logging
+
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from models import LLMUsage
+
+logger = logging.getLogger(__name__)
+
+COUNTERS = (
+    "calls", "errors", "cache_hits", "coalesced",
+    "prompt_tokens", "output_tokens", "cached_tokens", "latency_ms_total"
+)
+
+
+def _empty() -> Dict[str, Any]:
+    return {**{name: 0 for name in COUNTERS}, "latency_ms_max": 0, "cost_usd": 0.0}
+
+
+class LLMUsageService:
+    """Service for per-call-site LLM token and cost accounting"""
+
+    def __init__(self):
+        self.input_price = float(os.getenv("GEMINI_PRICE_INPUT_PER_MTOK", "0.10"))
+        self.output_price = float(os.getenv("GEMINI_PRICE_OUTPUT_PER_MTOK", "0.40"))
+        self.cached_price = float(os.getenv("GEMINI_PRICE_CACHED_PER_MTOK", "0.025"))
+
+        self._lock = threading.Lock()
+        self._totals: Dict[str, Dict[str, Any]] = {}  # call_site -> totals since start-up
+        self._pending: Dict[tuple, Dict[str, Any]] = {}  # (hour, call_site) -> not yet persisted
+
+    def cost(self, prompt_tokens: int, output_tokens: int, cached_tokens: int = 0) -> float:
+        """USD cost of one call; cached prompt tokens are billed at the cached rate"""
+        uncached = max(0, prompt_tokens - cached_tokens)
+        return (
+            uncached * self.input_price
+            + cached_tokens * self.cached_price
+            + output_tokens * self.output_price
+        ) / 1_000_000
+
+    def record(
+        self,
+        call_site: str,
+        usage: Dict[str, int] = None,
+        latency_ms: float = 0,
+        success: bool = True,
+        cache_hit: bool = False,
+        coalesced: bool = False
+    ) -> None:
+        """
+        Record one LLM call.
+
+        Args:
+            call_site: Tag of the code path that made the call
+            usage: prompt_tokens / output_tokens / cached_tokens reported by Gemini
+            latency_ms: Wall-clock time of the call
+            success: Whether the call produced a response
+            cache_hit: Served from a cache (no upstream tokens)
+            coalesced: Shared an identical in-flight call (tokens counted once, by that call)
+        """
+        usage = usage or {}
+        delta = _empty()
+        if cache_hit:
+            delta["cache_hits"] = 1
+        elif coalesced:
+            delta["coalesced"] = 1
+        else:
+            delta["calls"] = 1
+            delta["prompt_tokens"] = int(usage.get("prompt_tokens", 0) or 0)
+            delta["output_tokens"] = int(usage.get("output_tokens", 0) or 0)
+            delta["cached_tokens"] = int(usage.get("cached_tokens", 0) or 0)
+            delta["cost_usd"] = self.cost(delta["prompt_tokens"], delta["output_tokens"], delta["cached_tokens"])
+        delta["errors"] = 0 if success else 1
+        delta["latency_ms_total"] = int(latency_ms)
+        delta["latency_ms_max"] = int(latency_ms)
+
+        hour = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0)
+        with self._lock:
+            for bucket in (
+                self._totals.setdefault(call_site, _empty()),
+                self._pending.setdefault((hour, call_site), _empty())
+            ):
+                for name in COUNTERS:
+                    bucket[name] += delta[name]
+                bucket["cost_usd"] += delta["cost_usd"]
+                bucket["latency_ms_max"] = max(bucket["latency_ms_max"], delta["latency_ms_max"])
+
+    def flush(self, db: Session) -> int:
+        """
+        Persist pending aggregates into hourly llm_usage rows.
+
+        Returns:
+            Number of (hour, call site) rows written
+        """
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+
+        written = 0
+        try:
+            for (hour, call_site), delta in pending.items():
+                increments = {getattr(LLMUsage, name): getattr(LLMUsage, name) + delta[name] for name in COUNTERS}
+                increments[LLMUsage.cost_usd] = LLMUsage.cost_usd + delta["cost_usd"]
+                increments[LLMUsage.latency_ms_max] = func.greatest(LLMUsage.latency_ms_max, delta["latency_ms_max"])
+                row_filter = (LLMUsage.period_start == hour, LLMUsage.call_site == call_site)
+
+                if not db.query(LLMUsage).filter(*row_filter).update(increments, synchronize_session=False):
+                    try:
+                        with db.begin_nested():
+                            db.add(LLMUsage(period_start=hour, call_site=call_site, **delta))
+                    except IntegrityError:
+                        # Another worker created the row first
+                        db.query(LLMUsage).filter(*row_filter).update(increments, synchronize_session=False)
+                written += 1
+            db.commit()
+            return written
+        except Exception as e:
+            db.rollback()
+            logger.warning(f"Failed to persist LLM usage, will retry: {str(e)}")
+            # Put the deltas back so the next flush includes them
+            with self._lock:
+                for key, delta in pending.items():
+                    bucket = self._pending.setdefault(key, _empty())
+                    for name in COUNTERS:
+                        bucket[name] += delta[name]
+                    bucket["cost_usd"] += delta["cost_usd"]
+                    bucket["latency_ms_max"] = max(bucket["latency_ms_max"], delta["latency_ms_max"])
+            return 0
+
+    @staticmethod
+    def _summarise(call_site: str, totals: Dict[str, Any]) -> Dict[str, Any]:
+        requests = totals["calls"] + totals["cache_hits"] + totals["coalesced"]
+        return {
+            "call_site": call_site,
+            "calls": totals["calls"],
+            "errors": totals["errors"],
+            "cache_hits": totals["cache_hits"],
+            "coalesced": totals["coalesced"],
+            "prompt_tokens": totals["prompt_tokens"],
+            "output_tokens": totals["output_tokens"],
+            "cached_tokens": totals["cached_tokens"],
+            "avg_latency_ms": round(totals["latency_ms_total"] / requests) if requests else 0,
+            "max_latency_ms": totals["latency_ms_max"],
+            "cost_usd": round(totals["cost_usd"], 6)
+        }
+
+    def breakdown(self, db: Session, hours: int = 24) -> Dict[str, Any]:
+        """
+        Per-call-site usage over the last `hours`, most expensive first (all workers,
+        after flushing this one).
+        """
+        self.flush(db)
+        since = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0) - timedelta(hours=hours - 1)
+        columns = [func.sum(getattr(LLMUsage, name)) for name in COUNTERS]
+        rows = db.query(
+            LLMUsage.call_site, *columns, func.max(LLMUsage.latency_ms_max), func.sum(LLMUsage.cost_usd)
+        ).filter(LLMUsage.period_start >= since).group_by(LLMUsage.call_site).all()
+
+        call_sites = []
+        for row in rows:
+            totals = {name: int(value or 0) for name, value in zip(COUNTERS, row[1:1 + len(COUNTERS)])}
+            totals["latency_ms_max"] = int(row[-2] or 0)
+            totals["cost_usd"] = float(row[-1] or 0.0)
+            call_sites.append(self._summarise(row.call_site, totals))
+        return self._with_shares(call_sites, hours)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """This worker's totals since start-up"""
+        with self._lock:
+            call_sites = [self._summarise(site, dict(totals)) for site, totals in self._totals.items()]
+        return self._with_shares(call_sites, None)
+
+    @staticmethod
+    def _with_shares(call_sites: List[Dict[str, Any]], hours) -> Dict[str, Any]:
+        total_tokens = sum(site["prompt_tokens"] + site["output_tokens"] for site in call_sites)
+        total_cost = sum(site["cost_usd"] for site in call_sites)
+        for site in call_sites:
+            tokens = site["prompt_tokens"] + site["output_tokens"]
+            site["token_share"] = round(tokens / total_tokens, 4) if total_tokens else 0.0
+        call_sites.sort(key=lambda site: (site["cost_usd"], site["calls"]), reverse=True)
+        return {
+            "hours": hours,
+            "total_calls": sum(site["calls"] for site in call_sites),
+            "total_tokens": total_tokens,
+            "total_cost_usd": round(total_cost, 6),
+            "call_sites": call_sites
+        }
+
+
+# Create service instance
+llm_usage_service = LLMUsageService()
@@ -0,0 +1,413 @@
+"""
+Local Vector Store Service
+On-disk, memory-mapped vector store for running retrieval without Pinecone queries.
+
+Each index is a directory under LOCAL_VECTOR_STORE_DIR holding:
+- codes.npy:  vectors in the search precision (int8, float16 or float32)
+- scales.npy: per-vector scale for int8 codes (vector ~= codes * scale)
+- full.npy:   float32 copy used only to re-score the top candidates (opt-in)
+- meta.json:  vector ids and compact metadata (file_id, chunk_index)
+
+Arrays are opened with mmap and scored SCORE_BLOCK_ROWS rows at a time, so a
+search pages in the compressed codes and never holds more than one block as
+float32. Vectors are L2-normalised, so dot products are cosine similarities
+like Pinecone's.
+
+The float32 copy is off by default because it costs more disk than it saves:
+int8 codes plus the copy take 1.25x the bytes of plain float32 (float16 plus
+the copy 1.5x). Enable it with LOCAL_VECTOR_KEEP_FULL_PRECISION when the
+recall report shows re-scoring is worth that.
+"""
+import os
+import json
+import shutil
+import random
+import threading
+from typing import List, Dict, Any, Optional
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+QUANTIZATIONS = ("int8", "float16", "float32")
+# Rows dequantized to float32 at once while scoring (bounds the temporary copy)
+SCORE_BLOCK_ROWS = 4096
+
+
+class LocalVectorStoreService:
+    """Service for quantized local vector search"""
+
+    def __init__(self):
+        # VECTOR_BACKEND: "pinecone" (default) or "local"
+        self.backend = os.getenv("VECTOR_BACKEND", "pinecone").lower()
+        self.store_dir = os.getenv("LOCAL_VECTOR_STORE_DIR", "vector_store")
+        self.quantization = os.getenv("LOCAL_VECTOR_QUANTIZATION", "int8").lower()
+        if self.quantization not in QUANTIZATIONS:
+            logger.warning(f"Unknown LOCAL_VECTOR_QUANTIZATION={self.quantization}, using int8")
+            self.quantization = "int8"
+        # Keep a float32 copy next to the codes (more disk than plain float32, see module docstring)
+        self.keep_full_precision = os.getenv("LOCAL_VECTOR_KEEP_FULL_PRECISION", "false").lower() == "true"
+        # Re-score top_k * this many candidates with the float32 copy, when kept (0 disables)
+        self.rescore_factor = int(os.getenv("LOCAL_VECTOR_RESCORE_FACTOR", "4"))
+
+        self._lock = threading.Lock()
+        self._cache: Dict[str, Dict[str, Any]] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return self.backend == "local"
+
+    @staticmethod
+    def _normalise(vectors: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+    @staticmethod
+    def quantize(vectors: np.ndarray, quantization: str) -> Dict[str, np.ndarray]:
+        """
+        Compress float32 vectors.
+
+        int8 uses a symmetric per-vector scale (max |x| / 127), so each vector
+        keeps its own dynamic range.
+
+        Returns:
+            Dict with 'codes' and, for int8, 'scales'
+        """
+        if quantization == "int8":
+            scales = np.abs(vectors).max(axis=1) / 127.0
+            scales[scales == 0] = 1.0
+            codes = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+            return {"codes": codes, "scales": scales.astype(np.float32)}
+        if quantization == "float16":
+            return {"codes": vectors.astype(np.float16)}
+        return {"codes": vectors.astype(np.float32)}
+
+    def _index_dir(self, index_name: str) -> str:
+        return os.path.join(self.store_dir, index_name)
+
+    def list_indexes(self) -> List[str]:
+        if not os.path.isdir(self.store_dir):
+            return []
+        return sorted(
+            name for name in os.listdir(self.store_dir)
+            if os.path.exists(os.path.join(self.store_dir, name, "meta.json"))
+        )
+
+    def write_index(
+        self,
+        index_name: str,
+        vector_ids: List[str],
+        embeddings: List[List[float]],
+        metadatas: List[Dict[str, Any]],
+        quantization: str = None
+    ) -> int:
+        """
+        Replace an index with the given vectors.
+
+        Args:
+            index_name: Index name (same naming as Pinecone indexes)
+            vector_ids: Vector ids, in order
+            embeddings: Vectors, in order
+            metadatas: Compact metadata per vector
+            quantization: int8, float16 or float32 (defaults to LOCAL_VECTOR_QUANTIZATION)
+
+        Returns:
+            Number of vectors written
+        """
+        quantization = quantization or self.quantization
+        vectors = self._normalise(np.asarray(embeddings, dtype=np.float32).reshape(len(vector_ids), -1))
+
+        # Write to a temporary directory and swap it in, so readers never see half an index
+        final_dir = self._index_dir(index_name)
+        tmp_dir = f"{final_dir}.tmp-{os.getpid()}-{threading.get_ident()}"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+
+        for name, array in self.quantize(vectors, quantization).items():
+            np.save(os.path.join(tmp_dir, f"{name}.npy"), array)
+        if quantization != "float32" and self.keep_full_precision and self.rescore_factor > 0:
+            np.save(os.path.join(tmp_dir, "full.npy"), vectors)
+        with open(os.path.join(tmp_dir, "meta.json"), "w") as f:
+            json.dump({
+                "quantization": quantization,
+                "dimension": int(vectors.shape[1]),
+                "ids": list(vector_ids),
+                "metadata": metadatas
+            }, f)
+
+        with self._lock:
+            self._cache.pop(index_name, None)
+            shutil.rmtree(final_dir, ignore_errors=True)
+            os.replace(tmp_dir, final_dir)
+
+        logger.info(f"Wrote {len(vector_ids)} {quantization} vectors to local index {index_name}")
+        return len(vector_ids)
+
+    def delete_index_by_name(self, index_name: str) -> Dict[str, Any]:
+        with self._lock:
+            self._cache.pop(index_name, None)
+            existed = os.path.isdir(self._index_dir(index_name))
+            shutil.rmtree(self._index_dir(index_name), ignore_errors=True)
+        return {"success": True, "deleted": existed}
+
+    def _load(self, index_name: str) -> Optional[Dict[str, Any]]:
+        """Open an index (memory-mapped), reloading it if another worker rewrote it"""
+        meta_path = os.path.join(self._index_dir(index_name), "meta.json")
+        try:
+            mtime = os.path.getmtime(meta_path)
+        except OSError:
+            return None
+
+        with self._lock:
+            cached = self._cache.get(index_name)
+            if cached is not None and cached["mtime"] == mtime:
+                return cached
+
+        index_dir = self._index_dir(index_name)
+        with open(meta_path) as f:
+            meta = json.load(f)
+        entry = {
+            "mtime": mtime,
+            "meta": meta,
+            "codes": np.load(os.path.join(index_dir, "codes.npy"), mmap_mode="r"),
+            "scales": None,
+            "full": None
+        }
+        if os.path.exists(os.path.join(index_dir, "scales.npy")):
+            entry["scales"] = np.load(os.path.join(index_dir, "scales.npy"))
+        if os.path.exists(os.path.join(index_dir, "full.npy")):
+            entry["full"] = np.load(os.path.join(index_dir, "full.npy"), mmap_mode="r")
+
+        with self._lock:
+            self._cache[index_name] = entry
+        return entry
+
+    @staticmethod
+    def _dequantize(entry: Dict[str, Any], start: int, stop: int) -> np.ndarray:
+        """Rows start:stop of an index as float32"""
+        block = np.asarray(entry["codes"][start:stop], dtype=np.float32)
+        if entry["scales"] is not None:
+            block *= entry["scales"][start:stop, None]
+        return block
+
+    @staticmethod
+    def _approximate_scores(entry: Dict[str, Any], queries: np.ndarray) -> np.ndarray:
+        """
+        Scores computed on the compressed codes, SCORE_BLOCK_ROWS rows at a time.
+
+        Args:
+            entry: Loaded index
+            queries: One query vector, or a (queries, dimension) matrix
+
+        Returns:
+            (rows,) scores for one query, (queries, rows) for several
+        """
+        codes = entry["codes"]
+        matrix = np.atleast_2d(queries)
+        scores = np.empty((matrix.shape[0], codes.shape[0]), dtype=np.float32)
+        for start in range(0, codes.shape[0], SCORE_BLOCK_ROWS):
+            stop = min(start + SCORE_BLOCK_ROWS, codes.shape[0])
+            block = matrix @ np.asarray(codes[start:stop], dtype=np.float32).T
+            if entry["scales"] is not None:
+                block *= entry["scales"][start:stop]
+            scores[:, start:stop] = block
+        return scores[0] if queries.ndim == 1 else scores
+
+    def _search_index(
+        self,
+        entry: Dict[str, Any],
+        query: np.ndarray,
+        top_k: int,
+        rescore: bool = True
+    ) -> List[tuple]:
+        """Return [(row, score)] for the best top_k rows of one index"""
+        count = entry["codes"].shape[0]
+        if count == 0:
+            return []
+        scores = self._approximate_scores(entry, query)
+
+        candidates = top_k * self.rescore_factor if rescore and entry["full"] is not None else top_k
+        candidates = min(max(candidates, top_k), count)
+        rows = np.argpartition(-scores, candidates - 1)[:candidates]
+
+        if rescore and entry["full"] is not None:
+            rows = np.sort(rows)  # sequential reads from the memory-mapped file
+            rescored = np.asarray(entry["full"][rows], dtype=np.float32) @ query
+            order = np.argsort(-rescored)[:top_k]
+            return [(int(rows[i]), float(rescored[i])) for i in order]
+
+        order = np.argsort(-scores[rows])[:top_k]
+        return [(int(rows[i]), float(scores[rows[i]])) for i in order]
+
+    def search_across_indexes(
+        self,
+        query_embedding: List[float],
+        index_names: List[str],
+        top_k: int = 3
+    ) -> Dict[str, Any]:
+        """
+        Search local indexes; same arguments and result shape as
+        pinecone_service.search_across_indexes (top_k results per index).
+        """
+        try:
+            query = np.asarray(query_embedding, dtype=np.float32)
+            query = query / (np.linalg.norm(query) or 1.0)
+            all_results = []
+
+            for index_name in index_names:
+                entry = self._load(index_name)
+                if entry is None:
+                    logger.warning(f"Local index {index_name} not found")
+                    continue
+                if entry["meta"]["dimension"] != query.shape[0]:
+                    logger.warning(f"Local index {index_name} has dimension {entry['meta']['dimension']}, query has {query.shape[0]}")
+                    continue
+                for row, score in self._search_index(entry, query, top_k):
+                    all_results.append({
+                        "index_name": index_name,
+                        "score": score,
+                        "chunk_id": entry["meta"]["ids"][row],
+                        "metadata": dict(entry["meta"]["metadata"][row]),
+                        "text": ""
+                    })
+
+            all_results.sort(key=lambda x: x["score"], reverse=True)
+            return {
+                "success": True,
+                "results": all_results,
+                "total_results": len(all_results)
+            }
+        except Exception as e:
+            logger.error(f"Failed to search local vector store: {str(e)}")
+            return {
+                "success": False,
+                "error": str(e),
+                "results": []
+            }
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Disk usage of the store, split into search codes and the re-scoring copy"""
+        stats = {"backend": self.backend, "quantization": self.quantization, "indexes": 0, "vectors": 0,
+                 "code_bytes": 0, "full_precision_bytes": 0}
+        for index_name in self.list_indexes():
+            index_dir = self._index_dir(index_name)
+            stats["indexes"] += 1
+            for name in os.listdir(index_dir):
+                size = os.path.getsize(os.path.join(index_dir, name))
+                if name == "full.npy":
+                    stats["full_precision_bytes"] += size
+                elif name.endswith(".npy"):
+                    stats["code_bytes"] += size
+            entry = self._load(index_name)
+            if entry is not None:
+                stats["vectors"] += entry["codes"].shape[0]
+        return stats
+
+    def recall_report(self, k: int = 10, num_queries: int = 100, seed: int = 0) -> Dict[str, Any]:
+        """
+        Measure recall@k of each quantization against exact float32 search on our own corpus.
+
+        Queries are stored chunk vectors sampled from the local indexes (read from
+        the float32 copy, or dequantized when no copy is kept); every query is run
+        against all vectors of all indexes. The corpus is processed
+        SCORE_BLOCK_ROWS rows at a time, so no full float32 matrix is built.
+
+        Returns:
+            Dict with recall@k and bytes per vector for int8 and float16, each with
+            and without full-precision re-scoring. The re-scoring modes count the
+            float32 copy they need, which makes them larger than plain float32.
+        """
+        entries = []
+        for index_name in self.list_indexes():
+            entry = self._load(index_name)
+            if entry is not None and entry["codes"].shape[0] > 0:
+                entries.append(entry)
+        dimensions = {entry["codes"].shape[1] for entry in entries}
+        if not entries or len(dimensions) != 1:
+            return {"success": False, "error": "Local store is empty or mixes embedding dimensions"}
+
+        # (entry, start, stop, first global row) for every block of the corpus
+        blocks = [
+            (entry, start, min(start + SCORE_BLOCK_ROWS, entry["codes"].shape[0]))
+            for entry in entries
+            for start in range(0, entry["codes"].shape[0], SCORE_BLOCK_ROWS)
+        ]
+        offsets = np.cumsum([0] + [stop - start for _, start, stop in blocks])
+        count = int(offsets[-1])
+        dimension = dimensions.pop()
+
+        def full_rows(rows: np.ndarray) -> np.ndarray:
+            """Float32 vectors (normalised) of global rows"""
+            out = np.empty((len(rows), dimension), dtype=np.float32)
+            for i, row in enumerate(rows):
+                b = int(np.searchsorted(offsets, row, side="right")) - 1
+                entry, start, _ = blocks[b]
+                local = start + int(row - offsets[b])
+                out[i] = entry["full"][local] if entry["full"] is not None else self._dequantize(entry, local, local + 1)[0]
+            return self._normalise(out)
+
+        k = min(k, count)
+        candidates = min(count, k * max(self.rescore_factor, 1))
+        sample = np.asarray(random.Random(seed).sample(range(count), min(num_queries, count)))
+        queries = full_rows(sample)
+
+        def merge(best: tuple, scores: np.ndarray, first_row: int, size: int) -> tuple:
+            """Keep the `size` best (score, row) per query"""
+            rows = np.broadcast_to(np.arange(first_row, first_row + scores.shape[1]), scores.shape)
+            all_scores, all_rows = np.hstack([best[0], scores]), np.hstack([best[1], rows])
+            keep = np.argpartition(-all_scores, min(size, all_scores.shape[1]) - 1, axis=1)[:, :size]
+            return np.take_along_axis(all_scores, keep, axis=1), np.take_along_axis(all_rows, keep, axis=1)
+
+        empty = (np.empty((len(sample), 0), dtype=np.float32), np.empty((len(sample), 0), dtype=np.int64))
+        exact_best = empty
+        approx_best = {"int8": empty, "float16": empty}
+        for (entry, start, stop), first_row in zip(blocks, offsets):
+            if entry["full"] is not None:
+                block = np.asarray(entry["full"][start:stop], dtype=np.float32)
+            else:
+                block = self._dequantize(entry, start, stop)
+            block = self._normalise(block)
+            exact_best = merge(exact_best, queries @ block.T, int(first_row), k)
+            for quantization in approx_best:
+                compressed = self.quantize(block, quantization)
+                compressed_entry = {"codes": compressed["codes"], "scales": compressed.get("scales")}
+                approx_best[quantization] = merge(
+                    approx_best[quantization], self._approximate_scores(compressed_entry, queries), int(first_row), candidates
+                )
+        exact_top = [set(rows.tolist()) for rows in exact_best[1]]
+
+        report = {
+            "success": True,
+            "k": k,
+            "queries": len(sample),
+            "vectors": count,
+            "dimension": dimension,
+            "float32_bytes_per_vector": dimension * 4,
+            "keep_full_precision": self.keep_full_precision,
+            "modes": {}
+        }
+        for quantization, (scores, rows) in approx_best.items():
+            code_bytes = (1 if quantization == "int8" else 2) * dimension + (4 if quantization == "int8" else 0)
+            for rescore in (False, True):
+                hits = 0
+                for query, query_scores, query_rows, exact in zip(queries, scores, rows, exact_top):
+                    if rescore:
+                        query_scores = full_rows(query_rows) @ query
+                    found = query_rows[np.argsort(-query_scores)[:k]]
+                    hits += len(set(found.tolist()) & exact)
+                # Re-scoring needs the float32 copy on disk next to the codes
+                bytes_per_vector = code_bytes + (dimension * 4 if rescore else 0)
+                report["modes"][f"{quantization}{'+rescore' if rescore else ''}"] = {
+                    f"recall@{k}": round(hits / (k * len(sample)), 4),
+                    "bytes_per_vector": bytes_per_vector,
+                    "compression": round(dimension * 4 / bytes_per_vector, 2)
+                }
+
+        logger.info(f"Recall report over {count} vectors: {report['modes']}")
+        return report
+
+
+# Create service instance
+local_vector_store_service = LocalVectorStoreService()
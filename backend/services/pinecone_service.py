@@ -21,7 +21,11 @@ class PineconeService:
         self.api_key = os.getenv("PINECONE_API_KEY", "")
         # Host is not required for the new serverless SDK, but keep for backward compatibility/logging
         self.host = os.getenv("PINECONE_HOST", "")
-        self.embedding_dimension = 384  # all-MiniLM-L6-v2 dimension
+        # Control-plane URL override, e.g. the offline stub (loadtest/pinecone_stub.py) for load tests
+        self.base_url = os.getenv("PINECONE_BASE_URL", "")
+        self.embedding_dimension = 384  # all-MiniLM-L6-v2 dimension (default for generation 1)
+        # Vector generation that query paths read from (see vector_generation_service)
+        self.active_generation = 1
         self._client: Optional[Pinecone] = None
         
         if not self.api_key:
@@ -36,8 +40,13 @@ class PineconeService:
                 if not self.api_key:
                     raise ValueError("PINECONE_API_KEY environment variable not set")
                 
-                self._client = Pinecone(api_key=self.api_key)
-                logger.info("Pinecone client initialized successfully (new SDK)")
+                if self.base_url:
+                    # Index hosts are resolved through describe_index, so data-plane calls follow the override
+                    self._client = Pinecone(api_key=self.api_key, host=self.base_url)
+                    logger.info(f"Pinecone client initialized against PINECONE_BASE_URL {self.base_url}")
+                else:
+                    self._client = Pinecone(api_key=self.api_key)
+                    logger.info("Pinecone client initialized successfully (new SDK)")
             except ImportError:
                 raise ImportError(
                     "pinecone package not installed. Install with: pip install pinecone"
@@ -47,10 +56,11 @@ class PineconeService:
                 raise
         return self._client
     
-    def _get_index_name(self, file_id: int, file_name: str) -> str:
+    def _get_index_name(self, file_id: int, file_name: str, generation: int = 1) -> str:
         """
         Generate a unique index name for a file.
-        Format: kb-file-{file_id}-{sanitized_filename}
+        Format: kb-file-{file_id}-{sanitized_filename} (generation 1)
+                kb-file-{file_id}-g{generation}-{sanitized_filename} (later generations)
         Pinecone requires: lowercase alphanumeric characters and hyphens ONLY (no underscores)
         """
         import re
@@ -77,8 +87,9 @@ class PineconeService:
         if sanitized and sanitized[0].isdigit():
             sanitized = 'file-' + sanitized
         
-        # Build index name: kb-file-{file_id}-{sanitized}
-        index_name = f"kb-file-{file_id}-{sanitized}".lower()
+        # Build index name: kb-file-{file_id}-[g{generation}-]{sanitized}
+        generation_tag = f"g{generation}-" if generation and generation > 1 else ""
+        index_name = f"kb-file-{file_id}-{generation_tag}{sanitized}".lower()
         
         # Final validation: ensure only lowercase alphanumeric and hyphens (NO underscores)
         index_name = re.sub(r'[^a-z0-9-]', '', index_name)
@@ -95,9 +106,9 @@ class PineconeService:
         
         return index_name
     
-    def get_index_name_for_file(self, file_id: int, file_name: str) -> str:
-        """Public helper to get the Pinecone index name for a file"""
-        return self._get_index_name(file_id, file_name)
+    def get_index_name_for_file(self, file_id: int, file_name: str, generation: int = None) -> str:
+        """Public helper to get the Pinecone index name for a file (active generation by default)"""
+        return self._get_index_name(file_id, file_name, generation or self.active_generation)
     
     def index_exists(self, index_name: str) -> bool:
         """Check if a Pinecone index exists using the new SDK"""
@@ -117,7 +128,8 @@ class PineconeService:
         self,
         file_id: int,
         file_name: str,
-        dimension: int = None
+        dimension: int = None,
+        generation: int = None
     ) -> Dict[str, Any]:
         """
         Create a Pinecone index for a specific file.
@@ -126,13 +138,14 @@ class PineconeService:
             file_id: Database ID of the file
             file_name: Original filename
             dimension: Embedding dimension (defaults to 384 for all-MiniLM-L6-v2)
+            generation: Vector generation (defaults to the active one)
             
         Returns:
             Dict with success status and index name
         """
         try:
             client = self._get_client()
-            index_name = self._get_index_name(file_id, file_name)
+            index_name = self.get_index_name_for_file(file_id, file_name, generation)
             dim = dimension or self.embedding_dimension
             
             # Check if index already exists
@@ -197,7 +210,8 @@ class PineconeService:
         file_id: int,
         file_name: str,
         chunks: List[Dict[str, Any]],
-        embeddings: List[List[float]]
+        embeddings: List[List[float]],
+        generation: int = None
     ) -> Dict[str, Any]:
         """
         Index chunks for a file into its Pinecone index.
@@ -207,16 +221,15 @@ class PineconeService:
             file_name: Original filename
             chunks: List of chunk dicts with 'text' and 'metadata'
             embeddings: List of embedding vectors
+            generation: Vector generation (defaults to the active one)
             
         Returns:
-            Dict with success status and count
+            Dict with success status, count and the vector ids written
+            (callers persist chunk text against these ids in the chunk store)
         """
         try:
-            client = self._get_client()
-            index_name = self._get_index_name(file_id, file_name)
-            
-            # Get index (new SDK)
-            index = client.Index(index_name)
+            generation = generation or self.active_generation
+            index_name = self.get_index_name_for_file(file_id, file_name, generation)
             
             # Prepare vectors for upsert
             vectors = []
@@ -224,14 +237,13 @@ class PineconeService:
                 # Create unique ID for chunk
                 chunk_id = f"chunk_{file_id}_{i}"
                 
-                # Prepare metadata (Pinecone requires string values)
-                # Store full chunk text (chunks are 400 chars, so storing full text is fine)
-                chunk_text = chunk.get("text", "")
+                # Keep metadata compact: ids and filter fields only.
+                # Chunk text lives in the document_chunks table (see chunk_store_service)
+                # and is hydrated for the final top-k results at query time.
                 metadata = {
                     "file_id": str(file_id),
-                    "file_name": file_name,
                     "chunk_index": str(chunk.get("metadata", {}).get("chunk_index", i)),
-                    "text": chunk_text  # Store full chunk text (400 chars max)
+                    "generation": str(generation)  # Which embedding model produced this vector
                 }
                 
                 vectors.append({
@@ -240,21 +252,14 @@ class PineconeService:
                     "metadata": metadata
                 })
             
-            # Upsert in batches (Pinecone limit is 100 vectors per request)
-            batch_size = 100
-            total_upserted = 0
-            
-            for i in range(0, len(vectors), batch_size):
-                batch = vectors[i:i + batch_size]
-                index.upsert(vectors=batch)
-                total_upserted += len(batch)
-                logger.info(f"Upserted {total_upserted}/{len(vectors)} vectors to {index_name}")
+            total_upserted = self.upsert_vectors(index_name, vectors)
             
             logger.info(f"Successfully indexed {total_upserted} chunks for file {file_id} ({file_name})")
             return {
                 "success": True,
                 "index_name": index_name,
-                "chunks_indexed": total_upserted
+                "chunks_indexed": total_upserted,
+                "vector_ids": [vector["id"] for vector in vectors]
             }
             
         except Exception as e:
@@ -264,6 +269,54 @@ class PineconeService:
                 "error": str(e)
             }
     
+    def upsert_vectors(self, index_name: str, vectors: List[Dict[str, Any]], batch_size: int = 100) -> int:
+        """
+        Bulk upsert prepared vectors ({id, values, metadata}) into an existing index.
+        
+        Args:
+            index_name: Name of the Pinecone index
+            vectors: Vectors to write
+            batch_size: Vectors per request (Pinecone limit is 100)
+            
+        Returns:
+            Number of vectors upserted
+        """
+        index = self._get_client().Index(index_name)
+        total_upserted = 0
+        
+        for i in range(0, len(vectors), batch_size):
+            batch = vectors[i:i + batch_size]
+            index.upsert(vectors=batch)
+            total_upserted += len(batch)
+            logger.info(f"Upserted {total_upserted}/{len(vectors)} vectors to {index_name}")
+        
+        return total_upserted
+    
+    def fetch_vectors(self, index_name: str, vector_ids: List[str], batch_size: int = 100) -> Dict[str, List[float]]:
+        """
+        Fetch stored vector values by id.
+        
+        Args:
+            index_name: Name of the Pinecone index
+            vector_ids: Ids to fetch
+            batch_size: Ids per request (ids travel in the query string)
+            
+        Returns:
+            Dict mapping vector id to its values (missing ids are omitted)
+        """
+        index = self._get_client().Index(index_name)
+        values = {}
+        
+        for i in range(0, len(vector_ids), batch_size):
+            response = index.fetch(ids=vector_ids[i:i + batch_size])
+            vectors = getattr(response, "vectors", None)
+            if vectors is None:
+                vectors = response.get("vectors", {})
+            for vector_id, vector in vectors.items():
+                values[vector_id] = list(getattr(vector, "values", None) or vector["values"])
+        
+        return values
+    
     def search_across_indexes(
         self,
         query_embedding: List[float],
@@ -304,6 +357,7 @@ class PineconeService:
                             "score": match.get("score", 0.0),
                             "chunk_id": match.get("id", ""),
                             "metadata": match.get("metadata", {}),
+                            # Only legacy vectors carry text; new ones are hydrated from the chunk store
                             "text": match.get("metadata", {}).get("text", "")
                         })
                     
@@ -331,33 +385,47 @@ class PineconeService:
                 "results": []
             }
     
-    def delete_index(self, file_id: int, file_name: str) -> Dict[str, Any]:
+    def delete_index(self, file_id: int, file_name: str, generation: int = None) -> Dict[str, Any]:
         """
         Delete a Pinecone index for a file.
         
         Args:
             file_id: Database ID of the file
             file_name: Original filename
+            generation: Vector generation (defaults to the active one)
+            
+        Returns:
+            Dict with success status
+        """
+        return self.delete_index_by_name(self.get_index_name_for_file(file_id, file_name, generation))
+    
+    def delete_index_by_name(self, index_name: str, check_exists: bool = True) -> Dict[str, Any]:
+        """
+        Delete a Pinecone index by name.
+        
+        Args:
+            index_name: Name of the index
+            check_exists: List indexes first and treat a missing index as success.
+                Callers that already listed the indexes can skip this round trip.
             
         Returns:
             Dict with success status
         """
         try:
             client = self._get_client()
-            index_name = self._get_index_name(file_id, file_name)
             
-            # Check if index exists
-            try:
-                existing_indexes = client.list_indexes().names()
-            except AttributeError:
-                existing_indexes = [idx.name for idx in client.list_indexes()]
-            
-            if index_name not in existing_indexes:
-                logger.info(f"Index {index_name} does not exist, nothing to delete")
-                return {
-                    "success": True,
-                    "message": f"Index {index_name} does not exist"
-                }
+            if check_exists:
+                try:
+                    existing_indexes = client.list_indexes().names()
+                except AttributeError:
+                    existing_indexes = [idx.name for idx in client.list_indexes()]
+                
+                if index_name not in existing_indexes:
+                    logger.info(f"Index {index_name} does not exist, nothing to delete")
+                    return {
+                        "success": True,
+                        "message": f"Index {index_name} does not exist"
+                    }
             
             # Delete index using new SDK pattern
             try:
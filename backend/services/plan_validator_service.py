@@ -0,0 +1,678 @@
+"""
+Plan Validator Service
+Deterministic structure checks for generated sprint plans and risk assessments,
+so the second Gemini validation pass only runs when the first answer is
+actually incomplete.
+
+- Sprint plans: every required section heading is present, and every Product
+  Backlog Item appears in both "Committed Sprint Backlog" and "Detailed Task
+  Breakdown" (matched by its user story summary)
+- Risk assessments: one "Risk ID" entry per risk with all of its fields, a Risk
+  Confidence section, no extra sections and no markdown
+- HTML is parsed with the standard library; markdown headings (`## ...`) and
+  ```html fences are tolerated
+
+It also locates sections for targeted repair: a missing section is spliced in
+at its place in the required order, and missing PB entries are appended to
+their section (as table rows when the section is a table).
+
+Set LOCAL_PLAN_VALIDATION_ENABLED=false to always run the Gemini pass, and
+PLAN_REPAIR_ENABLED=false to regenerate the whole plan instead of repairing it.
+"""
+import os
+import re
+from html.parser import HTMLParser
+from typing import List, Dict, Any, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Required sprint plan sections: heading key phrase -> display name.
+# A heading belongs to the longest key it contains, so "Sprint Confidence
+# Improvement Recommendations" does not also satisfy "Sprint Confidence".
+SPRINT_PLAN_SECTIONS = {
+    "sprint overview": "Sprint Overview",
+    "sprint goal": "Confirmed Sprint Goal",
+    "team capacity": "Team Capacity & Availability",
+    "committed sprint backlog": "Committed Sprint Backlog",
+    "detailed task breakdown": "Detailed Task Breakdown",
+    "definition of done": "Definition of Done (DoD)",
+    "capacity vs committed effort": "Capacity vs. Committed Effort Summary",
+    "risk management": "Risk Management Plan",
+    "collaboration": "Key Collaboration Points & Handoffs",
+    "sprint confidence": "Sprint Confidence",
+    "sprint confidence improvement": "Sprint Confidence Improvement Recommendations"
+}
+
+# Sections that must list every Product Backlog Item
+PB_SECTIONS = ("committed sprint backlog", "detailed task breakdown")
+
+# Fields every risk entry must carry (besides its Risk ID heading)
+RISK_FIELDS = (
+    "Risk Description", "Severity", "Status", "Risk Owner",
+    "Date Identified", "Mitigation Plan", "Relevant Notes"
+)
+
+# Sections the risk validation prompt tells Gemini to remove
+RISK_EXTRA_SECTIONS = (
+    "executive summary", "project overview", "risk categories analysis",
+    "stakeholder assessment", "risk matrix"
+)
+
+# Words of a summary used to find it in the plan (long summaries get shortened)
+SUMMARY_MATCH_WORDS = 8
+# Share of a summary's significant words a row / list item / sub-heading must
+# contain to count as that PB when neither its id nor its summary appears verbatim
+SUMMARY_MATCH_RATIO = 0.6
+SUMMARY_STOPWORDS = frozenset(
+    "a an and as be by can for from i in into is it of on so that the this to "
+    "we will with want able should user users".split()
+)
+
+# PB ids as plans write them (PB-3, PBI 3, US-3, AUTH-001); a task id such as
+# AUTH-001-02 or PB-3.1 counts as its PB
+PB_ID = re.compile(r"\b((?:PBI?|US)[ #-]?\d+|[A-Z][A-Z0-9]{1,9}-\d+)(?:[-.]\d+)*\b")
+
+HEADING_TAGS = {"h1": 1, "h2": 2, "h3": 3, "h4": 4, "h5": 5, "h6": 6}
+MARKDOWN_HEADING = re.compile(r"^[ \t]*(#{1,6})[ \t]+(.+?)[ \t#]*$", re.MULTILINE)
+# Wrapper tags opening a section right before its heading / closing the document
+WRAPPER_OPEN = re.compile(r"(?:<(?:div|section|article)\b[^>]*>\s*)+$", re.IGNORECASE)
+DOCUMENT_CLOSE = re.compile(r"(?:\s*</(?:div|section|article|body|html)>)+\s*$", re.IGNORECASE)
+# Document scaffolding around a fragment: doctype, <head>, <html>/<body> tags and the <h1> title
+DOCUMENT_WRAPPER = re.compile(
+    r"<!DOCTYPE[^>]*>|<head\b.*?</head>|</?(?:html|body)\b[^>]*>|<h1\b.*?</h1>",
+    re.IGNORECASE | re.DOTALL
+)
+TABLE_ROW = re.compile(r"<tr\b.*?</tr>", re.IGNORECASE | re.DOTALL)
+LIST_ITEM = re.compile(r"<li\b.*?</li>", re.IGNORECASE | re.DOTALL)
+
+# Characters of existing plan HTML shown to Gemini as a format example
+STYLE_SAMPLE_CHARS = 1500
+
+
+def normalise(text: str) -> str:
+    """Lower-case words only: '&' -> 'and', punctuation and extra spaces removed"""
+    text = (text or "").lower().replace("&", " and ")
+    return " ".join(re.sub(r"[^a-z0-9]+", " ", text).split())
+
+
+def _canonical_id(pb_id: str) -> str:
+    """'AUTH-001', 'auth 1' and 'AUTH1' are the same id"""
+    compact = re.sub(r"[^A-Z0-9]", "", pb_id.upper())
+    return re.sub(r"(?<=[A-Z])0+(?=\d)", "", compact)
+
+
+def _pb_ids(text: str) -> List[str]:
+    """Canonical PB ids in a text, in order of appearance"""
+    return [_canonical_id(match) for match in PB_ID.findall(text or "")]
+
+
+def _words(text: str) -> set:
+    """Significant words of a text (numbers included), cut to a crude stem ('registrations' ~ 'register')"""
+    return {
+        word[:6] for word in normalise(text).split()
+        if (len(word) > 2 or word.isdigit()) and word not in SUMMARY_STOPWORDS
+    }
+
+
+def _word_score(words: set, text: str) -> float:
+    return len(words & _words(text)) / len(words) if words else 0.0
+
+
+
+
+class _Block:
+    """A heading and the content up to the next heading of any level"""
+
+    def __init__(self, level: int, title: str, start: int = 0):
+        self.level = level
+        self.title = title
+        self.start = start  # offset of the heading's start tag in the cleaned HTML
+        self.text_parts: List[str] = []
+        self.entries: List[str] = []  # text of each table data row and list item
+        self.rows = 0
+
+    @property
+    def text(self) -> str:
+        return "".join(self.text_parts)
+
+
+class _BlockParser(HTMLParser):
+    """Splits an HTML document into heading blocks, collecting their table rows and list items"""
+
+    def __init__(self, content: str):
+        super().__init__(convert_charrefs=True)
+        self.blocks: List[_Block] = [_Block(0, "")]
+        self._line_starts = [0] + [i + 1 for i, char in enumerate(content) if char == "\n"]
+        self._heading_level = 0
+        self._heading_start = 0
+        self._heading_parts: List[str] = []
+        self._row_has_cells = False
+        self._row_parts: Optional[List[str]] = None
+        self._item_parts: List[List[str]] = []  # one per open <li>
+
+    def handle_starttag(self, tag, attrs):
+        if tag in HEADING_TAGS:
+            line, column = self.getpos()
+            self._heading_level = HEADING_TAGS[tag]
+            self._heading_start = self._line_starts[line - 1] + column
+            self._heading_parts = []
+        elif tag == "tr":
+            self._row_has_cells = False
+            self._row_parts = []
+        elif tag == "td":
+            self._row_has_cells = True
+        elif tag == "li":
+            self._item_parts.append([])
+        elif tag in ("p", "br", "div"):
+            self.handle_data("\n")
+
+    def handle_endtag(self, tag):
+        if tag in HEADING_TAGS and self._heading_level:
+            self.blocks.append(_Block(self._heading_level, " ".join("".join(self._heading_parts).split()), self._heading_start))
+            self._heading_level = 0
+        elif tag == "tr":
+            if self._row_has_cells and self._row_parts is not None:
+                self.blocks[-1].rows += 1
+                self.blocks[-1].entries.append(" ".join("".join(self._row_parts).split()))
+            self._row_has_cells = False
+            self._row_parts = None
+        elif tag == "li" and self._item_parts:
+            self.blocks[-1].entries.append(" ".join("".join(self._item_parts.pop()).split()))
+        if tag in ("p", "div", "li", "tr", "td", "th"):
+            self.handle_data("\n")
+
+    def handle_data(self, data):
+        if self._heading_level:
+            self._heading_parts.append(data)
+            return
+        self.blocks[-1].text_parts.append(data)
+        if self._row_parts is not None:
+            self._row_parts.append(data)
+        for parts in self._item_parts:
+            parts.append(data)
+
+
+def clean_html(content: str) -> str:
+    """LLM answer as plain HTML: ```html fences removed, markdown headings turned into <hN> tags"""
+    content = (content or "").strip()
+    content = re.sub(r"^```(?:html)?\s*", "", content, flags=re.IGNORECASE)
+    content = re.sub(r"\s*```\s*$", "", content)
+    return MARKDOWN_HEADING.sub(lambda m: f"<h{len(m.group(1))}>{m.group(2)}</h{len(m.group(1))}>", content)
+
+
+def strip_document(fragment: str) -> str:
+    """Section fragment without the document around it, if Gemini wrote a whole plan page"""
+    return DOCUMENT_WRAPPER.sub("", fragment).strip()
+
+
+def _parse(content: str) -> List[_Block]:
+    """Heading blocks of cleaned HTML"""
+    parser = _BlockParser(content)
+    parser.feed(content)
+    parser.close()
+    return parser.blocks
+
+
+def _nested(blocks: List[_Block], index: int) -> List[_Block]:
+    """Deeper heading blocks under a section"""
+    nested = []
+    for block in blocks[index + 1:]:
+        if block.level <= blocks[index].level:
+            break
+        nested.append(block)
+    return nested
+
+
+def _section_text(blocks: List[_Block], index: int) -> str:
+    """Text of a heading block plus every deeper heading nested under it"""
+    return "".join([blocks[index].text] + [f"\n{block.title}\n{block.text}" for block in _nested(blocks, index)])
+
+
+def _section_entries(blocks: List[_Block], index: int) -> List[str]:
+    """Table rows, list items and sub-headings (with their text) of a section"""
+    entries = list(blocks[index].entries)
+    for block in _nested(blocks, index):
+        entries.append(f"{block.title}\n{block.text}")
+        entries.extend(block.entries)
+    return entries
+
+
+def _entry_ids(entries: List[str]) -> set:
+    """The PB each entry belongs to: its first id (later ids are dependencies and the like)"""
+    return {ids[0] for ids in (_pb_ids(entry) for entry in entries) if ids}
+
+
+def _pb_items(backlog_items: Optional[List[str]]) -> List[Dict[str, Any]]:
+    """Matching keys of each backlog item: a leading id in its summary, its first words and its significant words"""
+    items = []
+    for summary in backlog_items or []:
+        summary = str(summary or "").strip()
+        if normalise(summary) in ("", "n a"):
+            summary = ""
+        leading_id = PB_ID.match(summary)
+        items.append({
+            "label": summary,
+            "ids": {_canonical_id(leading_id.group(1))} if leading_id else set(),
+            "prefix": " ".join(normalise(summary).split()[:SUMMARY_MATCH_WORDS]),
+            "words": _words(summary)
+        })
+    return items
+
+
+def _assign_ids(items: List[Dict[str, Any]], entries: List[str]) -> None:
+    """
+    Give each item the id the plan assigned it: the id of the backlog entry
+    describing it. Best matches are paired first and each id goes to one item,
+    so similar stories ("register with email" / "log in with email") stay apart.
+    """
+    texts: Dict[str, str] = {}
+    for entry in entries:
+        ids = _pb_ids(entry)
+        if ids:
+            texts[ids[0]] = f"{texts.get(ids[0], '')}\n{entry}"
+    taken = {pb_id for item in items for pb_id in item["ids"]}
+    pairs = sorted(
+        ((_word_score(item["words"], text), index, pb_id)
+         for index, item in enumerate(items) if not item["ids"]
+         for pb_id, text in texts.items() if pb_id not in taken),
+        key=lambda pair: -pair[0]
+    )
+    for score, index, pb_id in pairs:
+        if score < SUMMARY_MATCH_RATIO:
+            break
+        if pb_id not in taken and not items[index]["ids"]:
+            items[index]["ids"].add(pb_id)
+            taken.add(pb_id)
+
+
+def _present_items(items: List[Dict[str, Any]], section_ids: set, text: str, entries: List[str]) -> set:
+    """
+    Indexes of the items a section has: by id, else by the summary's first
+    words, else by most of the summary's words in one entry. Entries go to
+    their best-matching item, one each, so near-identical summaries
+    ("Story 2 ..." / "Story 3 ...") cannot all claim the same entry.
+    """
+    padded = f" {normalise(text)} "
+    present = {
+        index for index, item in enumerate(items)
+        if item["ids"] & section_ids or (item["prefix"] and f" {item['prefix']} " in padded)
+    }
+    pairs = sorted(
+        ((_word_score(item["words"], entry), index, position)
+         for index, item in enumerate(items)
+         for position, entry in enumerate(entries or [text])),
+        key=lambda pair: -pair[0]
+    )
+    matched, used = set(), set()
+    for score, index, position in pairs:
+        if score < SUMMARY_MATCH_RATIO:
+            break
+        if index not in matched and position not in used:
+            matched.add(index)
+            used.add(position)
+    return present | matched
+
+
+def _owners(items: List[Dict[str, Any]], text: str) -> List[Dict[str, Any]]:
+    """The items an entry without an id describes: its summary's first words, else the best word match"""
+    padded = f" {normalise(text)} "
+    owners = [item for item in items if item["prefix"] and f" {item['prefix']} " in padded]
+    if owners:
+        return owners
+    scores = [_word_score(item["words"], text) for item in items]
+    best = max(scores, default=0.0)
+    return [item for item, score in zip(items, scores) if score == best] if best >= SUMMARY_MATCH_RATIO else []
+
+
+def _section_index(blocks: List[_Block]) -> Dict[str, int]:
+    """Required section key -> index of its heading block (a heading belongs to the most specific key it names)"""
+    section_index: Dict[str, int] = {}
+    for i, block in enumerate(blocks[1:], start=1):
+        title = normalise(block.title)
+        keys = [key for key in SPRINT_PLAN_SECTIONS if key in title]
+        if keys:
+            section_index.setdefault(max(keys, key=len), i)
+    return section_index
+
+
+def _section_end(blocks: List[_Block], index: int, length: int) -> int:
+    """Offset where a section ends: the next heading of the same or a higher level"""
+    for block in blocks[index + 1:]:
+        if block.level <= blocks[index].level:
+            return block.start
+    return length
+
+
+def _boundary(content: str, position: int) -> int:
+    """Move an insertion point out of the wrapper tags around sections / the document"""
+    if position >= len(content):
+        match = DOCUMENT_CLOSE.search(content)
+        return match.start() if match else len(content)
+    match = WRAPPER_OPEN.search(content[:position])
+    return match.start() if match else position
+
+
+def _text(fragment: str) -> str:
+    """Headings and text of an HTML fragment"""
+    return "\n".join(f"{block.title}\n{block.text}" for block in _parse(fragment))
+
+
+def _heading_pieces(fragment: str) -> List[str]:
+    """A fragment cut before each of its top-level headings (whole when it has none)"""
+    blocks = _parse(fragment)[1:]
+    if not blocks:
+        return [fragment]
+    top = min(block.level for block in blocks)
+    starts = [block.start for block in blocks if block.level == top]
+    pieces = [fragment[:starts[0]]] if fragment[:starts[0]].strip() else []
+    return pieces + [fragment[start:end] for start, end in zip(starts, starts[1:] + [len(fragment)])]
+
+
+def _splice(content: str, position: int, fragment: str) -> str:
+    return f"{content[:position].rstrip()}\n{fragment.strip()}\n{content[position:].lstrip()}"
+
+
+def _structural_count(blocks: List[_Block], index: int, known_ids: set, rows_are_pbs: bool) -> int:
+    """
+    Distinct PBs in a section when there are no summaries to match.
+
+    PBs are counted by id (only ids in known_ids, when given, so task ids are
+    not mistaken for PBs), else by sub-heading. Table rows count only when
+    rows_are_pbs: in a task breakdown, rows are tasks.
+    """
+    ids = _entry_ids(_section_entries(blocks, index))
+    if known_ids:
+        ids &= known_ids
+    if ids:
+        return len(ids)
+    nested = _nested(blocks, index)
+    child_level = min((block.level for block in nested), default=0)
+    subheadings = sum(1 for block in nested if block.level == child_level)
+    if subheadings:
+        return subheadings
+    return blocks[index].rows if rows_are_pbs else 0
+
+
+class PlanValidatorService:
+    """Local completeness checks for generated sprint plans and risk assessments"""
+
+    def __init__(self):
+        self.enabled = os.getenv("LOCAL_PLAN_VALIDATION_ENABLED", "true").lower() == "true"
+        self.repair_enabled = os.getenv("PLAN_REPAIR_ENABLED", "true").lower() == "true"
+        self.stats = {
+            "sprint_plans_checked": 0,
+            "sprint_plans_passed": 0,
+            "sprint_plans_repaired": 0,
+            "sprint_plan_repairs_failed": 0,
+            "risk_assessments_checked": 0,
+            "risk_assessments_passed": 0
+        }
+
+    def validate_sprint_plan(self, plan: str, expected_pb_count: int, backlog_items: Optional[List[str]] = None) -> Dict[str, Any]:
+        """
+        Check that a sprint plan has every required section and lists every PB.
+
+        Args:
+            plan: Generated sprint plan (HTML)
+            expected_pb_count: Number of Product Backlog Items in the user's input
+            backlog_items: User story summaries of those items, in input order
+
+        PBs are matched by id first: an id leading the summary, or the id the
+        plan gave the item in its Committed Sprint Backlog entry (so a task
+        breakdown keyed by PBI id counts). Otherwise the summary's first words,
+        or most of its words within one row / list item / sub-heading, must appear.
+
+        Returns:
+            Dict with valid, missing_sections, pb_counts and missing_pbs (per PB
+            section, when summaries were given) and a list of human-readable issues
+        """
+        blocks = _parse(clean_html(plan))
+        section_index = _section_index(blocks)
+
+        missing_sections = [name for key, name in SPRINT_PLAN_SECTIONS.items() if key not in section_index]
+        issues = [f"Missing section: {name}" for name in missing_sections]
+
+        items = _pb_items(backlog_items)
+        match_items = len(items) >= expected_pb_count and all(item["ids"] or item["words"] for item in items)
+        backlog_index = section_index.get("committed sprint backlog")
+        backlog_entries = _section_entries(blocks, backlog_index) if backlog_index is not None else []
+        if match_items:
+            _assign_ids(items, backlog_entries)
+
+        pb_counts: Dict[str, int] = {}
+        missing_pbs: Dict[str, List[str]] = {}
+        for key in PB_SECTIONS:
+            name = SPRINT_PLAN_SECTIONS[key]
+            if key not in section_index:
+                pb_counts[name] = 0
+                missing_pbs[name] = list(backlog_items or [])
+                continue
+
+            entries = _section_entries(blocks, section_index[key])
+            if match_items:
+                text = _section_text(blocks, section_index[key])
+                section_ids = _entry_ids(entries) if entries else set(_pb_ids(text))
+                present = _present_items(items, section_ids, text, entries)
+                missing = [item["label"] for index, item in enumerate(items) if index not in present]
+                pb_counts[name] = len(items) - len(missing)
+                missing_pbs[name] = missing
+            else:
+                known_ids = _entry_ids(backlog_entries) if key != "committed sprint backlog" else set()
+                pb_counts[name] = _structural_count(blocks, section_index[key], known_ids, key == "committed sprint backlog")
+
+            if pb_counts[name] < expected_pb_count:
+                issues.append(f"{name} lists {pb_counts[name]} of {expected_pb_count} PBs")
+
+        valid = not issues
+        self.stats["sprint_plans_checked"] += 1
+        self.stats["sprint_plans_passed"] += int(valid)
+        return {
+            "valid": valid,
+            "missing_sections": missing_sections,
+            "pb_counts": pb_counts,
+            "missing_pbs": missing_pbs if match_items else {},
+            "expected_pb_count": expected_pb_count,
+            "issues": issues
+        }
+
+    def validate_risk_assessment(self, assessment: str, expected_risk_count: int, risk_ids: Optional[List[str]] = None) -> Dict[str, Any]:
+        """
+        Check that a risk assessment is in the Risk Register format with every risk.
+
+        Args:
+            assessment: Generated risk assessment (HTML)
+            expected_risk_count: Number of risks in the user's input
+            risk_ids: Issue keys of those risks
+
+        Returns:
+            Dict with valid, risk_count, missing_risks (when ids were given) and
+            a list of human-readable issues
+        """
+        blocks = _parse(clean_html(assessment))
+        issues = []
+
+        risk_blocks = [block for block in blocks[1:] if normalise(block.title).startswith("risk id")]
+        for block in risk_blocks:
+            text = block.text.lower()
+            missing_fields = [field for field in RISK_FIELDS if f"{field.lower()}:" not in text]
+            if missing_fields:
+                issues.append(f"{block.title} is missing: {', '.join(missing_fields)}")
+
+        missing_risks = []
+        if risk_ids:
+            # Whole-word match, so PRJ-1 is not found in "Risk ID: PRJ-10"
+            found = [f" {normalise(block.title)} " for block in risk_blocks]
+            missing_risks = [
+                risk_id for risk_id in risk_ids
+                if not any(f" {normalise(risk_id)} " in title for title in found)
+            ]
+            if missing_risks:
+                issues.append(f"Missing risks: {', '.join(missing_risks)}")
+        if len(risk_blocks) < expected_risk_count:
+            issues.append(f"Risk Register lists {len(risk_blocks)} of {expected_risk_count} risks")
+
+        titles = [normalise(block.title) for block in blocks[1:]]
+        if not any("risk confidence" in title for title in titles):
+            issues.append("Missing section: Risk Confidence")
+        for extra in RISK_EXTRA_SECTIONS:
+            if any(title.startswith(extra) for title in titles):
+                issues.append(f"Unexpected section: {extra.title()}")
+        if "**" in assessment:
+            issues.append("Contains markdown formatting")
+
+        valid = not issues
+        self.stats["risk_assessments_checked"] += 1
+        self.stats["risk_assessments_passed"] += int(valid)
+        return {
+            "valid": valid,
+            "risk_count": len(risk_blocks),
+            "missing_risks": missing_risks,
+            "expected_risk_count": expected_risk_count,
+            "issues": issues
+        }
+
+    # ------------------------------------------------------------------
+    # Targeted repair helpers
+    # ------------------------------------------------------------------
+
+    def section_html(self, plan: str, key: str) -> Optional[str]:
+        """HTML of a required section (heading included), or None when the plan lacks it"""
+        content = clean_html(plan)
+        blocks = _parse(content)
+        index = _section_index(blocks).get(key)
+        if index is None:
+            return None
+        return content[blocks[index].start:_section_end(blocks, index, len(content))]
+
+    def has_section(self, plan: str, key: str) -> bool:
+        """Whether the plan has a heading for a required section"""
+        return key in _section_index(_parse(clean_html(plan)))
+
+    def has_heading(self, plan: str, text: str) -> bool:
+        """Whether any heading of the plan names `text` (its first SUMMARY_MATCH_WORDS words)"""
+        needle = " ".join(normalise(text).split()[:SUMMARY_MATCH_WORDS])
+        return any(needle in normalise(block.title) for block in _parse(clean_html(plan))[1:])
+
+    def section_level(self, plan: str) -> int:
+        """Heading level the plan uses for its required sections (2 when it has none)"""
+        blocks = _parse(clean_html(plan))
+        levels = [blocks[index].level for index in _section_index(blocks).values()]
+        return max(set(levels), key=levels.count) if levels else 2
+
+    def style_sample(self, plan: str) -> str:
+        """The start of the plan's first required section, as a format example"""
+        content = clean_html(plan)
+        blocks = _parse(content)
+        index = _section_index(blocks)
+        if not index:
+            return content[:STYLE_SAMPLE_CHARS]
+        first = min(index.values())
+        return content[blocks[first].start:_section_end(blocks, first, len(content))][:STYLE_SAMPLE_CHARS]
+
+    def insert_section(self, plan: str, key: str, fragment: str) -> str:
+        """
+        Splice a generated section into the plan at its place in the required order.
+
+        Args:
+            plan: Sprint plan (HTML) that lacks the section
+            key: Key of the section in SPRINT_PLAN_SECTIONS
+            fragment: HTML of the section, heading included
+
+        Returns:
+            The plan with the section inserted after the closest preceding
+            required section (or before the closest following one)
+        """
+        content = clean_html(plan)
+        blocks = _parse(content)
+        index = _section_index(blocks)
+        order = list(SPRINT_PLAN_SECTIONS)
+        position = order.index(key)
+
+        for previous in reversed(order[:position]):
+            if previous in index:
+                return _splice(content, _boundary(content, _section_end(blocks, index[previous], len(content))), fragment)
+        for following in order[position + 1:]:
+            if following in index:
+                return _splice(content, _boundary(content, blocks[index[following]].start), fragment)
+        return _splice(content, _boundary(content, len(content)), fragment)
+
+    def insert_entries(self, plan: str, key: str, fragment: str, backlog_items: Optional[List[str]] = None) -> str:
+        """
+        Append generated PB entries to an existing section.
+
+        Table rows in the fragment go into the section's last table (before
+        </tbody> or </table>), list items into its last list when the fragment
+        has no headings; anything else goes at the end of the section. Entries
+        for PBs the section already has (same id, or same summary) are dropped.
+
+        Args:
+            plan: Sprint plan (HTML)
+            key: Key of the section in SPRINT_PLAN_SECTIONS
+            fragment: HTML of the missing entries
+            backlog_items: User story summaries of the Product Backlog Items
+
+        Returns:
+            The plan with the new entries inserted (unchanged when the section is missing)
+        """
+        content = clean_html(plan)
+        blocks = _parse(content)
+        section_index = _section_index(blocks)
+        index = section_index.get(key)
+        if index is None:
+            return content
+        start = blocks[index].start
+        end = _section_end(blocks, index, len(content))
+        span = content[start:end].lower()
+
+        rows = [row for row in TABLE_ROW.findall(fragment) if "<td" in row.lower()]
+        list_items = LIST_ITEM.findall(fragment)
+        table_close = span.rfind("</table>")
+        list_close = max(span.rfind("</ul>"), span.rfind("</ol>"))
+        if rows and table_close >= 0:
+            body_close = span.rfind("</tbody>", 0, table_close)
+            position, pieces = start + (body_close if body_close >= 0 else table_close), rows
+        elif list_items and list_close >= 0 and len(_parse(fragment)) == 1:
+            position, pieces = start + list_close, list_items
+        else:
+            position, pieces = _boundary(content, end), _heading_pieces(fragment)
+
+        items = _pb_items(backlog_items)
+        backlog_index = section_index.get("committed sprint backlog")
+        if backlog_index is not None:
+            _assign_ids(items, _section_entries(blocks, backlog_index))
+        entries = _section_entries(blocks, index)
+        text = _section_text(blocks, index)
+        section_ids = _entry_ids(entries) if entries else set(_pb_ids(text))
+
+        present = [item for index, item in enumerate(items) if index in _present_items(items, section_ids, text, entries)]
+        new = [piece for piece in pieces if not self._duplicate(piece, items, present, section_ids)]
+        if len(new) < len(pieces):
+            logger.info(f"{SPRINT_PLAN_SECTIONS[key]}: dropped {len(pieces) - len(new)} generated entries for PBs already in the plan")
+        if not new:
+            return content
+        return _splice(content, position, "\n".join(new))
+
+    @staticmethod
+    def _duplicate(piece: str, items: List[Dict[str, Any]], present: List[Dict[str, Any]], section_ids: set) -> bool:
+        """Whether a generated entry is for a PB the section already has (by its id, else by its summary)"""
+        piece_text = _text(piece)
+        ids = _pb_ids(piece_text)
+        if ids:
+            if ids[0] in section_ids:
+                return True
+            owners = [item for item in items if ids[0] in item["ids"]]
+        else:
+            owners = _owners(items, piece_text)
+        return any(owner is item for owner in owners for item in present)
+
+    def record_repair(self, success: bool) -> None:
+        self.stats["sprint_plans_repaired" if success else "sprint_plan_repairs_failed"] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Checks run, how many skipped the Gemini validation pass, and targeted repairs"""
+        return {"enabled": self.enabled, "repair_enabled": self.repair_enabled, **self.stats}
+
+
+# Create service instance
+plan_validator_service = PlanValidatorService()
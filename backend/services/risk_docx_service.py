@@ -10,7 +10,7 @@ class RiskDocxService:
     def __init__(self):
         pass
     
-    def parse_docx_file(self, file_content: bytes) -> Dict[str, Any]:
+    async def parse_docx_file(self, file_content: bytes) -> Dict[str, Any]:
         """Parse risk assessment DOCX file and extract structured data using LLM"""
         try:
             # Extract raw text from DOCX
@@ -23,7 +23,7 @@ class RiskDocxService:
                 }
             
             # Use LLM to convert unstructured text to structured format
-            structured_data = self._convert_to_structured_format(raw_text)
+            structured_data = await self._convert_to_structured_format(raw_text)
             
             if structured_data['success']:
                 return {
@@ -69,7 +69,7 @@ class RiskDocxService:
         except Exception as e:
             raise Exception(f"Error extracting text from document: {str(e)}")
     
-    def _convert_to_structured_format(self, raw_text: str) -> Dict[str, Any]:
+    async def _convert_to_structured_format(self, raw_text: str) -> Dict[str, Any]:
         """Use LLM to convert unstructured text to structured format"""
         try:
             # Create a comprehensive prompt for the LLM
@@ -87,7 +87,8 @@ class RiskDocxService:
                 }
             ]
             
-            result = gemini_service.chat(messages, max_tokens=4000)
+            # Extraction to JSON: no creativity wanted
+            result = await gemini_service.chat(messages, max_tokens=4000, temperature=0.0, cache=True, call_site="risk_docx_parse")
             
             if not result['success']:
                 return {
@@ -98,7 +98,7 @@ class RiskAssessmentService:
                 is_complete=False
             )
     
-    def finish_risk_assessment(self, request: RiskAssessmentFinishRequest, db: Session, prompt_data: str = None) -> RiskAssessmentFinishResponse:
+    async def finish_risk_assessment(self, request: RiskAssessmentFinishRequest, db: Session, prompt_data: str = None) -> RiskAssessmentFinishResponse:
         """Complete risk assessment and get summary"""
         try:
             # Get risk assessment session
@@ -115,7 +115,7 @@ class RiskAssessmentService:
             session_data["completed_at"] = datetime.now()
             
             # Get Gemini summary using stored prompt data from database
-            gemini_response = llm_service.generate_risk_assessment(session_data["responses"], prompt_data)
+            gemini_response = await llm_service.generate_risk_assessment(session_data["responses"], prompt_data)
             
             # Store summary in session
             session_data["summary"] = gemini_response["summary"]
@@ -98,7 +98,7 @@ class SprintService:
                 is_complete=False
             )
     
-    def finish_sprint_planning(self, request: SprintFinishRequest, db: Session) -> SprintFinishResponse:
+    async def finish_sprint_planning(self, request: SprintFinishRequest, db: Session) -> SprintFinishResponse:
         """Complete planning and get summary"""
         try:
             # Get sprint session
@@ -115,7 +115,7 @@ class SprintService:
             session_data["completed_at"] = datetime.now()
             
             # Get Gemini summary using stored prompt data
-            gemini_response = llm_service.generate_sprint_plan(session_data["responses"])
+            gemini_response = await llm_service.generate_sprint_plan(session_data["responses"])
             
             # Store summary in session
             session_data["summary"] = gemini_response["summary"]
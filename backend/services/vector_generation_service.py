@@ -0,0 +1,434 @@
+"""
+Vector Generation Service
+Versioned vector collections for blue/green re-embedding.
+
+Every generation is tagged with the embedding provider, model and dimension that
+produced it, and owns its own set of per-file Pinecone indexes
+(kb-file-{id}-g{generation}-...). Queries always use the active generation.
+When the configured embedding model changes, a background job builds a new
+generation while queries keep hitting the old one; once every file has been
+re-embedded the new generation is activated in a single transaction.
+
+The old generation is only marked retired: other workers keep querying it until
+their next refresh (VECTOR_GENERATION_REFRESH_SECONDS), so its indexes are
+garbage-collected by a later sweep, once VECTOR_GENERATION_GC_GRACE_SECONDS have
+passed since it was retired. A build whose heartbeat is older than
+VECTOR_GENERATION_STALE_SECONDS (its process died) is marked failed and
+collected the same way, so a new re-embed can start.
+"""
+import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import List, Dict, Any, Optional
+import logging
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from models import VectorGeneration
+from .embedding_service import EmbeddingService, embedding_service
+from .pinecone_service import pinecone_service
+
+logger = logging.getLogger(__name__)
+
+
+class VectorGenerationService:
+    """Service for managing embedding-model generations of the vector store"""
+
+    def __init__(self):
+        # Other workers may activate a generation; re-read the DB this often
+        self.refresh_seconds = int(os.getenv("VECTOR_GENERATION_REFRESH_SECONDS", "30"))
+        # Start re-embedding automatically when EMBEDDING_PROVIDER/EMBEDDING_MODEL_NAME change
+        self.auto_reembed = os.getenv("VECTOR_AUTO_REEMBED", "false").lower() == "true"
+        self.gc_workers = int(os.getenv("RECONCILE_MAX_WORKERS", "8"))
+        # Retired indexes outlive the refresh interval of every worker before they are deleted
+        self.gc_grace_seconds = max(
+            int(os.getenv("VECTOR_GENERATION_GC_GRACE_SECONDS", str(self.refresh_seconds * 4))),
+            self.refresh_seconds * 2
+        )
+        # A building generation whose heartbeat is older than this lost its build job
+        self.stale_seconds = int(os.getenv("VECTOR_GENERATION_STALE_SECONDS", "900"))
+
+        self._lock = threading.Lock()
+        self._active: Optional[Dict[str, Any]] = None
+        self._building: Optional[Dict[str, Any]] = None
+        self._builders: Dict[int, EmbeddingService] = {}
+        self._refreshed_at = 0.0
+        self._build_thread: Optional[threading.Thread] = None
+
+    @staticmethod
+    def _as_dict(generation: VectorGeneration) -> Dict[str, Any]:
+        return {
+            "id": generation.id,
+            "provider": generation.provider,
+            "model_name": generation.model_name,
+            "dimension": generation.dimension,
+            "status": generation.status,
+            "total_files": generation.total_files,
+            "indexed_files": generation.indexed_files,
+            "error": generation.error,
+            "created_at": generation.created_at.isoformat() if generation.created_at else None,
+            "activated_at": generation.activated_at.isoformat() if generation.activated_at else None,
+            "retired_at": generation.retired_at.isoformat() if generation.retired_at else None
+        }
+
+    @staticmethod
+    def _age_seconds(moment: Optional[datetime]) -> float:
+        """Seconds since a timestamp (naive ones are UTC); infinite when unset"""
+        if moment is None:
+            return float("inf")
+        if moment.tzinfo is None:
+            moment = moment.replace(tzinfo=timezone.utc)
+        return (datetime.now(timezone.utc) - moment).total_seconds()
+
+    @staticmethod
+    def configured_signature() -> Dict[str, str]:
+        """Provider/model requested by the environment"""
+        return {
+            "provider": os.getenv("EMBEDDING_PROVIDER", "local").lower(),
+            "model_name": os.getenv("EMBEDDING_MODEL_NAME", "all-MiniLM-L6-v2")
+        }
+
+    def initialize(self, db: Session) -> Dict[str, Any]:
+        """
+        Make sure an active generation exists and point queries at it.
+
+        The first run records the current configuration as generation 1 (the
+        existing kb-file-{id}-... indexes). If the configured model differs from
+        the active generation, queries keep using the active model and a
+        re-embed is started when VECTOR_AUTO_REEMBED is enabled. A build left
+        behind by a process that died is marked failed first.
+        """
+        active = db.query(VectorGeneration).filter(VectorGeneration.status == "active").first()
+        if active is None:
+            signature = self.configured_signature()
+            bootstrap = EmbeddingService(signature["provider"], signature["model_name"])
+            active = VectorGeneration(
+                id=1,
+                provider=signature["provider"],
+                model_name=signature["model_name"],
+                dimension=bootstrap.get_embedding_dimension(),
+                status="active",
+                activated_at=datetime.utcnow()
+            )
+            db.add(active)
+            db.commit()
+            embedding_service.adopt(bootstrap)
+            logger.info(f"Recorded generation 1: {active.provider}/{active.model_name} ({active.dimension}d)")
+
+        self.fail_stale_build(db)
+        self.refresh(db, force=True)
+
+        signature = self.configured_signature()
+        if (signature["provider"], signature["model_name"]) != (active.provider, active.model_name):
+            logger.warning(
+                f"Configured embedding model {signature['provider']}/{signature['model_name']} differs from active "
+                f"generation {active.id} ({active.provider}/{active.model_name}); queries keep using generation {active.id}"
+            )
+            if self.auto_reembed and self._building is None:
+                self.start_reembed(db, signature["provider"], signature["model_name"])
+
+        return self._active
+
+    def refresh(self, db: Session, force: bool = False) -> Optional[Dict[str, Any]]:
+        """Re-read active/building generations (at most every refresh_seconds) and apply them"""
+        if not force and self._active is not None and time.time() - self._refreshed_at < self.refresh_seconds:
+            return self._active
+
+        try:
+            active = db.query(VectorGeneration).filter(VectorGeneration.status == "active").first()
+            building = db.query(VectorGeneration).filter(VectorGeneration.status == "building").first()
+        except Exception as e:
+            logger.error(f"Failed to read vector generations: {str(e)}")
+            return self._active
+
+        with self._lock:
+            self._refreshed_at = time.time()
+            self._building = self._as_dict(building) if building else None
+            if active is None:
+                return self._active
+            self._activate_locally(self._as_dict(active))
+            return self._active
+
+    def _activate_locally(self, active: Dict[str, Any]) -> None:
+        """Point this process's query path at a generation (caller holds the lock)"""
+        changed = self._active is None or self._active["id"] != active["id"]
+        self._active = active
+        pinecone_service.active_generation = active["id"]
+        pinecone_service.embedding_dimension = active["dimension"]
+        if changed:
+            builder = self._builders.pop(active["id"], None)
+            if builder is not None and builder.model_name == active["model_name"]:
+                embedding_service.adopt(builder)
+            else:
+                embedding_service.configure(active["provider"], active["model_name"])
+            logger.info(f"Queries now use generation {active['id']} ({active['provider']}/{active['model_name']})")
+
+    def _embedder_for(self, generation: Dict[str, Any]) -> EmbeddingService:
+        if self._active is not None and generation["id"] == self._active["id"]:
+            return embedding_service
+        builder = self._builders.get(generation["id"])
+        if builder is None:
+            builder = EmbeddingService(generation["provider"], generation["model_name"])
+            self._builders[generation["id"]] = builder
+        return builder
+
+    def write_targets(self, db: Session) -> List[Dict[str, Any]]:
+        """
+        Generations new vectors must be written to: the active one, plus the one
+        being built so files uploaded during a re-embed are not missing after the switch.
+        Each target carries 'generation', 'dimension' and 'embedder'.
+        """
+        self.refresh(db)
+        targets = []
+        for generation in (self._active, self._building):
+            if generation is None:
+                continue
+            targets.append({
+                "generation": generation["id"],
+                "dimension": generation["dimension"],
+                "embedder": self._embedder_for(generation)
+            })
+        if not targets:
+            # Generations not initialised (e.g. table missing); behave like before
+            targets.append({
+                "generation": pinecone_service.active_generation,
+                "dimension": pinecone_service.embedding_dimension,
+                "embedder": embedding_service
+            })
+        return targets
+
+    def live_generations(self, db: Session) -> List[int]:
+        """Generations whose indexes must be kept (active and building)"""
+        return [target["generation"] for target in self.write_targets(db)]
+
+    def fail_stale_build(self, db: Session) -> Optional[int]:
+        """
+        Mark a building generation failed when no build job is alive for it.
+
+        The build thread bumps heartbeat_at after every file; when this process
+        is not running it and the heartbeat is older than stale_seconds, the
+        process that was has died. Its partial indexes are collected by the
+        retired-generation sweep.
+
+        Returns:
+            The id of the generation marked failed, or None
+        """
+        building = db.query(VectorGeneration).filter(VectorGeneration.status == "building").first()
+        if building is None:
+            return None
+        if self._build_thread is not None and self._build_thread.is_alive():
+            return None
+        if self._age_seconds(building.heartbeat_at or building.created_at) < self.stale_seconds:
+            return None
+
+        building.status = "failed"
+        building.error = f"Build stopped (no heartbeat for {self.stale_seconds}s; its process probably restarted)"
+        building.retired_at = datetime.utcnow()
+        db.commit()
+        with self._lock:
+            self._building = None
+            self._builders.pop(building.id, None)
+        logger.warning(f"Generation {building.id} was left building by a dead process; marked failed")
+        return building.id
+
+    def list_generations(self, db: Session) -> List[Dict[str, Any]]:
+        generations = db.query(VectorGeneration).order_by(VectorGeneration.id.desc()).all()
+        return [self._as_dict(g) for g in generations]
+
+    def start_reembed(self, db: Session, provider: str = None, model_name: str = None) -> Dict[str, Any]:
+        """
+        Create a new generation for provider/model and build it in the background.
+
+        Returns:
+            Dict with success status and the new generation (or an error)
+        """
+        signature = self.configured_signature()
+        provider = (provider or signature["provider"]).lower()
+        model_name = model_name or signature["model_name"]
+
+        self.fail_stale_build(db)
+        self.refresh(db, force=True)
+        if self._building is not None:
+            return {"success": False, "error": f"Generation {self._building['id']} is already being built"}
+        if self._active and (self._active["provider"], self._active["model_name"]) == (provider, model_name):
+            return {"success": False, "error": f"Generation {self._active['id']} already uses {provider}/{model_name}"}
+
+        builder = EmbeddingService(provider, model_name)
+        dimension = builder.get_embedding_dimension()
+        next_id = (db.query(func.max(VectorGeneration.id)).scalar() or 0) + 1
+        generation = VectorGeneration(
+            id=next_id,
+            provider=provider,
+            model_name=model_name,
+            dimension=dimension,
+            status="building",
+            heartbeat_at=datetime.utcnow()
+        )
+        db.add(generation)
+        db.commit()
+
+        with self._lock:
+            self._builders[next_id] = builder
+            self._building = self._as_dict(generation)
+
+        self._build_thread = threading.Thread(target=self._build, args=(next_id,), daemon=True)
+        self._build_thread.start()
+        logger.info(f"Started building generation {next_id}: {provider}/{model_name} ({dimension}d)")
+        return {"success": True, "generation": self._as_dict(generation)}
+
+    def _build(self, generation_id: int) -> None:
+        """Background job: re-embed every file into the new generation, then switch"""
+        from database import SessionLocal
+        from .indexing_service import indexing_service
+
+        db = SessionLocal()
+        try:
+            generation = db.query(VectorGeneration).filter(VectorGeneration.id == generation_id).first()
+            target = {
+                "generation": generation.id,
+                "dimension": generation.dimension,
+                "embedder": self._embedder_for(self._as_dict(generation))
+            }
+
+            files = indexing_service.expected_files(db)
+            generation.total_files = len(files)
+            generation.indexed_files = 0
+            generation.heartbeat_at = datetime.utcnow()
+            db.commit()
+
+            errors = []
+            for entry in files:
+                # Abort if the generation was cancelled/replaced meanwhile
+                db.refresh(generation)
+                if generation.status != "building":
+                    logger.info(f"Generation {generation_id} is no longer building ({generation.status}), stopping")
+                    return
+                try:
+                    result = indexing_service.rebuild_file(db, entry, targets=[target])
+                except Exception as e:
+                    result = {"success": False, "error": str(e)}
+                if result.get("success"):
+                    generation.indexed_files += 1
+                else:
+                    errors.append(f"{entry['file_name']}: {result.get('error')}")
+                generation.heartbeat_at = datetime.utcnow()
+                db.commit()
+
+            if errors:
+                generation.status = "failed"
+                generation.error = "; ".join(errors)[:4000]
+                generation.retired_at = datetime.utcnow()
+                db.commit()
+                logger.error(f"Generation {generation_id} failed for {len(errors)} file(s); generation stays on the old model")
+                return
+
+            self.activate(db, generation_id)
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Building generation {generation_id} failed: {str(e)}")
+            try:
+                db.query(VectorGeneration).filter(VectorGeneration.id == generation_id).update(
+                    {"status": "failed", "error": str(e)[:4000], "retired_at": datetime.utcnow()}
+                )
+                db.commit()
+            except Exception:
+                db.rollback()
+        finally:
+            db.close()
+
+    def activate(self, db: Session, generation_id: int) -> Dict[str, Any]:
+        """
+        Atomically make a generation active and retire the previous one.
+
+        The retired generation's indexes are left in place: workers that have
+        not refreshed yet still query them. collect_retired deletes them later.
+        """
+        try:
+            previous = db.query(VectorGeneration).filter(VectorGeneration.status == "active").all()
+            generation = db.query(VectorGeneration).filter(VectorGeneration.id == generation_id).first()
+            if generation is None:
+                return {"success": False, "error": f"Generation {generation_id} not found"}
+            for old in previous:
+                old.status = "retired"
+                old.retired_at = datetime.utcnow()
+            generation.status = "active"
+            generation.activated_at = datetime.utcnow()
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            return {"success": False, "error": str(e)}
+
+        with self._lock:
+            self._building = None
+            self._activate_locally(self._as_dict(generation))
+
+        logger.info(
+            f"Activated generation {generation_id}; previous generation(s) {[old.id for old in previous]} "
+            f"are collected after {self.gc_grace_seconds}s"
+        )
+        return {"success": True, "generation": self._as_dict(generation)}
+
+    def retained_generations(self, db: Session) -> List[int]:
+        """Retired/failed generations whose indexes still exist (left to collect_retired, not the reconciler)"""
+        return [
+            generation_id for (generation_id,) in
+            db.query(VectorGeneration.id).filter(VectorGeneration.status.in_(("retired", "failed"))).all()
+        ]
+
+    def collect_retired(self, db: Session) -> Dict[str, Any]:
+        """
+        Sweep: garbage-collect retired and failed generations whose grace period
+        (gc_grace_seconds since retired_at) has passed, so no worker still queries
+        or writes them.
+
+        Returns:
+            Dict with success status and the ids of the generations collected
+        """
+        self.fail_stale_build(db)
+        due = [
+            generation.id for generation in
+            db.query(VectorGeneration).filter(VectorGeneration.status.in_(("retired", "failed"))).all()
+            if self._age_seconds(generation.retired_at) >= self.gc_grace_seconds
+        ]
+        for generation_id in due:
+            self.collect_garbage(db, generation_id)
+        return {"success": True, "collected": due}
+
+    def collect_garbage(self, db: Session, generation_id: int) -> Dict[str, Any]:
+        """Delete all indexes (and chunk-store rows/centroids) of a retired or failed generation"""
+        from .indexing_service import indexing_service
+
+        generation = db.query(VectorGeneration).filter(VectorGeneration.id == generation_id).first()
+        if generation is None or generation.status in ("active", "building"):
+            return {"success": False, "error": f"Generation {generation_id} is not retired"}
+
+        existing = set(pinecone_service.list_indexes())
+        index_names = [
+            name for name in (
+                pinecone_service.get_index_name_for_file(entry["file_id"], entry["file_name"], generation_id)
+                for entry in indexing_service.expected_files(db, include_inactive=True)
+            )
+            if name in existing
+        ]
+
+        with ThreadPoolExecutor(max_workers=self.gc_workers) as executor:
+            results = list(executor.map(
+                lambda name: pinecone_service.delete_index_by_name(name, check_exists=False),
+                index_names
+            ))
+        for name in index_names:
+            indexing_service.forget_index(db, name)
+
+        deleted = sum(1 for r in results if r.get("success"))
+        if deleted == len(index_names):
+            generation.status = "deleted"
+            db.commit()
+        logger.info(f"Garbage-collected generation {generation_id}: deleted {deleted}/{len(index_names)} indexes")
+        return {"success": True, "deleted_count": deleted, "index_count": len(index_names)}
+
+
+# Create service instance
+vector_generation_service = VectorGenerationService()
@@ -0,0 +1,305 @@
+"""
+Vector Snapshot Service
+Exports the active vector generation (vectors, ids and chunk metadata) to a
+compact columnar snapshot file and bulk-restores it, so a fresh environment is
+searchable without re-extracting and re-embedding every file.
+
+Snapshot layout (.npz, no pickled objects):
+- vectors:      (num_chunks, dimension) float16 or float32
+- offsets:      (num_indexes + 1,) int64, rows of index i are offsets[i]:offsets[i+1]
+- chunk_index / chunk_start / chunk_end: (num_chunks,) int32 (-1 = unknown offset)
+- manifest:     uint8 UTF-8 JSON with the embedding model, per-index file ids/names,
+                and per-chunk vector ids and text
+"""
+import os
+import json
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import List, Dict, Any
+import logging
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from models import DocumentChunk
+from .pinecone_service import pinecone_service
+from .embedding_service import embedding_service
+from .chunk_store_service import chunk_store_service
+from .file_centroid_service import file_centroid_service
+from .local_vector_store_service import local_vector_store_service
+from .indexing_service import indexing_service
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_FORMAT_VERSION = 1
+
+
+class VectorSnapshotService:
+    """Service for exporting and restoring vector index snapshots"""
+
+    def __init__(self):
+        self.snapshot_dir = os.getenv("VECTOR_SNAPSHOT_DIR", "snapshots")
+        # float16 halves the file size; cosine rankings are practically unchanged
+        self.dtype = os.getenv("VECTOR_SNAPSHOT_DTYPE", "float16").lower()
+        self.max_workers = int(os.getenv("RECONCILE_MAX_WORKERS", "8"))
+
+    def _resolve_path(self, file_name: str = None) -> str:
+        if not file_name:
+            file_name = f"vectors-{datetime.utcnow().strftime('%Y%m%d-%H%M%S')}.npz"
+        os.makedirs(self.snapshot_dir, exist_ok=True)
+        return os.path.join(self.snapshot_dir, os.path.basename(file_name))
+
+    def list_snapshots(self) -> List[Dict[str, Any]]:
+        if not os.path.isdir(self.snapshot_dir):
+            return []
+        snapshots = []
+        for name in sorted(os.listdir(self.snapshot_dir), reverse=True):
+            if name.endswith(".npz"):
+                path = os.path.join(self.snapshot_dir, name)
+                snapshots.append({"file_name": name, "size_bytes": os.path.getsize(path)})
+        return snapshots
+
+    def _load_chunk_rows(self, db: Session, index_names: List[str]) -> Dict[str, List[Any]]:
+        rows = db.query(
+            DocumentChunk.index_name, DocumentChunk.vector_id, DocumentChunk.file_id, DocumentChunk.file_name,
+            DocumentChunk.chunk_index, DocumentChunk.chunk_start, DocumentChunk.chunk_end, DocumentChunk.text
+        ).filter(DocumentChunk.index_name.in_(index_names)).order_by(
+            DocumentChunk.index_name, DocumentChunk.chunk_index
+        ).all()
+        by_index: Dict[str, List[Any]] = {}
+        for row in rows:
+            by_index.setdefault(row.index_name, []).append(row)
+        return by_index
+
+    def export_snapshot(self, db: Session, file_name: str = None) -> Dict[str, Any]:
+        """
+        Dump every index of the active generation to a snapshot file.
+
+        Vectors are fetched from Pinecone by the ids recorded in the chunk store;
+        indexes without chunk-store rows (indexed before it existed) are skipped
+        and listed in the result.
+
+        Args:
+            db: Database session
+            file_name: Snapshot file name in VECTOR_SNAPSHOT_DIR
+
+        Returns:
+            Dict with success status, path, counts and skipped indexes
+        """
+        try:
+            existing = set(pinecone_service.list_indexes())
+            files = indexing_service.expected_files(db)
+            index_files = {
+                pinecone_service.get_index_name_for_file(entry["file_id"], entry["file_name"]): entry
+                for entry in files
+            }
+            index_names = sorted(name for name in index_files if name in existing)
+            chunk_rows = self._load_chunk_rows(db, index_names)
+
+            skipped = [name for name in index_names if name not in chunk_rows]
+            index_names = [name for name in index_names if name in chunk_rows]
+
+            # Pinecone fetches are network-bound; run them in parallel
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                fetched = list(executor.map(
+                    lambda name: pinecone_service.fetch_vectors(name, [r.vector_id for r in chunk_rows[name]]),
+                    index_names
+                ))
+
+            dtype = np.float16 if self.dtype == "float16" else np.float32
+            vectors, offsets, starts, ends, chunk_indexes = [], [0], [], [], []
+            manifest_indexes = []
+            for index_name, values in zip(index_names, fetched):
+                rows = [r for r in chunk_rows[index_name] if r.vector_id in values]
+                if not rows:
+                    skipped.append(index_name)
+                    continue
+                vectors.extend(values[r.vector_id] for r in rows)
+                offsets.append(offsets[-1] + len(rows))
+                chunk_indexes.extend(r.chunk_index for r in rows)
+                starts.extend(-1 if r.chunk_start is None else r.chunk_start for r in rows)
+                ends.extend(-1 if r.chunk_end is None else r.chunk_end for r in rows)
+                manifest_indexes.append({
+                    "index_name": index_name,
+                    "file_id": rows[0].file_id,
+                    "file_name": rows[0].file_name,
+                    "vector_ids": [r.vector_id for r in rows],
+                    "texts": [r.text for r in rows]
+                })
+
+            dimension = len(vectors[0]) if vectors else pinecone_service.embedding_dimension
+            manifest = {
+                "format_version": SNAPSHOT_FORMAT_VERSION,
+                "created_at": datetime.utcnow().isoformat(),
+                "provider": embedding_service.provider,
+                "model_name": embedding_service.model_name,
+                "dimension": dimension,
+                "dtype": np.dtype(dtype).name,
+                "indexes": manifest_indexes
+            }
+
+            path = self._resolve_path(file_name)
+            np.savez_compressed(
+                path,
+                vectors=np.asarray(vectors, dtype=dtype).reshape(len(vectors), dimension),
+                offsets=np.asarray(offsets, dtype=np.int64),
+                chunk_index=np.asarray(chunk_indexes, dtype=np.int32),
+                chunk_start=np.asarray(starts, dtype=np.int32),
+                chunk_end=np.asarray(ends, dtype=np.int32),
+                manifest=np.frombuffer(json.dumps(manifest).encode("utf-8"), dtype=np.uint8)
+            )
+
+            logger.info(f"Exported {len(vectors)} vectors from {len(manifest_indexes)} indexes to {path}")
+            return {
+                "success": True,
+                "path": path,
+                "index_count": len(manifest_indexes),
+                "vector_count": len(vectors),
+                "size_bytes": os.path.getsize(path),
+                "skipped": skipped
+            }
+        except Exception as e:
+            logger.error(f"Failed to export vector snapshot: {str(e)}")
+            return {
+                "success": False,
+                "error": str(e)
+            }
+
+    def import_snapshot(self, db: Session, file_name: str, skip_existing: bool = True) -> Dict[str, Any]:
+        """
+        Bulk-load a snapshot into the active generation: create each index, upsert
+        its vectors, and restore chunk-store rows and file centroids. No text is
+        re-embedded. With VECTOR_BACKEND=local the vectors are written to the
+        local quantized store instead of Pinecone.
+
+        Args:
+            db: Database session
+            file_name: Snapshot file name in VECTOR_SNAPSHOT_DIR
+            skip_existing: Leave indexes that already exist untouched
+
+        Returns:
+            Dict with success status and restored/skipped counts
+        """
+        try:
+            path = self._resolve_path(file_name)
+            with np.load(path, allow_pickle=False) as snapshot:
+                manifest = json.loads(snapshot["manifest"].tobytes().decode("utf-8"))
+                vectors = snapshot["vectors"].astype(np.float32)
+                offsets = snapshot["offsets"]
+                chunk_index = snapshot["chunk_index"]
+                chunk_start = snapshot["chunk_start"]
+                chunk_end = snapshot["chunk_end"]
+
+            if manifest.get("format_version") != SNAPSHOT_FORMAT_VERSION:
+                return {"success": False, "error": f"Unsupported snapshot format {manifest.get('format_version')}"}
+            if (manifest["provider"], manifest["model_name"]) != (embedding_service.provider, embedding_service.model_name):
+                return {
+                    "success": False,
+                    "error": (
+                        f"Snapshot was embedded with {manifest['provider']}/{manifest['model_name']}, "
+                        f"active model is {embedding_service.provider}/{embedding_service.model_name}"
+                    )
+                }
+
+            backend = local_vector_store_service if local_vector_store_service.enabled else pinecone_service
+            existing = set(backend.list_indexes()) if skip_existing else set()
+            entries = []
+            for i, entry in enumerate(manifest["indexes"]):
+                index_name = pinecone_service.get_index_name_for_file(entry["file_id"], entry["file_name"])
+                if index_name in existing:
+                    continue
+                entries.append((i, entry))
+
+            def metadata_for(entry, row):
+                return {
+                    "file_id": str(entry["file_id"]),
+                    "chunk_index": str(int(chunk_index[row])),
+                    "generation": str(pinecone_service.active_generation)
+                }
+
+            def restore_vectors(item):
+                i, entry = item
+                start, end = int(offsets[i]), int(offsets[i + 1])
+                if local_vector_store_service.enabled:
+                    index_name = pinecone_service.get_index_name_for_file(entry["file_id"], entry["file_name"])
+                    local_vector_store_service.write_index(
+                        index_name,
+                        vector_ids=entry["vector_ids"],
+                        embeddings=vectors[start:end],
+                        metadatas=[metadata_for(entry, row) for row in range(start, end)]
+                    )
+                    return {"success": True, "index_name": index_name}
+
+                created = pinecone_service.create_index_for_file(
+                    file_id=entry["file_id"],
+                    file_name=entry["file_name"],
+                    dimension=manifest["dimension"]
+                )
+                if not created.get("success"):
+                    return created
+                pinecone_service.upsert_vectors(created["index_name"], [
+                    {
+                        "id": vector_id,
+                        "values": vectors[row].tolist(),
+                        "metadata": metadata_for(entry, row)
+                    }
+                    for vector_id, row in zip(entry["vector_ids"], range(start, end))
+                ])
+                return created
+
+            # Index creation and upserts are network/disk-bound; DB writes stay on this thread
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                results = list(executor.map(restore_vectors, entries))
+
+            restored, errors = 0, []
+            for (i, entry), result in zip(entries, results):
+                if not result.get("success"):
+                    errors.append({"file_name": entry["file_name"], "error": result.get("error")})
+                    continue
+                start, end = int(offsets[i]), int(offsets[i + 1])
+                chunks = [
+                    {
+                        "text": text,
+                        "metadata": {
+                            "chunk_index": int(chunk_index[row]),
+                            "chunk_start": int(chunk_start[row]) if chunk_start[row] >= 0 else None,
+                            "chunk_end": int(chunk_end[row]) if chunk_end[row] >= 0 else None
+                        }
+                    }
+                    for text, row in zip(entry["texts"], range(start, end))
+                ]
+                chunk_store_service.save_chunks(
+                    db,
+                    index_name=result["index_name"],
+                    file_id=entry["file_id"],
+                    file_name=entry["file_name"],
+                    chunks=chunks,
+                    vector_ids=entry["vector_ids"]
+                )
+                file_centroid_service.update_file(
+                    db,
+                    index_name=result["index_name"],
+                    file_id=entry["file_id"],
+                    file_name=entry["file_name"],
+                    embeddings=vectors[start:end]
+                )
+                restored += 1
+
+            logger.info(f"Restored {restored}/{len(entries)} indexes from {path}")
+            return {
+                "success": not errors,
+                "path": path,
+                "restored_count": restored,
+                "skipped_count": len(manifest["indexes"]) - len(entries),
+                "errors": errors
+            }
+        except Exception as e:
+            logger.error(f"Failed to import vector snapshot: {str(e)}")
+            return {
+                "success": False,
+                "error": str(e)
+            }
+
+
+# Create service instance
+vector_snapshot_service = VectorSnapshotService()
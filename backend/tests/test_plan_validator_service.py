@@ -0,0 +1,111 @@
+"""
+Checks the local sprint plan validator against the sample Gemini response
+(backend/geminiresponse.html), whose task breakdown refers to PBs by id only.
+
+Run from backend/: python -m pytest tests
+"""
+
+import importlib.util
+import re
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+# Loaded by path: importing the services package pulls in the database layer
+_spec = importlib.util.spec_from_file_location(
+    "plan_validator_service", BACKEND_DIR / "services" / "plan_validator_service.py"
+)
+plan_validator = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(plan_validator)
+
+SAMPLE_PLAN = (BACKEND_DIR / "geminiresponse.html").read_text(encoding="utf-8")
+
+# As entered on the Sprint Planning page, worded differently from the plan
+BACKLOG_ITEMS = [
+    "User registration with email and password",
+    "Login using email and password",
+    "View basic profile information after login",
+    "Administrator reviews user registrations for audits",
+]
+
+# The sample predates this section of the prompt
+SAMPLE_MISSING = ["Sprint Confidence Improvement Recommendations"]
+
+BACKLOG = "Committed Sprint Backlog"
+BREAKDOWN = "Detailed Task Breakdown"
+
+
+def _validate(plan, backlog_items=None):
+    return plan_validator.plan_validator_service.validate_sprint_plan(plan, len(BACKLOG_ITEMS), backlog_items)
+
+
+def test_sample_plan_has_every_pb():
+    result = _validate(SAMPLE_PLAN, BACKLOG_ITEMS)
+
+    assert result["missing_sections"] == SAMPLE_MISSING
+    assert result["issues"] == [f"Missing section: {name}" for name in SAMPLE_MISSING]
+    assert result["pb_counts"] == {BACKLOG: 4, BREAKDOWN: 4}
+    assert result["missing_pbs"] == {BACKLOG: [], BREAKDOWN: []}
+
+
+def test_breakdown_missing_a_pb_is_reported():
+    # Drop every task row of AUTH-002 from the breakdown
+    plan = re.sub(r"<tr>\s*<td>AUTH-002-\d+</td>.*?</tr>", "", SAMPLE_PLAN, flags=re.DOTALL)
+
+    result = _validate(plan, BACKLOG_ITEMS)
+
+    assert result["pb_counts"][BACKLOG] == 4
+    assert result["missing_pbs"][BREAKDOWN] == [BACKLOG_ITEMS[1]]
+
+
+def test_structural_count_counts_pbs_not_task_rows():
+    result = _validate(SAMPLE_PLAN)
+
+    assert result["missing_sections"] == SAMPLE_MISSING
+    assert result["issues"] == [f"Missing section: {name}" for name in SAMPLE_MISSING]
+    assert result["pb_counts"] == {BACKLOG: 4, BREAKDOWN: 4}
+    assert result["missing_pbs"] == {}
+
+
+def test_insert_entries_skips_pbs_already_present():
+    plan = re.sub(r"<tr>\s*<td>AUTH-002-\d+</td>.*?</tr>", "", SAMPLE_PLAN, flags=re.DOTALL)
+    fragment = (
+        "<tr><td>AUTH-001-01</td><td>AUTH-001</td><td>Design registration form UI.</td><td>8</td><td>Jane</td><td>None</td></tr>\n"
+        "<tr><td>AUTH-002-01</td><td>AUTH-002</td><td>Build login form.</td><td>8</td><td>Jane</td><td>None</td></tr>"
+    )
+
+    repaired = plan_validator.plan_validator_service.insert_entries(plan, "detailed task breakdown", fragment, BACKLOG_ITEMS)
+
+    assert repaired.count("AUTH-001-01") == plan.count("AUTH-001-01")
+    assert repaired.count("Build login form.") == 1
+    assert _validate(repaired, BACKLOG_ITEMS)["missing_pbs"][BREAKDOWN] == []
+
+
+def test_insert_entries_leaves_complete_section_unchanged():
+    fragment = "<tr><td>AUTH-003</td><td>As a user, I want to be able to view my basic profile information after logging in.</td><td>Medium</td><td>25</td></tr>"
+
+    repaired = plan_validator.plan_validator_service.insert_entries(SAMPLE_PLAN, "committed sprint backlog", fragment, BACKLOG_ITEMS)
+
+    assert repaired == plan_validator.clean_html(SAMPLE_PLAN)
+
+
+def test_similar_summaries_do_not_share_an_entry():
+    stories = [f"Story {number} about the feature" for number in range(1, 4)]
+    # Worded so story 3 also matches most words of the other entries
+    breakdown = "".join(f"<h3>About the feature: story {number}</h3><ul><li>Task</li></ul>" for number in (1, 2))
+    plan = SAMPLE_PLAN.replace("<h2>Detailed Task Breakdown</h2>", f"<h2>Detailed Task Breakdown</h2>{breakdown}<h2>Notes</h2>")
+
+    result = plan_validator.plan_validator_service.validate_sprint_plan(plan, len(stories), stories)
+
+    assert result["missing_pbs"][BREAKDOWN] == [stories[2]]
+
+
+def test_strip_document_keeps_only_the_sections():
+    # A sectioned call answered with a whole plan page, as the full-plan prompt asks for
+    fragment = plan_validator.strip_document(plan_validator.clean_html(SAMPLE_PLAN))
+    document = f"<!DOCTYPE html>\n<html><head><title>Plan</title></head><body><h1>Plan</h1>\n<section>{fragment}</section>\n</body></html>"
+
+    for tag in ("<!doctype", "<html", "<head", "<body", "<h1"):
+        assert document.lower().count(tag) == 1
+    assert "Sprint Plan - Sprint 9" not in fragment
+    assert _validate(document, BACKLOG_ITEMS)["missing_pbs"] == {BACKLOG: [], BREAKDOWN: []}
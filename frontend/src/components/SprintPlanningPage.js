@@ -1,6 +1,7 @@
 import React, { useEffect, useState } from 'react';
 import { useNavigate } from 'react-router-dom';
 import { useAuth } from '../contexts/AuthContext';
+import { waitForJob } from '../utils/jobs';
 import './SprintPlanningPage.css';
 
 const SprintPlanningPage = () => {
@@ -879,23 +880,14 @@ const SprintPlanningPage = () => {
     setLoadingProgress(0);
     setLoadingMessage('');
     
-    // Simulate realistic progress based on processing stages
-    const progressStages = [
-      { progress: 15, message: "Analyzing sprint data..." },
-      { progress: 35, message: "Processing team capacity..." },
-      { progress: 55, message: "Evaluating backlog items..." },
-      { progress: 75, message: "Generating AI response..." },
-      { progress: 90, message: "Finalizing plan..." }
-    ];
-    
-    let currentStage = 0;
-    const progressInterval = setInterval(() => {
-      if (currentStage < progressStages.length) {
-        setLoadingProgress(progressStages[currentStage].progress);
-        setLoadingMessage(progressStages[currentStage].message);
-        currentStage++;
-      }
-    }, 800); // Move to next stage every 800ms
+    // Progress follows the generation job's stages
+    const stageMessages = {
+      queued: "Waiting for a free generator...",
+      starting: "Analyzing sprint data...",
+      generating: "Generating AI response...",
+      validating: "Checking backlog coverage...",
+      saving: "Finalizing plan..."
+    };
     
     try {
       // Get the current workspace from localStorage
@@ -927,7 +919,19 @@ const SprintPlanningPage = () => {
         throw new Error(`HTTP error! status: ${response.status}`);
       }
 
-      const result = await response.json();
+      const job = await response.json();
+      if (!job.success) {
+        throw new Error(job.message || 'Failed to start sprint plan generation');
+      }
+
+      // Generation runs as a background job; wait for its result
+      const result = await waitForJob(job.job_id, ({ stage, progress }) => {
+        setLoadingProgress(Math.min(progress, 95));
+        setLoadingMessage(stageMessages[stage] || 'Finalizing plan...');
+      });
+      if (!result.success) {
+        throw new Error(result.message || 'Sprint plan generation failed');
+      }
       
       // The backend already saves the sprint plan to database
       // console.log('Sprint plan generated successfully');
@@ -967,7 +971,6 @@ const SprintPlanningPage = () => {
       console.error('Error generating sprint plan:', error);
       alert('Error generating sprint plan. Please try again.');
     } finally {
-      clearInterval(progressInterval);
       setLoadingProgress(100);
       setTimeout(() => {
         setLoading(false);
@@ -3,6 +3,7 @@ import { useLocation, useNavigate } from 'react-router-dom';
 import { useAuth } from '../contexts/AuthContext';
 import axios from 'axios';
 import html2pdf from 'html2pdf.js';
+import { waitForJob } from '../utils/jobs';
 import './SprintResultsPage.css';
 
 const SprintResultsPage = () => {
@@ -523,7 +524,9 @@ const SprintResultsPage = () => {
         body: JSON.stringify(regenerationData)
       });
 
-      const result = await response.json();
+      const job = await response.json();
+      // Regeneration runs as a background job; wait for its result
+      const result = job.success ? await waitForJob(job.job_id) : job;
 
       // Complete progress
       setLoadingProgress(100);
@@ -0,0 +1,26 @@
+// Background jobs (e.g. sprint plan generation): the POST returns a job id and
+// the result is fetched by polling /api/jobs/{job_id} until the job finishes.
+
+const POLL_INTERVAL_MS = 1500;
+
+export async function waitForJob(jobId, onProgress) {
+  for (;;) {
+    const response = await fetch(`${process.env.REACT_APP_API_URL}/api/jobs/${jobId}`);
+    if (!response.ok) {
+      throw new Error(`HTTP error! status: ${response.status}`);
+    }
+
+    const job = await response.json();
+    if (!job.success) {
+      throw new Error(job.error || 'Job not found');
+    }
+    if (onProgress) {
+      onProgress(job);
+    }
+    if (job.status === 'succeeded' || job.status === 'failed') {
+      return job.result || { success: false, message: job.error, error: job.error };
+    }
+
+    await new Promise((resolve) => setTimeout(resolve, POLL_INTERVAL_MS));
+  }
+}